@@ -0,0 +1,180 @@
+"""
+Benchmark of the combined hand and arm pipeline.
+
+Runs MPKeyPointSolution.process over the bundled sample images, and synthetic resized variants of them, and reports
+the p50/p95/p99 latency of each stage, the end to end throughput and the peak RSS as JSON. The stages of process are
+timed by the solution itself through ProcessMetrics, see instrumentation.py for their list, e.g. preprocess,
+hands_graph, pose_graph, assembly and total. The benchmark adds:
+
+    draw2d          drawing the 2d keypoints and connections on the image
+    draw2d_batched  same drawing with draw2d_landmarks_with_style and the compiled default style
+    end_to_end      the MPKeyPointSolution.process call, output conversion included
+
+The images keep their sizes, each result reports the shapes of its images.
+
+Usage:
+    python benchmarks/benchmark_hand_and_arm.py --scales 0.5 1 2 --repeats 10 --output bench_output.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mp_keypoint_solution.hand_and_arm_combined.mp_hand_and_arm_keypoint_solution import MPKeyPointSolution
+from mp_keypoint_solution.hand_and_arm_combined.instrumentation import ProcessMetrics
+from mp_keypoint_solution.hand_and_arm_combined.profiles import PROFILES
+from mp_keypoint_solution.hand_and_arm_combined.data_structures import LandmarkSet
+from mp_keypoint_solution.hand_and_arm_combined.visualize import (
+    draw2d_landmarks, draw2d_landmarks_with_style, get_default_hand_2d_style, get_default_hand_2d_landmarks_style,
+    get_default_hand_2d_connections_style, SINGLE_ARM_HAND_CONNECTIONS)
+
+DEFAULT_IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'image', 'whole_body')
+BENCHMARK_STAGES = ('draw2d', 'draw2d_batched', 'end_to_end')
+
+def peak_rss_mb():
+    """Peak resident set size of the process in MB, None if not supported on the platform."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+def summarize(latencies_s):
+    latencies_ms = np.asarray(latencies_s) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'mean_ms': float(latencies_ms.mean()),
+            'count': int(len(latencies_ms))}
+
+def landmarks_to_array(landmarks):
+    """The (N, 3) keypoints of any output format of process, nan for a missing keypoint."""
+    if landmarks is None or isinstance(landmarks, np.ndarray):
+        return landmarks
+    if isinstance(landmarks, LandmarkSet):
+        return landmarks.xyz
+    return np.array([(np.nan,) * 3 if landmark is None else (landmark.x, landmark.y, landmark.z)
+                     for landmark in landmarks], dtype=np.float32)
+
+def split_sides(uv_landmarks):
+    # one 23 keypoints set per side, nan for an undetected side of "BOTH_SIDE"
+    for start in range(0, len(uv_landmarks), 23):
+        side_landmarks = uv_landmarks[start:start + 23]
+        if not np.isnan(side_landmarks).any():
+            yield side_landmarks
+
+def draw_sides(image, uv_landmarks, landmark_style, connection_style):
+    for side_landmarks in split_sides(uv_landmarks):
+        draw2d_landmarks(image, LandmarkSet(side_landmarks), SINGLE_ARM_HAND_CONNECTIONS, landmark_style,
+                         connection_style)
+
+def draw_sides_batched(image, uv_landmarks, style):
+    for side_landmarks in split_sides(uv_landmarks):
+        draw2d_landmarks_with_style(image, side_landmarks, style)
+
+def benchmark_images(solution, images, type, output_format, repeats, warmup):
+    latencies = {stage: [] for stage in BENCHMARK_STAGES}
+    num_detected = 0
+    # the styles are built once, only the drawing is timed
+    landmark_style, connection_style = get_default_hand_2d_landmarks_style(), get_default_hand_2d_connections_style()
+    compiled_style = get_default_hand_2d_style()
+    # the stages of process, timed by the solution
+    solution.metrics = ProcessMetrics(window=max(len(images) * repeats, 1))
+    for repeat in range(warmup + repeats):
+        record = repeat >= warmup
+        if repeat == warmup:
+            solution.metrics.reset()
+        for image in images:
+            timings = {}
+            start = time.perf_counter()
+            world_landmarks, uv_landmarks = solution.process(image, type=type, output_format=output_format)
+            timings['end_to_end'] = time.perf_counter() - start
+            uv_landmarks = landmarks_to_array(uv_landmarks)
+
+            annotate_image = image.copy()
+            start = time.perf_counter()
+            if uv_landmarks is not None:
+                draw_sides(annotate_image, uv_landmarks, landmark_style, connection_style)
+            timings['draw2d'] = time.perf_counter() - start
+
+            annotate_image = image.copy()
+            start = time.perf_counter()
+            if uv_landmarks is not None:
+                draw_sides_batched(annotate_image, uv_landmarks, compiled_style)
+            timings['draw2d_batched'] = time.perf_counter() - start
+
+            if record:
+                num_detected += world_landmarks is not None
+                for stage, latency in timings.items():
+                    latencies[stage].append(latency)
+    metrics = solution.metrics.snapshot()
+    solution.metrics = None
+    total_time = sum(latencies['end_to_end'])
+    return {
+        'image_shapes': [list(image.shape[:2]) for image in images],
+        'num_images': len(images),
+        'num_frames': len(latencies['end_to_end']),
+        'detection_rate': num_detected / max(len(latencies['end_to_end']), 1),
+        'throughput_fps': len(latencies['end_to_end']) / total_time if total_time else None,
+        'stages': dict(metrics['stages'], **{stage: summarize(stage_latencies)
+                                             for stage, stage_latencies in latencies.items()}),
+        'outcomes': metrics['counters'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the combined hand and arm pipeline.')
+    parser.add_argument('--images', default=DEFAULT_IMAGE_DIR, help='directory of the benchmark images')
+    parser.add_argument('--scales', type=float, nargs='+', default=[0.5, 1.0, 2.0],
+                        help='synthetic resized variants of the images')
+    parser.add_argument('--repeats', type=int, default=10, help='number of measured passes over the images')
+    parser.add_argument('--warmup', type=int, default=2, help='number of passes over the images before measuring')
+    parser.add_argument('--type', default='BOTH_SIDE', choices=['BOTH_SIDE', 'LEFT_SIDE', 'RIGHT_SIDE'])
+    parser.add_argument('--output-format', default='ARRAY', choices=['LANDMARK_LIST', 'ARRAY', 'LANDMARK_SET'])
+    parser.add_argument('--profile', default='balanced', choices=list(PROFILES), help='models of the graphs')
+    parser.add_argument('--output', default=None, help='write the JSON report to a file instead of stdout')
+    args = parser.parse_args()
+
+    image_files = sorted(glob.glob(os.path.join(args.images, '*.jpg')))
+    if not image_files:
+        parser.error(f'No .jpg images in {args.images}')
+    base_images = [cv2.imread(file) for file in image_files]
+
+    report = {
+        'config': vars(args),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'mediapipe': mp.__version__,
+        },
+        'results': {},
+    }
+    # static image mode, every image is processed from scratch and the runs are reproducible
+    with MPKeyPointSolution(static_image_mode=True, profile=args.profile) as solution:
+        for scale in args.scales:
+            images = [image if scale == 1 else cv2.resize(image, None, fx=scale, fy=scale,
+                                                          interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+                      for image in base_images]
+            report['results'][f'scale_{scale:g}'] = benchmark_images(
+                solution, images, args.type, args.output_format, args.repeats, args.warmup)
+    report['peak_rss_mb'] = peak_rss_mb()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,16 @@ mp_drawing_styles = mp.solutions.drawing_styles
 mp_pose = mp.solutions.pose
 mp_hands = mp.solutions.hands
 import time
+from mp_keypoint_solution.hand_and_arm_combined.pipelined_runner import PipelinedRunner
+from mp_keypoint_solution.hand_and_arm_combined.visualize import compile_hand_2d_style, draw2d_landmarks_with_style
+
+# The drawing styles are built once, not on every frame.
+hand_style = compile_hand_2d_style(
+    mp_drawing_styles.get_default_hand_landmarks_style(),
+    mp_drawing_styles.get_default_hand_connections_style(),
+    connections=mp_hands.HAND_CONNECTIONS,
+    num_landmarks=len(mp_hands.HandLandmark))
+pose_landmarks_style = mp_drawing_styles.get_default_pose_landmarks_style()
 
 # For webcam input:
 cap = cv2.VideoCapture(0)
@@ -16,45 +26,69 @@ with mp_hands.Hands(
     with mp_pose.Pose(
         min_detection_confidence=0.5,
         min_tracking_confidence=0.5) as pose:
-        while cap.isOpened():
-            success, image = cap.read()
-            if not success:
-                print("Ignoring empty camera frame.")
-                # If loading a video, use 'break' instead of 'continue'.
-                continue
 
+        # Capture stage, runs in its own thread.
+        def capture():
+            # The failed reads are retried until the pipeline stops, so that it can be joined.
+            while cap.isOpened() and not runner.stopped:
+                success, image = cap.read()
+                if not success:
+                    print("Ignoring empty camera frame.")
+                    # If loading a video, use 'return None' instead of 'continue'.
+                    continue
+                return image
+            return None
+
+        # The RGB image is only used by the inference stage, convert every frame into the same buffer.
+        rgb_buffer = None
+
+        # Inference stage, runs in its own thread.
+        def infer(image):
+            global rgb_buffer
+            if rgb_buffer is None or rgb_buffer.shape != image.shape:
+                rgb_buffer = np.empty_like(image)
+            rgb_buffer.flags.writeable = True
+            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb_buffer)
             # To improve performance, optionally mark the image as not writeable to
             # pass by reference.
-            image.flags.writeable = False
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            annotate_image = image.copy()
-            
+            rgb_image.flags.writeable = False
+
             start_time = time.time()
-            results = hands.process(image)
-            pose_results = pose.process(image)
+            results = hands.process(rgb_image)
+            pose_results = pose.process(rgb_image)
             end_time = time.time()
             print(f'time cost: {end_time - start_time}s')
-            
+            return results, pose_results
+
+        # Render stage, runs in the main thread.
+        def render(image, inference_output):
+            results, pose_results = inference_output
+            # The captured BGR frame is not used after rendering, annotate it in place.
+            annotate_image = image
+
             # Draw the hand annotations on the image.
             if results.multi_hand_landmarks:
                 for hand_landmarks in results.multi_hand_landmarks:
-                    mp_drawing.draw_landmarks(
+                    # The hand landmarks have no visibility, drawn from their coordinates.
+                    draw2d_landmarks_with_style(
                         annotate_image,
-                        hand_landmarks,
-                        mp_hands.HAND_CONNECTIONS,
-                        mp_drawing_styles.get_default_hand_landmarks_style(),
-                        mp_drawing_styles.get_default_hand_connections_style())
-        
+                        np.array([(landmark.x, landmark.y) for landmark in hand_landmarks.landmark]),
+                        hand_style)
+
 
             # Draw the pose annotation on the image.
             mp_drawing.draw_landmarks(
                 annotate_image,
                 pose_results.pose_landmarks,
                 mp_pose.POSE_CONNECTIONS,
-                landmark_drawing_spec=mp_drawing_styles.get_default_pose_landmarks_style())
-            
-            # Flip the image horizontally for a selfie-view display.
-            cv2.imshow('MediaPipe Pose', cv2.flip(cv2.cvtColor(annotate_image, cv2.COLOR_BGR2RGB), 1))
-            if cv2.waitKey(5) & 0xFF == 27:
-                break
-cap.release()
\ No newline at end of file
+                landmark_drawing_spec=pose_landmarks_style)
+
+            # Flip the image horizontally for a selfie-view display, in place as well.
+            cv2.imshow('MediaPipe Pose', cv2.flip(annotate_image, 1, dst=annotate_image))
+            return cv2.waitKey(5) & 0xFF != 27
+
+        # Capture, inference and render overlap, stale frames are dropped when inference falls behind.
+        runner = PipelinedRunner(capture, infer, render, queue_size=1)
+        runner.run()
+        print(f'mean latency: {runner.mean_latency}s, dropped frames: {runner.num_dropped_before_inference}')
+cap.release()
@@ -0,0 +1,165 @@
+"""
+asyncio API of MPKeyPointSolution.
+
+MPKeyPointSolution.process blocks for the time of the graphs, tens of milliseconds, which would stall an event loop.
+AsyncMPKeyPointSolution runs it in a dedicated single thread executor: the graphs release the GIL while running, so the
+event loop keeps serving capture and network tasks meanwhile, and the frames of a video stream reach the tracking graphs
+one at a time and in order, as they require.
+
+Streams are processed by process_stream as three concurrent stages, reading the frame source, inference and the
+consumer, connected by bounded queues: a slow consumer holds up the inference and a slow inference holds up the
+reading, or drops the oldest frames for live sources.
+"""
+import asyncio
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from .frame_source import Frame
+from .mp_hand_and_arm_keypoint_solution import MPKeyPointSolution
+
+# Marks the end of the stream in the stage queues.
+_END_OF_STREAM = object()
+
+class _StageError:
+    """An exception raised by a stage, passed down the queues to the consumer."""
+    def __init__(self, error: BaseException):
+        self.error = error
+
+def _put_drop_oldest_nowait(bounded_queue: asyncio.Queue, item) -> int:
+    """Puts an item to a bounded asyncio queue, dropping the oldest items to make room if full.
+
+    Returns:
+        int: number of dropped items.
+    """
+    num_dropped = 0
+    while True:
+        try:
+            bounded_queue.put_nowait(item)
+            return num_dropped
+        except asyncio.QueueFull:
+            bounded_queue.get_nowait()
+            num_dropped += 1
+
+async def _aiterate(frames: Union[AsyncIterable, Iterable]) -> AsyncIterator:
+    """Iterates an async iterable, or a blocking iterable, e.g. reading a video file, in the default executor."""
+    if hasattr(frames, '__aiter__'):
+        async for frame in frames:
+            yield frame
+        return
+    loop = asyncio.get_running_loop()
+    iterator = iter(frames)
+    while True:
+        frame = await loop.run_in_executor(None, next, iterator, _END_OF_STREAM)
+        if frame is _END_OF_STREAM:
+            return
+        yield frame
+
+class AsyncMPKeyPointSolution:
+    """asyncio front end of a MPKeyPointSolution.
+
+    Args:
+        solution (MPKeyPointSolution, optional): the solution to run. Defaults to None, a MPKeyPointSolution created
+            with the keyword arguments.
+        **kwargs: arguments of MPKeyPointSolution when no solution is given.
+    """
+    def __init__(self, solution: Optional[MPKeyPointSolution] = None, **kwargs):
+        self.solution = MPKeyPointSolution(**kwargs) if solution is None else solution
+        # one thread, the graphs process the frames of a stream one at a time and in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mp_keypoint')
+        self.num_dropped = 0
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: function(*args, **kwargs))
+
+    async def aprocess(self, image: np.ndarray, **process_kwargs) -> Tuple[Any, Any]:
+        """Processes an image without blocking the event loop, see MPKeyPointSolution.process for the arguments and
+        the results."""
+        return await self._run(self.solution.process, image, **process_kwargs)
+
+    async def warm_up(self, image_size: Tuple[int, int] = (480, 640)):
+        """Builds and warms up the graphs without blocking the event loop, see MPKeyPointSolution.warm_up."""
+        await self._run(self.solution.warm_up, image_size)
+
+    async def process_stream(self, frames: Union[AsyncIterable[Union[np.ndarray, Frame]],
+                                                 Iterable[Union[np.ndarray, Frame]]],
+                             queue_size: int = 2, drop_oldest: bool = False, copy_frames: bool = True,
+                             **process_kwargs) -> AsyncIterator[Tuple[Union[np.ndarray, Frame], Any, Any]]:
+        """Processes the frames of a stream, reading, inference and the consumer running concurrently.
+
+        Args:
+            frames (AsyncIterable or Iterable of np.array or Frame): the frame source, e.g. a FrameSource. A blocking
+                iterable is read in the default executor.
+            queue_size (int, optional): capacity of the queues between the stages. Defaults to 2.
+            drop_oldest (bool, optional): for live sources, drop the oldest frames when the inference falls behind
+                instead of waiting, counted in num_dropped. Defaults to False, every frame is processed.
+            copy_frames (bool, optional): copy each image as it is read, the source is read ahead of the inference
+                and the consumer and may reuse its buffers, as a FrameSource does. Defaults to True, False only for
+                sources allocating every image.
+            **process_kwargs: arguments of MPKeyPointSolution.process.
+
+        Yields:
+            The frame, the world landmarks and the normalized landmarks, in frame order. The frame is the image, or
+            the Frame with its index and timestamp.
+        """
+        frame_queue = asyncio.Queue(maxsize=queue_size)
+        result_queue = asyncio.Queue(maxsize=queue_size)
+
+        async def read():
+            try:
+                async for frame in _aiterate(frames):
+                    if copy_frames:
+                        frame = (dataclasses.replace(frame, image=frame.image.copy()) if isinstance(frame, Frame)
+                                 else frame.copy())
+                    if drop_oldest:
+                        self.num_dropped += _put_drop_oldest_nowait(frame_queue, frame)
+                    else:
+                        await frame_queue.put(frame)
+                item = _END_OF_STREAM
+            except Exception as error:
+                item = _StageError(error)
+            # the end is never dropped
+            await frame_queue.put(item)
+
+        async def infer():
+            while True:
+                frame = await frame_queue.get()
+                if frame is _END_OF_STREAM or isinstance(frame, _StageError):
+                    await result_queue.put(frame)
+                    return
+                try:
+                    image = frame.image if isinstance(frame, Frame) else frame
+                    world_landmarks, uv_landmarks = await self.aprocess(image, **process_kwargs)
+                except Exception as error:
+                    await result_queue.put(_StageError(error))
+                    return
+                await result_queue.put((frame, world_landmarks, uv_landmarks))
+
+        tasks = [asyncio.create_task(read()), asyncio.create_task(infer())]
+        try:
+            while True:
+                item = await result_queue.get()
+                if item is _END_OF_STREAM:
+                    return
+                if isinstance(item, _StageError):
+                    raise item.error
+                yield item
+        finally:
+            # the consumer stopped early or failed, an inference in flight completes in the executor
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def aclose(self):
+        """Closes the solution after the inference in flight, then the executor."""
+        await self._run(self.solution.close)
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
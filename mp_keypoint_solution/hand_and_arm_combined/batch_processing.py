@@ -0,0 +1,162 @@
+"""
+Batch/offline processing of image directories and video files over a process pool.
+
+Each worker process holds its own MPKeyPointSolution(static_image_mode=True), i.e. its own hands and pose graphs, and the
+results are gathered in input order. Images are distributed one file per task, videos are split into segments of
+consecutive frames so that a few long recordings still spread over all the workers.
+
+As the pool uses the "spawn" start method by default, scripts calling the functions here need the
+`if __name__ == '__main__':` guard.
+
+Usage:
+    python -m mp_keypoint_solution.hand_and_arm_combined.batch_processing data/image/whole_body --output result.npz
+"""
+import argparse
+import multiprocessing
+import os
+from typing import List, Optional, Sequence, Union
+
+import cv2
+import numpy as np
+
+from .frame_source import IMAGE_EXTENSIONS, VideoFileSource, list_image_files
+from .mp_hand_and_arm_keypoint_solution import MPKeyPointSolution
+
+# per worker process states, set by _init_worker
+_worker_solution = None
+_worker_process_kwargs = None
+
+def _init_worker(process_kwargs: dict):
+    global _worker_solution, _worker_process_kwargs
+    _worker_solution = MPKeyPointSolution(static_image_mode=True)
+    # load the models when the pool starts rather than in the first task
+    _worker_solution.warm_up()
+    _worker_process_kwargs = process_kwargs
+
+def _process_image_file(image_file: str):
+    image = cv2.imread(image_file)
+    if image is None:
+        return None, None
+    return _worker_solution.process(image, **_worker_process_kwargs)
+
+def _process_video_segment(task):
+    video_file, start_frame, stop_frame = task
+    # stop_frame is None for the last segment, read until the end of the video; the next frames are decoded while the
+    # current one is processed
+    with VideoFileSource(video_file, start_frame=start_frame, stop_frame=stop_frame) as source:
+        return [_worker_solution.process(frame.image, **_worker_process_kwargs) for frame in source]
+
+def _split_video(video_file: str, segment_length: int):
+    cap = cv2.VideoCapture(video_file)
+    if not cap.isOpened():
+        raise ValueError(f'Can not open video file: {video_file}')
+    # the frame count is an estimation from the container for some codecs, the last segment always reads to the end
+    num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    starts = list(range(0, max(num_frames, 1), segment_length))
+    return [(video_file, start, start + segment_length if i < len(starts) - 1 else None)
+            for i, start in enumerate(starts)]
+
+def _create_pool(num_workers: Optional[int], process_kwargs: dict, start_method: str):
+    context = multiprocessing.get_context(start_method)
+    return context.Pool(num_workers or os.cpu_count(), initializer=_init_worker, initargs=(process_kwargs,))
+
+def process_images(image_files: Union[str, Sequence[str]], num_workers: Optional[int] = None, type="BOTH_SIDE",
+                   output_format="LANDMARK_LIST", chunksize: int = 1, start_method: str = "spawn") -> list:
+    """Process images over a process pool.
+
+    Args:
+        image_files (str or List[str]): a directory of images or a list of image files.
+        num_workers (int, optional): number of worker processes. Defaults to the number of cpus.
+        type (str, optional): see MPKeyPointSolution.process. Defaults to "BOTH_SIDE".
+        output_format (str, optional): see MPKeyPointSolution.process. Defaults to "LANDMARK_LIST".
+        chunksize (int, optional): number of images sent to a worker at once. Defaults to 1.
+        start_method (str, optional): multiprocessing start method. Defaults to "spawn".
+
+    Returns:
+        list: the (world landmarks, normalized landmarks) of each image in input order, (None, None) for an image
+        failed to read or without a detected body.
+    """
+    if isinstance(image_files, str):
+        image_files = list_image_files(image_files)
+    process_kwargs = dict(type=type, output_format=output_format)
+    with _create_pool(num_workers, process_kwargs, start_method) as pool:
+        return list(pool.imap(_process_image_file, image_files, chunksize=chunksize))
+
+def process_videos(video_files: Sequence[str], num_workers: Optional[int] = None, type="BOTH_SIDE",
+                   output_format="LANDMARK_LIST", segment_length: int = 300, start_method: str = "spawn"
+                   ) -> List[list]:
+    """Process every frame of videos over a process pool.
+
+    Args:
+        video_files (List[str]): video files.
+        num_workers (int, optional): number of worker processes. Defaults to the number of cpus.
+        type (str, optional): see MPKeyPointSolution.process. Defaults to "BOTH_SIDE".
+        output_format (str, optional): see MPKeyPointSolution.process. Defaults to "LANDMARK_LIST".
+        segment_length (int, optional): number of consecutive frames processed in one task. Defaults to 300.
+        start_method (str, optional): multiprocessing start method. Defaults to "spawn".
+
+    Returns:
+        List[list]: for each video, the (world landmarks, normalized landmarks) of each frame in order.
+    """
+    tasks, task_video_indices = [], []
+    for video_index, video_file in enumerate(video_files):
+        video_tasks = _split_video(video_file, segment_length)
+        tasks.extend(video_tasks)
+        task_video_indices.extend([video_index] * len(video_tasks))
+    process_kwargs = dict(type=type, output_format=output_format)
+    results = [[] for _ in video_files]
+    with _create_pool(num_workers, process_kwargs, start_method) as pool:
+        for video_index, segment_results in zip(task_video_indices, pool.imap(_process_video_segment, tasks)):
+            results[video_index].extend(segment_results)
+    return results
+
+def stack_array_results(results: list, num_landmarks: int) -> np.ndarray:
+    """Stacks the "ARRAY" results into a (N, 2, num_landmarks, 3) array of world and uv keypoints, nan if missing."""
+    stacked = np.full((len(results), 2, num_landmarks, 3), np.nan, dtype=np.float32)
+    for i, (world_landmarks, uv_landmarks) in enumerate(results):
+        if world_landmarks is not None:
+            stacked[i, 0] = world_landmarks
+            stacked[i, 1] = uv_landmarks
+    return stacked
+
+def video_result_keys(video_files: Sequence[str]) -> List[str]:
+    """Names the results of video files by their paths relative to the common directory of the files, so that videos
+    of the same name in different directories do not overwrite each other.
+
+    Raises:
+        ValueError: if a video file is given twice.
+    """
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(video_file)) for video_file in video_files])
+    keys = [os.path.relpath(os.path.abspath(video_file), root).replace(os.sep, '/') for video_file in video_files]
+    duplicates = sorted({key for key in keys if keys.count(key) > 1})
+    if duplicates:
+        raise ValueError(f'Video files given more than once: {duplicates}')
+    return keys
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Process images or videos over a process pool.')
+    parser.add_argument('inputs', nargs='+', help='a directory of images, image files or video files')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--type', default='BOTH_SIDE', choices=['BOTH_SIDE', 'LEFT_SIDE', 'RIGHT_SIDE'])
+    parser.add_argument('--output', default=None, help='save the keypoints to a .npz file')
+    args = parser.parse_args()
+
+    num_landmarks = 46 if args.type == 'BOTH_SIDE' else 23
+    if len(args.inputs) == 1 and os.path.isdir(args.inputs[0]):
+        names = list_image_files(args.inputs[0])
+    else:
+        names = args.inputs
+    if all(name.lower().endswith(IMAGE_EXTENSIONS) for name in names):
+        keypoints = {'images': stack_array_results(
+            process_images(names, args.workers, type=args.type, output_format="ARRAY"), num_landmarks)}
+    else:
+        # checked before processing the videos
+        keys = video_result_keys(names)
+        keypoints = {key: stack_array_results(video_results, num_landmarks) for key, video_results
+                     in zip(keys, process_videos(names, args.workers, type=args.type, output_format="ARRAY"))}
+    for name, stacked in keypoints.items():
+        num_detected = int((~np.isnan(stacked[:, 0]).all(axis=(1, 2))).sum())
+        print(f'{name}: {num_detected}/{len(stacked)} frames with keypoints')
+    if args.output:
+        np.savez(args.output, **keypoints)
@@ -1 +1,10 @@
-from .landmark import Landmark
\ No newline at end of file
+from .landmark import Landmark
+# LandmarkSet imports numpy, load it on first use
+from ..lazy_import import lazy_attributes
+
+_ATTRIBUTE_MODULES = {
+    'LandmarkSet': '.landmark_set',
+    'LandmarkView': '.landmark_set',
+}
+__all__ = ['Landmark'] + list(_ATTRIBUTE_MODULES)
+__getattr__, __dir__ = lazy_attributes(__name__, _ATTRIBUTE_MODULES)
@@ -0,0 +1,126 @@
+from typing import Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from .landmark import Landmark
+from ..mp_landmark_index import SINGLE_HAND_ARM_LANDMARK_NAME2INDEX, HAND_ARM_LANDMARK_NAME2INDEX
+
+_OPTIONAL_COLUMNS = ('visibility', 'presence')
+
+class LandmarkView:
+    """
+    A landmark of a LandmarkSet, reading its row of the backing array.
+
+    x:  The x coordinate.
+    y:  The y coordinate.
+    z:  The z coordinate.
+    visibility, presence: only when the LandmarkSet has the column, so that hasattr() tells whether they are supported.
+    """
+    __slots__ = ('_landmark_set', '_index')
+
+    def __init__(self, landmark_set: 'LandmarkSet', index: int):
+        self._landmark_set = landmark_set
+        self._index = index
+
+    @property
+    def x(self) -> float:
+        return float(self._landmark_set.data[self._index, 0])
+
+    @property
+    def y(self) -> float:
+        return float(self._landmark_set.data[self._index, 1])
+
+    @property
+    def z(self) -> float:
+        return float(self._landmark_set.data[self._index, 2])
+
+    def __getattr__(self, name):
+        column = self._landmark_set.column_index(name) if name in _OPTIONAL_COLUMNS else None
+        if column is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        return float(self._landmark_set.data[self._index, column])
+
+    def __repr__(self):
+        return f'{type(self).__name__}(x={self.x}, y={self.y}, z={self.z})'
+
+class LandmarkSet:
+    """
+    A compact set of landmarks backed by a single contiguous (N, C) float32 array, the columns are x, y, z followed by
+    the optional visibility and presence.
+
+    It is a sequence of landmark views, indexable by position, by SINGLEHANDARM_LANDMARK or by landmark name, so it can
+    be passed where a list of Landmark is expected, e.g. draw2d_landmarks and plot3d_landmarks_on_figure.
+    """
+    __slots__ = ('data', '_columns', 'name2index')
+
+    def __init__(self, xyz: np.ndarray, visibility: Optional[np.ndarray] = None,
+                 presence: Optional[np.ndarray] = None, name2index: Optional[Mapping[str, int]] = None):
+        """
+        Args:
+            xyz (np.array): (N, 3) coordinates.
+            visibility (np.array, optional): (N,) visibility. Defaults to None, not supported.
+            presence (np.array, optional): (N,) presence. Defaults to None, not supported.
+            name2index (Mapping[str, int], optional): landmark names to indices. Defaults to
+                SINGLE_HAND_ARM_LANDMARK_NAME2INDEX for 23 landmarks and HAND_ARM_LANDMARK_NAME2INDEX for 46 landmarks.
+        """
+        xyz = np.asarray(xyz, dtype=np.float32)
+        columns = ['x', 'y', 'z']
+        arrays = [xyz]
+        for name, values in zip(_OPTIONAL_COLUMNS, (visibility, presence)):
+            if values is not None:
+                columns.append(name)
+                arrays.append(np.asarray(values, dtype=np.float32).reshape(-1, 1))
+        self.data = np.ascontiguousarray(np.concatenate(arrays, axis=1) if len(arrays) > 1 else xyz)
+        self._columns = tuple(columns)
+        if name2index is None:
+            name2index = {len(SINGLE_HAND_ARM_LANDMARK_NAME2INDEX): SINGLE_HAND_ARM_LANDMARK_NAME2INDEX,
+                          len(HAND_ARM_LANDMARK_NAME2INDEX): HAND_ARM_LANDMARK_NAME2INDEX}.get(len(self.data), {})
+        self.name2index = name2index
+
+    @classmethod
+    def from_landmarks(cls, landmarks: Sequence[Optional[Landmark]], **kwargs) -> 'LandmarkSet':
+        """Packs a list of Landmark, a None landmark becomes a nan row."""
+        xyz = np.array([(np.nan, np.nan, np.nan) if landmark is None else (landmark.x, landmark.y, landmark.z)
+                        for landmark in landmarks], dtype=np.float32).reshape(-1, 3)
+        return cls(xyz, **kwargs)
+
+    def column_index(self, name: str) -> Optional[int]:
+        return self._columns.index(name) if name in self._columns else None
+
+    @property
+    def xyz(self) -> np.ndarray:
+        """(N, 3) view of the coordinates."""
+        return self.data[:, :3]
+
+    @property
+    def visibility(self) -> Optional[np.ndarray]:
+        column = self.column_index('visibility')
+        return None if column is None else self.data[:, column]
+
+    @property
+    def presence(self) -> Optional[np.ndarray]:
+        column = self.column_index('presence')
+        return None if column is None else self.data[:, column]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, key: Union[int, str]) -> LandmarkView:
+        if isinstance(key, str):
+            key = self.name2index[key]
+        index = int(key)
+        if not -len(self.data) <= index < len(self.data):
+            raise IndexError(f'Landmark index {index} is out of range.')
+        return LandmarkView(self, index % len(self.data))
+
+    def __iter__(self) -> Iterator[LandmarkView]:
+        return (LandmarkView(self, i) for i in range(len(self.data)))
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.xyz, dtype=dtype)
+
+    def to_landmarks(self) -> List[Landmark]:
+        return [Landmark(float(x), float(y), float(z)) for x, y, z in self.xyz]
+
+    def __repr__(self):
+        return f'{type(self).__name__}({len(self)} landmarks, columns={self._columns})'
@@ -0,0 +1,235 @@
+"""
+Frame sources of video files and image sequences, decoding ahead in a background thread.
+
+Reading a frame with cv2 in the processing loop stalls the graphs for the decoding time. A FrameSource decodes the next
+frames in a thread while the current one is processed, both run without holding the GIL, into a ring of buffers reused
+across frames instead of allocating one per frame. Each Frame carries its index and its timestamp in the source.
+
+The image of a Frame is a ring buffer, valid until the next frame is requested: copy it to keep it longer.
+
+Usage:
+    with VideoFileSource('video.mp4', start_time=10., end_time=20., stride=2) as source:
+        for frame in source:
+            world_landmarks, uv_landmarks = solution.process(frame.image, output_format="ARRAY")
+"""
+import dataclasses
+import glob
+import os
+import queue
+import threading
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .lazy_import import LazyModule
+# imported on first use, importing Frame does not load cv2
+cv2 = LazyModule("cv2")
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Marks the end of the source in the ready queue.
+_END_OF_SOURCE = object()
+
+class _DecodeError:
+    """An exception raised by the decoding thread, raised again to the consumer."""
+    def __init__(self, error: BaseException):
+        self.error = error
+
+@dataclasses.dataclass
+class Frame:
+    """A decoded BGR frame."""
+    # index of the frame in the source, skipped frames included
+    index: int
+    # time of the frame in the source in seconds
+    timestamp: float
+    image: np.ndarray
+
+def list_image_files(directory: str) -> List[str]:
+    """Lists the image files in a directory, sorted by file name."""
+    return sorted(file for file in glob.glob(os.path.join(directory, '*'))
+                  if file.lower().endswith(IMAGE_EXTENSIONS))
+
+class FrameSource:
+    """Base of the frame sources, iterating the frames decoded ahead by a background thread.
+
+    Subclasses implement _open, _read and _close, all called from the decoding thread.
+
+    Args:
+        stride (int, optional): yield every stride-th frame. Defaults to 1.
+        prefetch (int, optional): number of frames decoded ahead, the ring has one more buffer for the frame being
+            processed. Defaults to 4.
+    """
+    def __init__(self, stride: int = 1, prefetch: int = 4):
+        if stride < 1:
+            raise ValueError(f'The stride must be positive, got {stride}')
+        self.stride = stride
+        self.prefetch = prefetch
+        self._frames = None
+
+    def _open(self):
+        pass
+
+    def _read(self, buffer: Optional[np.ndarray]) -> Optional[Tuple[np.ndarray, int, float]]:
+        """Decodes the next frame, into the buffer when it fits.
+
+        Returns:
+            The image, the index and the timestamp of the frame, None at the end of the source.
+        """
+        raise NotImplementedError()
+
+    def _close(self):
+        pass
+
+    def _decode(self, buffers: list, free_slots: queue.Queue, ready: queue.Queue, stop: threading.Event):
+        try:
+            self._open()
+            while not stop.is_set():
+                slot = free_slots.get()
+                if slot is None:
+                    break
+                frame = self._read(buffers[slot])
+                if frame is None:
+                    break
+                buffers[slot], index, timestamp = frame
+                ready.put((slot, index, timestamp))
+            ready.put(_END_OF_SOURCE)
+        except Exception as error:
+            ready.put(_DecodeError(error))
+        finally:
+            self._close()
+
+    def _iterate(self) -> Iterator[Frame]:
+        buffers = [None] * (self.prefetch + 1)
+        free_slots = queue.Queue()
+        for slot in range(len(buffers)):
+            free_slots.put(slot)
+        ready = queue.Queue()
+        stop = threading.Event()
+        thread = threading.Thread(target=self._decode, args=(buffers, free_slots, ready, stop), name='frame_source',
+                                  daemon=True)
+        thread.start()
+        slot = None
+        try:
+            while True:
+                # the previous frame is released when the next one is requested
+                if slot is not None:
+                    free_slots.put(slot)
+                item = ready.get()
+                if item is _END_OF_SOURCE:
+                    return
+                if isinstance(item, _DecodeError):
+                    raise item.error
+                slot, index, timestamp = item
+                yield Frame(index, timestamp, buffers[slot])
+        finally:
+            stop.set()
+            # wakes the thread up if waiting for a free buffer
+            free_slots.put(None)
+            thread.join()
+
+    def __iter__(self) -> Iterator[Frame]:
+        if self._frames is not None:
+            raise RuntimeError('A frame source is iterated once.')
+        self._frames = self._iterate()
+        return self._frames
+
+    def close(self):
+        """Stops the decoding thread, when the iteration is left before the end."""
+        if self._frames is not None:
+            self._frames.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class VideoFileSource(FrameSource):
+    """Frames of a video file.
+
+    Args:
+        path (str): the video file.
+        start_time (float, optional): time in seconds of the first frame, seeked to. Defaults to None, the start.
+        end_time (float, optional): time in seconds where the frames stop, excluded. Defaults to None, the end.
+        start_frame (int, optional): index of the first frame, instead of start_time. Defaults to None.
+        stop_frame (int, optional): index where the frames stop, excluded, instead of end_time. Defaults to None.
+        stride (int, optional): yield every stride-th frame, the others are grabbed without being converted. Defaults
+            to 1.
+        prefetch (int, optional): number of frames decoded ahead. Defaults to 4.
+    """
+    def __init__(self, path: str, start_time: Optional[float] = None, end_time: Optional[float] = None,
+                 start_frame: Optional[int] = None, stop_frame: Optional[int] = None, stride: int = 1,
+                 prefetch: int = 4):
+        super().__init__(stride, prefetch)
+        self.path = path
+        self.start_time = start_time
+        self.end_time = end_time
+        self.start_frame = start_frame
+        self.stop_frame = stop_frame
+        self._cap = None
+        self._next_index = 0
+
+    def _open(self):
+        self._cap = cv2.VideoCapture(self.path)
+        if not self._cap.isOpened():
+            raise ValueError(f'Can not open video file: {self.path}')
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.
+        if self.start_frame is None and self.start_time is not None:
+            self.start_frame = round(self.start_time * self.fps)
+        if self.stop_frame is None and self.end_time is not None:
+            self.stop_frame = round(self.end_time * self.fps)
+        self._next_index = self.start_frame or 0
+        if self._next_index > 0:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, self._next_index)
+
+    def _read(self, buffer):
+        index = self._next_index
+        if self.stop_frame is not None and index >= self.stop_frame:
+            return None
+        if not self._cap.grab():
+            return None
+        timestamp = self._cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.
+        success, image = self._cap.retrieve(buffer)
+        if not success:
+            return None
+        # the frames between the strides are demuxed and decoded but not converted to BGR
+        for _ in range(self.stride - 1):
+            if not self._cap.grab():
+                break
+        self._next_index = index + self.stride
+        return image, index, timestamp
+
+    def _close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+class ImageSequenceSource(FrameSource):
+    """Frames of image files, at a fixed frame rate.
+
+    Args:
+        image_files (str or List[str]): a directory of images or a list of image files, in frame order.
+        fps (float, optional): frame rate of the timestamps. Defaults to 30.
+        start_time (float, optional): time in seconds of the first frame. Defaults to None, the first image.
+        end_time (float, optional): time in seconds where the frames stop, excluded. Defaults to None, the last image.
+        stride (int, optional): yield every stride-th image, the others are not read. Defaults to 1.
+        prefetch (int, optional): number of images decoded ahead. Defaults to 4.
+    """
+    def __init__(self, image_files: Union[str, Sequence[str]], fps: float = 30., start_time: Optional[float] = None,
+                 end_time: Optional[float] = None, stride: int = 1, prefetch: int = 4):
+        super().__init__(stride, prefetch)
+        self.image_files = list_image_files(image_files) if isinstance(image_files, str) else list(image_files)
+        self.fps = fps
+        start_index = 0 if start_time is None else round(start_time * fps)
+        stop_index = len(self.image_files) if end_time is None else min(round(end_time * fps), len(self.image_files))
+        self._indices = iter(range(start_index, stop_index, stride))
+
+    def _read(self, buffer):
+        index = next(self._indices, None)
+        if index is None:
+            return None
+        # imread allocates the image, the ring bounds the images read ahead
+        image = cv2.imread(self.image_files[index])
+        if image is None:
+            raise ValueError(f'Can not read image file: {self.image_files[index]}')
+        return image, index, index / self.fps
@@ -0,0 +1,118 @@
+"""
+Hand region of interest from body pose.
+
+The pose graph already locates the wrist, the pinky and the index knuckles of both hands, so the hands graph can run on
+a crop around them instead of the full frame. Coordinates are in the flipped image the graphs run on.
+
+The crop is kept in place while it still covers the hands, see stabilize_hand_roi, so that the hands graph run on it
+tracks the hands from crop to crop instead of detecting the palms again on every frame.
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from .mp_landmark_index import MP_POSE_LANDMARK_NAME2INDEX
+
+# pose indices of ['wrist', 'pinky', 'index'] of each side
+_HAND_ANCHOR_POSE_INDICES = {
+    side: [MP_POSE_LANDMARK_NAME2INDEX[f'{side}_{name}'] for name in ['wrist', 'pinky', 'index']]
+    for side in ['left', 'right']
+}
+
+def extract_hand_anchors(pose_landmarks, sides: Sequence[str]) -> np.ndarray:
+    """Gathers the wrist, pinky and index pose landmarks of the sides.
+
+    Args:
+        pose_landmarks: mediapipe normalized pose landmarks.
+        sides (List[str]): 'left' and/or 'right'.
+
+    Returns:
+        np.array: (len(sides), 3, 3) float32 array of normalized x, y and visibility.
+    """
+    return np.array([[(pose_landmarks.landmark[i].x, pose_landmarks.landmark[i].y, pose_landmarks.landmark[i].visibility)
+                      for i in _HAND_ANCHOR_POSE_INDICES[side]] for side in sides], dtype=np.float32)
+
+def compute_hand_roi(hand_anchors: np.ndarray, image_width: int, image_height: int, scale: float = 2.0,
+                     visibility_threshold: float = 0.5, max_area_ratio: float = 0.5, min_size: int = 32
+                     ) -> Tuple[Optional[Tuple[int, int, int, int]], int]:
+    """Computes a pixel box covering the hands around their pose anchors.
+
+    Each hand is covered by a square centered at its knuckles with a half size of `scale` times the wrist to knuckle
+    distance, which reaches the finger tips in any direction. The box is the union of the squares of all visible hands.
+
+    Args:
+        hand_anchors (np.array): (N, 3, 3) anchors from extract_hand_anchors.
+        image_width (int): width of the image.
+        image_height (int): height of the image.
+        scale (float, optional): half size of a hand square relative to its wrist to knuckle distance. Defaults to 2.0.
+        visibility_threshold (float, optional): minimum visibility of a wrist to use the hand. Defaults to 0.5.
+        max_area_ratio (float, optional): no box if it covers more than this ratio of the image, as the crop would not
+            save much. Defaults to 0.5.
+        min_size (int, optional): minimum side length in pixels of a hand square. Defaults to 32.
+
+    Returns:
+        Tuple[int, int, int, int]: x0, y0, x1, y1 of the box, None if there is no visible hand or the box is too large.
+        int: number of hands in the box.
+    """
+    visible = hand_anchors[:, 0, 2] >= visibility_threshold
+    if not visible.any():
+        return None, 0
+    points = hand_anchors[visible, :, :2] * np.array([image_width, image_height], dtype=np.float32)
+    wrists = points[:, 0]
+    knuckles = points[:, 1:].mean(axis=1)
+    half_sizes = np.maximum(scale * np.linalg.norm(knuckles - wrists, axis=1), min_size / 2)
+    x0, y0 = np.floor((knuckles - half_sizes[:, None]).min(axis=0)).astype(int)
+    x1, y1 = np.ceil((knuckles + half_sizes[:, None]).max(axis=0)).astype(int)
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, image_width), min(y1, image_height)
+    if x1 - x0 < min_size or y1 - y0 < min_size:
+        # the hands are out of the image
+        return None, 0
+    if (x1 - x0) * (y1 - y0) > max_area_ratio * image_width * image_height:
+        return None, 0
+    return (int(x0), int(y0), int(x1), int(y1)), int(visible.sum())
+
+def stabilize_hand_roi(previous_roi: Optional[Tuple[int, int, int, int]], roi: Tuple[int, int, int, int],
+                       image_width: int, image_height: int, margin: float = 0.25, max_growth: float = 4.
+                       ) -> Tuple[Tuple[int, int, int, int], bool]:
+    """Keeps the previous hand box while it covers the new one, otherwise moves it with a margin around the new one.
+
+    Args:
+        previous_roi (Tuple[int, int, int, int]): the box of the previous frame, None if none.
+        roi (Tuple[int, int, int, int]): the box of the hands in this frame, from compute_hand_roi.
+        image_width (int): width of the image.
+        image_height (int): height of the image.
+        margin (float, optional): ratio of the box size added on each side of a moved box, the hands can move by it
+            before the box moves again. Defaults to 0.25.
+        max_growth (float, optional): the previous box is moved when its area is more than this times the area of the
+            new box, e.g. when the hands get further away. Defaults to 4.
+
+    Returns:
+        Tuple[int, int, int, int]: x0, y0, x1, y1 of the box to crop.
+        bool: whether the box moved, the tracking in the previous box does not apply anymore.
+    """
+    x0, y0, x1, y1 = roi
+    if previous_roi is not None:
+        px0, py0, px1, py1 = previous_roi
+        if (px0 <= x0 and py0 <= y0 and x1 <= px1 and y1 <= py1
+                and (px1 - px0) * (py1 - py0) <= max_growth * (x1 - x0) * (y1 - y0)):
+            return previous_roi, False
+    dx, dy = round(margin * (x1 - x0)), round(margin * (y1 - y0))
+    return (max(x0 - dx, 0), max(y0 - dy, 0), min(x1 + dx, image_width), min(y1 + dy, image_height)), True
+
+def remap_hand_landmarks_from_roi(hand_results, roi: Tuple[int, int, int, int], image_width: int, image_height: int):
+    """Maps in place the normalized hand landmarks of a crop to normalized coordinates of the full image.
+
+    The world landmarks are metric around the hand center and stay the same.
+    """
+    x0, y0, x1, y1 = roi
+    scale_x = (x1 - x0) / image_width
+    scale_y = (y1 - y0) / image_height
+    offset_x = x0 / image_width
+    offset_y = y0 / image_height
+    for hand_landmarks in hand_results.multi_hand_landmarks:
+        for landmark in hand_landmarks.landmark:
+            landmark.x = offset_x + landmark.x * scale_x
+            landmark.y = offset_y + landmark.y * scale_y
+            # z uses roughly the same scale as x
+            landmark.z = landmark.z * scale_x
@@ -0,0 +1,65 @@
+"""
+Inference resolution policy.
+
+The hands and pose models downsample their inputs to a few hundred pixels anyway, so high resolution frames can be
+resized once before both graphs. The normalized landmarks are relative to the image extent and keep their values for
+the original frame as the resize preserves the aspect ratio, the world landmarks are metric and do not depend on it.
+"""
+from typing import Optional
+
+class InferenceResolutionPolicy:
+    """Chooses the scale that images are resized by before running the graphs.
+
+    Args:
+        max_side (int, optional): maximum of the image width and height to run the graphs on. Defaults to None, no
+            limit.
+        latency_budget_ms (float, optional): adapt the scale to keep the graphs latency in the budget, lower when the
+            smoothed latency exceeds the budget and higher when it is under `headroom` of the budget. Defaults to
+            None, no adaption.
+        min_scale (float, optional): lowest adaptive scale. Defaults to 0.25.
+        scale_step (float, optional): relative change of the adaptive scale on each adaption. Defaults to 0.1.
+        headroom (float, optional): ratio of the budget under which the adaptive scale goes up. Defaults to 0.7.
+        smoothing (float, optional): weight of the newest latency in its exponential moving average. Defaults to 0.2.
+        cooldown (int, optional): number of frames between two adaptions, to observe the effect of the last one.
+            Defaults to 10.
+    """
+    def __init__(self, max_side: Optional[int] = None, latency_budget_ms: Optional[float] = None,
+                 min_scale: float = 0.25, scale_step: float = 0.1, headroom: float = 0.7, smoothing: float = 0.2,
+                 cooldown: int = 10):
+        self.max_side = max_side
+        self.latency_budget_ms = latency_budget_ms
+        self.min_scale = min_scale
+        self.scale_step = scale_step
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.adaptive_scale = 1.
+        self.smoothed_latency_ms = None
+        self._frames_since_adaption = 0
+
+    def scale_for(self, image_height: int, image_width: int) -> float:
+        """Returns the scale in (0, 1] to resize an image of the size by."""
+        scale = 1.
+        if self.max_side is not None:
+            scale = min(scale, self.max_side / max(image_height, image_width))
+        if self.latency_budget_ms is not None:
+            scale = min(scale, self.adaptive_scale)
+        return scale
+
+    def update(self, latency_ms: float):
+        """Feeds the graphs latency of a frame to adapt the scale to the latency budget."""
+        if self.latency_budget_ms is None:
+            return
+        if self.smoothed_latency_ms is None:
+            self.smoothed_latency_ms = latency_ms
+        else:
+            self.smoothed_latency_ms += self.smoothing * (latency_ms - self.smoothed_latency_ms)
+        self._frames_since_adaption += 1
+        if self._frames_since_adaption < self.cooldown:
+            return
+        if self.smoothed_latency_ms > self.latency_budget_ms:
+            self.adaptive_scale = max(self.min_scale, self.adaptive_scale * (1 - self.scale_step))
+            self._frames_since_adaption = 0
+        elif self.smoothed_latency_ms < self.headroom * self.latency_budget_ms and self.adaptive_scale < 1.:
+            self.adaptive_scale = min(1., self.adaptive_scale * (1 + self.scale_step))
+            self._frames_since_adaption = 0
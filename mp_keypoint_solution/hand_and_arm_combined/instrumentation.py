@@ -0,0 +1,84 @@
+"""
+Opt-in instrumentation of MPKeyPointSolution.process.
+
+Pass a ProcessMetrics to MPKeyPointSolution(metrics=...) to record the monotonic timings of each stage of every frame and
+count why a frame returned no keypoints. Without metrics, process only checks the attribute against None.
+
+Stages, in seconds:
+    resize          resize to the inference resolution
+    preprocess      flip and color conversion
+    hands_graph     hands graph
+    pose_graph      pose graph
+    graphs          both graphs, shorter than their sum with concurrent graphs
+    assembly        assembling the arm and hand keypoints
+    smoothing       filtering the keypoints over time, only with smoothing
+    total           the whole process call
+
+Outcome counters, a frame counts once per requested side for the side reasons:
+    detected            keypoints returned
+    no_hands            no hand detected
+    no_pose             no body detected
+    no_side_hand        no hand of a requested side
+    arm_not_visible     shoulder or elbow of a requested side under VISIBLE_THRESHOLD
+"""
+import collections
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+class ProcessMetrics:
+    """Rolling per stage timings and outcome counters.
+
+    Args:
+        window (int, optional): number of latest frames kept per stage for percentiles and histograms. Defaults to
+            1000.
+        callback (Callable[[Dict[str, float], List[str]], None], optional): called with the stage timings in seconds
+            and the outcome reasons of each frame, e.g. to export to a metrics system. Defaults to None.
+    """
+    def __init__(self, window: int = 1000,
+                 callback: Optional[Callable[[Dict[str, float], List[str]], None]] = None):
+        self.window = window
+        self.callback = callback
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self.counters = collections.Counter()
+        self.num_frames = 0
+        # the metrics can be read from another thread than the one calling process
+        self._lock = threading.Lock()
+
+    def record_frame(self, timings: Dict[str, float], outcomes: List[str]):
+        with self._lock:
+            self.num_frames += 1
+            for stage, latency in timings.items():
+                self._latencies[stage].append(latency)
+            self.counters.update(outcomes)
+        if self.callback is not None:
+            self.callback(timings, outcomes)
+
+    def latencies(self, stage: str) -> np.ndarray:
+        """Latest latencies of a stage in seconds."""
+        with self._lock:
+            return np.array(self._latencies.get(stage, ()), dtype=np.float64)
+
+    def histogram(self, stage: str, bins=20) -> Tuple[np.ndarray, np.ndarray]:
+        """Histogram of the latest latencies of a stage in milliseconds, see np.histogram."""
+        return np.histogram(self.latencies(stage) * 1000, bins=bins)
+
+    def snapshot(self) -> dict:
+        """Returns the p50/p95/p99/mean latency in milliseconds of each stage and the outcome counters."""
+        with self._lock:
+            stages = {stage: np.array(latencies) * 1000 for stage, latencies in self._latencies.items() if latencies}
+            counters = dict(self.counters)
+            num_frames = self.num_frames
+        summary = {}
+        for stage, latencies_ms in stages.items():
+            p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+            summary[stage] = {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+                              'mean_ms': float(latencies_ms.mean()), 'count': int(len(latencies_ms))}
+        return {'num_frames': num_frames, 'stages': summary, 'counters': counters}
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self.counters.clear()
+            self.num_frames = 0
@@ -0,0 +1,194 @@
+"""
+Keyframe scheduling of MPKeyPointSolution over video frames.
+
+The graphs run on keyframes only, the keypoints of the frames in between are predicted from the keyframe results:
+
+- process, for live streams, extrapolates from the last two keyframes at a constant speed, or holds the last one.
+- process_frames, for recorded footage, holds the frames back until the next keyframe and interpolates linearly
+  between the keyframes around them, which is more accurate at the cost of a latency of up to `stride` frames.
+
+A frame is a keyframe when `stride` frames passed since the last keyframe, or when its motion score, the mean absolute
+difference of a small thumbnail to the one of the last keyframe in 0-255 intensity levels, exceeds `motion_threshold`,
+or, when extrapolating, when the predicted keypoints moved more than `max_extrapolated_motion` in normalized units since
+the last keyframe. The stride bounds the effective inference rate to 1/stride of the frame rate on still scenes, the
+thresholds bound the error on moving ones.
+"""
+import collections
+from typing import Iterable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .mp_hand_and_arm_keypoint_solution import MPKeyPointSolution, _array_to_landmark_list, _array_to_landmark_sets
+
+def _blend(start: Optional[np.ndarray], end: Optional[np.ndarray], weight: float) -> Optional[np.ndarray]:
+    """start + weight * (end - start), nan where either is nan, None if either is None."""
+    if start is None or end is None or start.shape != end.shape:
+        return None
+    return (start + np.float32(weight) * (end - start)).astype(np.float32)
+
+class KeyframeScheduler:
+    """Runs a MPKeyPointSolution on keyframes and predicts the keypoints of the other frames.
+
+    Args:
+        solution (MPKeyPointSolution): the solution running on the keyframes, in video mode.
+        stride (int, optional): maximum number of frames from a keyframe to the next. Defaults to 3.
+        motion_threshold (float, optional): motion score from the last keyframe above which a frame is a keyframe.
+            Defaults to None, keyframes every `stride` frames.
+        max_extrapolated_motion (float, optional): displacement in normalized units of the extrapolated keypoints
+            since the last keyframe above which a frame is a keyframe. Defaults to None, no limit.
+        extrapolation (str, optional): "LINEAR" extrapolates at the speed between the last two keyframes, "HOLD"
+            repeats the last keyframe. Defaults to "LINEAR".
+        thumbnail_size (Tuple[int, int], optional): width and height of the thumbnails of the motion score. Defaults
+            to (32, 18).
+    """
+    def __init__(self, solution: MPKeyPointSolution, stride: int = 3, motion_threshold: Optional[float] = None,
+                 max_extrapolated_motion: Optional[float] = None, extrapolation: str = "LINEAR",
+                 thumbnail_size: Tuple[int, int] = (32, 18)):
+        if stride < 1:
+            raise ValueError(f'The stride must be positive, got {stride}')
+        if extrapolation not in ("LINEAR", "HOLD"):
+            raise ValueError(f'Unknown extrapolation: {extrapolation}')
+        self.solution = solution
+        self.stride = stride
+        self.motion_threshold = motion_threshold
+        self.max_extrapolated_motion = max_extrapolated_motion
+        self.extrapolation = extrapolation
+        self.thumbnail_size = tuple(thumbnail_size)
+        self.reset()
+
+    def reset(self):
+        """Forgets the keyframes, the next frame is a keyframe."""
+        self.num_frames = 0
+        self.num_keyframes = 0
+        self.last_is_keyframe = False
+        self.last_motion_score = None
+        self._key_thumbnail = None
+        # (frame index, world, uv) of the last two keyframes, the newest last
+        self._keyframes = collections.deque(maxlen=2)
+
+    @property
+    def keyframe_ratio(self) -> float:
+        """Ratio of the frames the graphs ran on, the effective inference rate relative to the frame rate."""
+        return self.num_keyframes / self.num_frames if self.num_frames else 0.
+
+    def _thumbnail(self, image: np.ndarray) -> np.ndarray:
+        return cv2.resize(image, self.thumbnail_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def _is_keyframe(self, thumbnail: np.ndarray, frame_index: int) -> bool:
+        if not self._keyframes or frame_index - self._keyframes[-1][0] >= self.stride:
+            return True
+        if self.motion_threshold is not None:
+            self.last_motion_score = float(np.abs(thumbnail - self._key_thumbnail).mean())
+            if self.last_motion_score > self.motion_threshold:
+                return True
+        return False
+
+    def _infer(self, image: np.ndarray, thumbnail: np.ndarray, frame_index: int, type: str, process_kwargs: dict):
+        world_landmarks, uv_landmarks = self.solution.process(image, type, "ARRAY", **process_kwargs)
+        self._keyframes.append((frame_index, world_landmarks, uv_landmarks))
+        self._key_thumbnail = thumbnail
+        self.num_keyframes += 1
+        return world_landmarks, uv_landmarks
+
+    def _extrapolate(self, frame_index: int):
+        index, world_landmarks, uv_landmarks = self._keyframes[-1]
+        if self.extrapolation == "HOLD" or len(self._keyframes) < 2:
+            return world_landmarks, uv_landmarks
+        previous_index, previous_world, previous_uv = self._keyframes[0]
+        weight = (frame_index - previous_index) / (index - previous_index)
+        return _blend(previous_world, world_landmarks, weight), _blend(previous_uv, uv_landmarks, weight)
+
+    @staticmethod
+    def _format(world_landmarks, uv_landmarks, type: str, output_format: str):
+        if world_landmarks is None:
+            return None, None
+        if output_format == "LANDMARK_LIST":
+            return _array_to_landmark_list(world_landmarks), _array_to_landmark_list(uv_landmarks)
+        if output_format == "LANDMARK_SET":
+            return _array_to_landmark_sets(world_landmarks, uv_landmarks, type)
+        return world_landmarks, uv_landmarks
+
+    def process(self, image: np.ndarray, type="BOTH_SIDE", output_format="ARRAY", **process_kwargs):
+        """Processes the next frame of a live stream, running the graphs on keyframes only.
+
+        Args:
+            image (np.array): the frame.
+            type (str, optional): see MPKeyPointSolution.process. Defaults to "BOTH_SIDE".
+            output_format (str, optional): see MPKeyPointSolution.process. Defaults to "ARRAY".
+            **process_kwargs: other arguments of MPKeyPointSolution.process.
+
+        Returns:
+            The world and normalized keypoints, extrapolated for a frame that is not a keyframe, whether it is in
+            last_is_keyframe.
+        """
+        frame_index = self.num_frames
+        self.num_frames += 1
+        thumbnail = self._thumbnail(image)
+        self.last_is_keyframe = self._is_keyframe(thumbnail, frame_index)
+        if not self.last_is_keyframe:
+            world_landmarks, uv_landmarks = self._extrapolate(frame_index)
+            if self.max_extrapolated_motion is not None and uv_landmarks is not None:
+                motion = np.linalg.norm(uv_landmarks - self._keyframes[-1][2], axis=-1)
+                self.last_is_keyframe = bool(np.nanmax(motion, initial=0.) > self.max_extrapolated_motion)
+        if self.last_is_keyframe:
+            world_landmarks, uv_landmarks = self._infer(image, thumbnail, frame_index, type, process_kwargs)
+        return self._format(world_landmarks, uv_landmarks, type, output_format)
+
+    def process_frames(self, frames: Iterable[np.ndarray], type="BOTH_SIDE", output_format="ARRAY",
+                       copy_frames: bool = True, **process_kwargs) -> Iterator[Tuple[np.ndarray, object, object]]:
+        """Processes recorded frames, interpolating the keypoints of the frames between keyframes.
+
+        The last frame is always a keyframe, so that no frame is extrapolated.
+
+        Args:
+            frames (Iterable[np.array]): the frames in order.
+            type (str, optional): see MPKeyPointSolution.process. Defaults to "BOTH_SIDE".
+            output_format (str, optional): see MPKeyPointSolution.process. Defaults to "ARRAY".
+            copy_frames (bool, optional): copy the frames held back until the next keyframe, the source may reuse its
+                buffers, as the images of a FrameSource do. Defaults to True, False only for sources allocating every
+                frame.
+            **process_kwargs: other arguments of MPKeyPointSolution.process.
+
+        Yields:
+            The frame, the world keypoints and the normalized keypoints, in frame order.
+        """
+        pending = []
+        previous = None
+
+        def flush(keyframe):
+            # the held back frames lie between the previous keyframe and this one
+            index, world_landmarks, uv_landmarks = keyframe
+            for frame_index, frame in pending:
+                if previous is None:
+                    results = world_landmarks, uv_landmarks
+                else:
+                    weight = (frame_index - previous[0]) / (index - previous[0])
+                    results = (_blend(previous[1], world_landmarks, weight),
+                               _blend(previous[2], uv_landmarks, weight))
+                yield (frame,) + self._format(*results, type, output_format)
+            pending.clear()
+
+        for image in frames:
+            frame_index = self.num_frames
+            self.num_frames += 1
+            thumbnail = self._thumbnail(image)
+            if not self._is_keyframe(thumbnail, frame_index):
+                pending.append((frame_index, image.copy() if copy_frames else image))
+                continue
+            if pending and self.motion_threshold is not None:
+                # the held back frame before the motion is the end of the interpolation
+                pending_index, pending_image = pending.pop()
+                self._infer(pending_image, self._thumbnail(pending_image), pending_index, type, process_kwargs)
+                yield from flush(self._keyframes[-1])
+                yield (pending_image,) + self._format(*self._keyframes[-1][1:], type, output_format)
+                previous = self._keyframes[-1]
+            self._infer(image, thumbnail, frame_index, type, process_kwargs)
+            yield from flush(self._keyframes[-1])
+            previous = self._keyframes[-1]
+            yield (image,) + self._format(*previous[1:], type, output_format)
+        if pending:
+            pending_index, pending_image = pending.pop()
+            self._infer(pending_image, self._thumbnail(pending_image), pending_index, type, process_kwargs)
+            yield from flush(self._keyframes[-1])
+            yield (pending_image,) + self._format(*self._keyframes[-1][1:], type, output_format)
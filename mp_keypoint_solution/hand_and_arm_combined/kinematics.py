@@ -0,0 +1,142 @@
+"""
+Kinematic features of the 23 arm and hand keypoints: bone vectors and lengths, joint angles and the palm orientation.
+
+The bones are the edges of SINGLE_ARM_HAND_CONNECTIONS and the joint angles are taken along the chains of the arm and of
+each finger, gathered once into parent/child index arrays here, so that the features of a frame or of a (T, 23, 3)
+sequence are a few numpy operations. Any leading dimensions are supported, e.g. the "BOTH_SIDE" (46, 3) keypoints
+reshaped to (2, 23, 3). Missing keypoints (nan) give nan features.
+
+Usage:
+    features = extract_kinematics(world_landmarks, "RIGHT_SIDE")
+    elbow_flexion = features.joint_angles[..., JOINT_ANGLE_NAMES.index('elbow')]
+"""
+import dataclasses
+
+import numpy as np
+
+from .mp_landmark_index import SINGLE_HAND_ARM_LANDMARK_NAME2INDEX, ONESIDE_HAND_ARM_LANDMARK_NAMES
+from .visualize.single_hand_arm_connections import SINGLE_ARM_HAND_CONNECTIONS
+
+# (parent, child) keypoint indices of every bone
+BONES = tuple(sorted(SINGLE_ARM_HAND_CONNECTIONS))
+BONE_NAMES = [f'{ONESIDE_HAND_ARM_LANDMARK_NAMES[parent]}-{ONESIDE_HAND_ARM_LANDMARK_NAMES[child]}'
+              for parent, child in BONES]
+_BONE_PARENTS = np.array([parent for parent, _ in BONES])
+_BONE_CHILDREN = np.array([child for _, child in BONES])
+
+# keypoint chains from the body to the tips, the wrist is bent toward the middle finger
+_CHAINS = [
+    ['shoulder', 'elbow', 'wrist', 'middle_finger_mcp'],
+    ['wrist', 'thumb_cmc', 'thumb_mcp', 'thumb_ip', 'thumb_tip'],
+] + [['wrist'] + [f'{finger}_finger_{joint}' for joint in ['mcp', 'pip', 'dip', 'tip']]
+     for finger in ['index', 'middle', 'ring', 'pinky']]
+# (parent, joint, child) keypoint indices of every joint angle, the middle keypoint of three consecutive in a chain
+_JOINTS = [tuple(SINGLE_HAND_ARM_LANDMARK_NAME2INDEX[name] for name in chain[i:i + 3])
+           for chain in _CHAINS for i in range(len(chain) - 2)]
+JOINT_ANGLE_NAMES = [ONESIDE_HAND_ARM_LANDMARK_NAMES[joint] for _, joint, _ in _JOINTS]
+_JOINT_PARENTS, _JOINT_INDICES, _JOINT_CHILDREN = (np.array(indices) for indices in zip(*_JOINTS))
+
+_WRIST_INDEX = SINGLE_HAND_ARM_LANDMARK_NAME2INDEX['wrist']
+_INDEX_MCP_INDEX = SINGLE_HAND_ARM_LANDMARK_NAME2INDEX['index_finger_mcp']
+_PINKY_MCP_INDEX = SINGLE_HAND_ARM_LANDMARK_NAME2INDEX['pinky_finger_mcp']
+# the keypoints of the two sides are mirror images, the normal of (index knuckle - wrist, pinky knuckle - wrist) comes
+# out of the palm of the left hand and out of the back of the right hand. The "BOTH_SIDE" signs broadcast over the
+# (..., 2, 3) axes of the left then right hands.
+_PALM_SIDE_SIGNS = {
+    "LEFT_SIDE": 1.,
+    "RIGHT_SIDE": -1.,
+    "BOTH_SIDE": np.array([[1.], [-1.]], dtype=np.float32),
+}
+
+@dataclasses.dataclass
+class KinematicFeatures:
+    """Kinematic features of keypoints of shape (..., 23, 3)."""
+    # (..., len(BONES), 3) vectors from the parent to the child keypoint of each bone
+    bone_vectors: np.ndarray
+    # (..., len(BONES)) lengths of the bones
+    bone_lengths: np.ndarray
+    # (..., len(JOINT_ANGLE_NAMES)) flexion angles in radians, 0 when the two bones of the joint are aligned
+    joint_angles: np.ndarray
+    # (..., 3, 3) rotation matrices of the palm, see palm_orientation
+    palm_orientation: np.ndarray
+
+def _as_keypoints(keypoints) -> np.ndarray:
+    keypoints = np.asarray(keypoints)[..., :3]
+    if keypoints.shape[-2] != len(ONESIDE_HAND_ARM_LANDMARK_NAMES):
+        raise ValueError(f'Expected keypoints of shape (..., {len(ONESIDE_HAND_ARM_LANDMARK_NAMES)}, 3), got '
+                         f'{keypoints.shape}')
+    return keypoints.astype(np.float32, copy=False)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+def bone_vectors(keypoints) -> np.ndarray:
+    """Returns the (..., len(BONES), 3) vectors from the parent to the child keypoint of each bone."""
+    keypoints = _as_keypoints(keypoints)
+    return keypoints[..., _BONE_CHILDREN, :] - keypoints[..., _BONE_PARENTS, :]
+
+def bone_lengths(keypoints) -> np.ndarray:
+    """Returns the (..., len(BONES)) lengths of the bones, in the unit of the keypoints."""
+    return np.linalg.norm(bone_vectors(keypoints), axis=-1)
+
+def joint_angles(keypoints, degrees: bool = False) -> np.ndarray:
+    """Returns the (..., len(JOINT_ANGLE_NAMES)) flexion angles of the joints, 0 when straight.
+
+    Args:
+        keypoints (np.array): (..., 23, 3) keypoints, world keypoints for angles in 3D.
+        degrees (bool, optional): in degrees instead of radians. Defaults to False.
+    """
+    keypoints = _as_keypoints(keypoints)
+    incoming = keypoints[..., _JOINT_INDICES, :] - keypoints[..., _JOINT_PARENTS, :]
+    outgoing = keypoints[..., _JOINT_CHILDREN, :] - keypoints[..., _JOINT_INDICES, :]
+    # atan2 of the sine and the cosine, accurate for nearly straight joints unlike arccos
+    angles = np.arctan2(np.linalg.norm(np.cross(incoming, outgoing), axis=-1), (incoming * outgoing).sum(axis=-1))
+    return np.degrees(angles) if degrees else angles
+
+def palm_orientation(keypoints, type: str) -> np.ndarray:
+    """Returns the (..., 3, 3) rotation matrices of the palm, the columns being the palm axes in keypoint coordinates.
+
+    z is the normal of the palm plane through the wrist and the index and pinky knuckles, coming out of the palm, y
+    points roughly from the wrist to the knuckles, and x completes the right handed frame: from the pinky to the index
+    knuckle of a left hand, from the index to the pinky knuckle of a right hand.
+
+    Args:
+        keypoints (np.array): (..., 23, 3) keypoints, or (..., 2, 23, 3) left then right keypoints for "BOTH_SIDE".
+        type (str): "LEFT_SIDE", "RIGHT_SIDE" or "BOTH_SIDE", the side of the keypoints.
+
+    Raises:
+        ValueError: If the type is unknown, or the "BOTH_SIDE" keypoints are not of shape (..., 2, 23, 3).
+    """
+    if type not in _PALM_SIDE_SIGNS:
+        raise ValueError(f'Unknown type: {type}')
+    keypoints = _as_keypoints(keypoints)
+    if type == "BOTH_SIDE" and (keypoints.ndim < 3 or keypoints.shape[-3] != 2):
+        raise ValueError(f'Expected "BOTH_SIDE" keypoints of shape (..., 2, {len(ONESIDE_HAND_ARM_LANDMARK_NAMES)}, '
+                         f'3), got {keypoints.shape}')
+    sign = _PALM_SIDE_SIGNS[type]
+    wrist = keypoints[..., _WRIST_INDEX, :]
+    index_mcp = keypoints[..., _INDEX_MCP_INDEX, :]
+    pinky_mcp = keypoints[..., _PINKY_MCP_INDEX, :]
+    x_axis = sign * _normalize(index_mcp - pinky_mcp)
+    z_axis = sign * _normalize(np.cross(index_mcp - wrist, pinky_mcp - wrist))
+    y_axis = np.cross(z_axis, x_axis)
+    return np.stack([x_axis, y_axis, z_axis], axis=-1)
+
+def extract_kinematics(keypoints, type: str, degrees: bool = False) -> KinematicFeatures:
+    """Computes all the kinematic features of (..., 23, 3) keypoints at once.
+
+    Args:
+        keypoints (np.array or LandmarkSet): (23, 3) keypoints of a frame, (T, 23, 3) of a sequence, or any leading
+            dimensions.
+        type (str): "LEFT_SIDE", "RIGHT_SIDE" or "BOTH_SIDE", the side of the keypoints, see palm_orientation.
+        degrees (bool, optional): joint angles in degrees instead of radians. Defaults to False.
+
+    Returns:
+        KinematicFeatures: the features, nan where a keypoint they depend on is nan.
+    """
+    keypoints = _as_keypoints(keypoints)
+    vectors = bone_vectors(keypoints)
+    return KinematicFeatures(bone_vectors=vectors, bone_lengths=np.linalg.norm(vectors, axis=-1),
+                             joint_angles=joint_angles(keypoints, degrees),
+                             palm_orientation=palm_orientation(keypoints, type))
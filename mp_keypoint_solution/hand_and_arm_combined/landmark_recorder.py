@@ -0,0 +1,182 @@
+"""
+Columnar recording of arm and hand keypoints.
+
+A recording is a directory with a `meta.json` and one raw little-endian file per column, each holding a fixed-stride
+record per frame:
+
+    timestamp.f8    float64 timestamp in seconds
+    valid.u1        uint8, 1 if the keypoints of the frame are detected
+    world.f4        float32 (num_landmarks, 3) world keypoints, nan if not valid
+    uv.f4           float32 (num_landmarks, 3) normalized keypoints, nan if not valid
+
+Frames are appended to the end of the column files, and LandmarkRecording memory-maps them so millions of frames can be
+sliced without loading or recomputing them. A frame partially written by an interrupted recorder is ignored.
+"""
+import json
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+_FORMAT_VERSION = 1
+
+def _column_specs(num_landmarks: int):
+    """Column name to (file name, dtype, per frame shape)."""
+    return {
+        'timestamp': ('timestamp.f8', np.dtype('<f8'), ()),
+        'valid': ('valid.u1', np.dtype('u1'), ()),
+        'world': ('world.f4', np.dtype('<f4'), (num_landmarks, 3)),
+        'uv': ('uv.f4', np.dtype('<f4'), (num_landmarks, 3)),
+    }
+
+def _as_array(landmarks, num_landmarks: int) -> np.ndarray:
+    """Converts an array, a LandmarkSet or a list of Landmark (None for missing) to a (num_landmarks, 3) array."""
+    if isinstance(landmarks, np.ndarray):
+        array = landmarks
+    elif hasattr(landmarks, 'xyz'):
+        array = landmarks.xyz
+    else:
+        array = [(np.nan, np.nan, np.nan) if landmark is None else (landmark.x, landmark.y, landmark.z)
+                 for landmark in landmarks]
+    array = np.asarray(array, dtype=np.float32)
+    if array.shape != (num_landmarks, 3):
+        raise ValueError(f'Expect {num_landmarks} landmarks of shape ({num_landmarks}, 3), got {array.shape}.')
+    return array
+
+class LandmarkRecorder:
+    """Appends the per frame output of MPKeyPointSolution.process to a recording.
+
+    Args:
+        path (str): directory of the recording.
+        num_landmarks (int, optional): 23 for a single side, 46 for "BOTH_SIDE". Defaults to 23.
+        mode (str, optional): "w" to create or overwrite a recording, "a" to append to an existing one. Defaults to "w".
+        buffer_frames (int, optional): number of frames buffered in memory between writes. Defaults to 256.
+    """
+    def __init__(self, path: str, num_landmarks: int = 23, mode: str = "w", buffer_frames: int = 256):
+        if mode not in ("w", "a"):
+            raise ValueError(f'Unknown mode: {mode}')
+        self.path = path
+        self.num_landmarks = num_landmarks
+        meta_file = os.path.join(path, 'meta.json')
+        if mode == "a" and os.path.exists(meta_file):
+            with open(meta_file) as f:
+                meta = json.load(f)
+            if meta['num_landmarks'] != num_landmarks:
+                raise ValueError(f'Can not append {num_landmarks} landmarks to a recording of '
+                                 f'{meta["num_landmarks"]} landmarks.')
+            # drop a frame partially written by an interrupted recorder, to keep the columns aligned
+            num_frames = len(LandmarkRecording(path))
+        else:
+            os.makedirs(path, exist_ok=True)
+            with open(meta_file, 'w') as f:
+                json.dump({'version': _FORMAT_VERSION, 'num_landmarks': num_landmarks}, f)
+            num_frames = 0
+        self._specs = _column_specs(num_landmarks)
+        self._files = {}
+        for name, (file_name, dtype, shape) in self._specs.items():
+            file = open(os.path.join(path, file_name), 'r+b' if num_frames else 'wb')
+            file.truncate(num_frames * dtype.itemsize * int(np.prod(shape)))
+            file.seek(0, os.SEEK_END)
+            self._files[name] = file
+        self._buffers = {name: np.empty((buffer_frames,) + shape, dtype=dtype)
+                         for name, (_, dtype, shape) in self._specs.items()}
+        self._num_buffered = 0
+        self.num_frames = num_frames
+
+    def append(self, world_landmarks, uv_landmarks, timestamp: Optional[float] = None):
+        """Appends the keypoints of a frame.
+
+        Args:
+            world_landmarks: world keypoints as returned by MPKeyPointSolution.process in any output format, None if
+                not detected.
+            uv_landmarks: normalized keypoints, None if not detected.
+            timestamp (float, optional): timestamp of the frame in seconds. Defaults to the current time.
+        """
+        i = self._num_buffered
+        valid = world_landmarks is not None and uv_landmarks is not None
+        self._buffers['timestamp'][i] = time.time() if timestamp is None else timestamp
+        self._buffers['valid'][i] = valid
+        if valid:
+            self._buffers['world'][i] = _as_array(world_landmarks, self.num_landmarks)
+            self._buffers['uv'][i] = _as_array(uv_landmarks, self.num_landmarks)
+        else:
+            self._buffers['world'][i] = np.nan
+            self._buffers['uv'][i] = np.nan
+        self._num_buffered += 1
+        self.num_frames += 1
+        if self._num_buffered == len(self._buffers['timestamp']):
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered frames to the column files."""
+        for name, file in self._files.items():
+            file.write(self._buffers[name][:self._num_buffered].tobytes())
+            file.flush()
+        self._num_buffered = 0
+
+    def close(self):
+        if self._files:
+            self.flush()
+            for file in self._files.values():
+                file.close()
+            self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class LandmarkRecording:
+    """Memory-mapped read access to a recording.
+
+    The columns are (N,) `timestamps` and `valid`, and (N, num_landmarks, 3) `world` and `uv` arrays, read from disk on
+    access only.
+
+    Args:
+        path (str): directory of the recording.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] > _FORMAT_VERSION:
+            raise ValueError(f'Unsupported recording version: {meta["version"]}')
+        self.num_landmarks = meta['num_landmarks']
+        specs = _column_specs(self.num_landmarks)
+        # the complete frames of all the columns
+        num_frames = min(os.path.getsize(os.path.join(path, file_name)) // (dtype.itemsize * int(np.prod(shape)))
+                         for file_name, dtype, shape in specs.values())
+        self._columns = {}
+        for name, (file_name, dtype, shape) in specs.items():
+            if num_frames == 0:
+                # an empty file can not be memory-mapped
+                self._columns[name] = np.empty((0,) + shape, dtype=dtype)
+            else:
+                self._columns[name] = np.memmap(os.path.join(path, file_name), dtype=dtype, mode='r',
+                                                shape=(num_frames,) + shape)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._columns['timestamp']
+
+    @property
+    def valid(self) -> np.ndarray:
+        return self._columns['valid']
+
+    @property
+    def world(self) -> np.ndarray:
+        return self._columns['world']
+
+    @property
+    def uv(self) -> np.ndarray:
+        return self._columns['uv']
+
+    def __len__(self) -> int:
+        return len(self._columns['timestamp'])
+
+    def time_range(self, start_time: float, end_time: float) -> slice:
+        """Returns the slice of the frames with start_time <= timestamp < end_time, for increasing timestamps."""
+        start, end = np.searchsorted(self.timestamps, [start_time, end_time])
+        return slice(int(start), int(end))
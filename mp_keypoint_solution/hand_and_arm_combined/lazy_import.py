@@ -0,0 +1,60 @@
+"""
+Lazy loading of heavy modules.
+
+cv2 and mediapipe take around a second to import, a LazyModule stands for such a module and imports it on the first
+attribute access, so that processes only using the index tables or the data structures start fast.
+"""
+import importlib
+import types
+
+class LazyModule(types.ModuleType):
+    """A module imported on first attribute access.
+
+    After the import, the attributes of the module are copied to the LazyModule, so that later accesses are as fast as
+    on the module itself.
+
+    Args:
+        name (str): absolute name of the module, e.g. "mediapipe.python.solutions.hands".
+    """
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self) -> types.ModuleType:
+        if self._module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__.update(module.__dict__)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, name: str):
+        # only called for the attributes not copied yet
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        status = 'loaded' if self._module is not None else 'not loaded'
+        return f'<{type(self).__name__} {self.__name__!r} ({status})>'
+
+def lazy_attributes(package_name: str, attribute_modules: dict):
+    """Returns the module __getattr__ and __dir__ of a package exporting attributes of its submodules on first access.
+
+    Args:
+        package_name (str): __name__ of the package.
+        attribute_modules (dict): exported attribute names to the relative name of their submodule, e.g.
+            {"LandmarkSet": ".landmark_set"}.
+    """
+    def __getattr__(name: str):
+        if name not in attribute_modules:
+            raise AttributeError(f'module {package_name!r} has no attribute {name!r}')
+        value = getattr(importlib.import_module(attribute_modules[name], package_name), name)
+        # cached in the package, __getattr__ is not called again for it
+        setattr(importlib.import_module(package_name), name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(importlib.import_module(package_name))) | set(attribute_modules))
+
+    return __getattr__, __dir__
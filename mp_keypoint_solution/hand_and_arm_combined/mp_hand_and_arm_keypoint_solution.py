@@ -17,16 +17,28 @@ Refs:
             x, y and z: Real-world 3D coordinates in meters with the origin at the center between hips.
             visibility: Identical to that defined in the corresponding pose_landmarks.
 """
+import time
 import numpy as np
 import numpy.typing as npt
 
-from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
 from .data_structures.landmark import Landmark
-import cv2
-import mediapipe as mp
-mp_hands = mp.solutions.hands
-mp_pose = mp.solutions.pose
+from .data_structures.landmark_set import LandmarkSet
+from .lazy_import import LazyModule
+# imported on first use, the solution module loads fast and the graphs are built on the first process call
+cv2 = LazyModule("cv2")
+mp = LazyModule("mediapipe")
+mp_hands = LazyModule("mediapipe.python.solutions.hands")
+mp_pose = LazyModule("mediapipe.python.solutions.pose")
 from .mp_landmark_index import MP_POSE_LANDMARK_NAME2INDEX, ONESIDE_HAND_ARM_LANDMARK_NAMES, MP_HAND_LANDMARK_NAME2INDEX
+from .hand_roi import compute_hand_roi, extract_hand_anchors, remap_hand_landmarks_from_roi, stabilize_hand_roi
+from .inference_resolution import InferenceResolutionPolicy
+from .instrumentation import ProcessMetrics
+from .smoothing import LandmarkSmoother
+from .person_association import greedy_assignment, hand_to_wrist_cost
+from .result_cache import ResultCache
+from .profiles import AdaptiveProfileController, ModelProfile, get_profile
 
 def center(nested_array_list):
     a = np.array(nested_array_list)
@@ -35,44 +47,676 @@ def center(nested_array_list):
 
 VISIBLE_THRESHOLD =0.5
 
+# sides to assemble for each process type, "BOTH_SIDE" follows the left-then-right order of HAND_ARM_LANDMARK_NAME2INDEX
+_TYPE2SIDES = {
+    "LEFT_SIDE": ("left",),
+    "RIGHT_SIDE": ("right",),
+    "BOTH_SIDE": ("left", "right"),
+}
+
+# Precomputed integer gather indices for the array output, in the order of ONESIDE_HAND_ARM_LANDMARK_NAMES: the first two
+# ['shoulder', 'elbow'] come from body pose (plus the pose 'wrist' used to stitch the hand), the rest from hand pose.
+_ARM_POSE_INDICES = {
+    side: np.array([MP_POSE_LANDMARK_NAME2INDEX[f'{side}_{name}'] for name in ['shoulder', 'elbow', 'wrist']])
+    for side in ['left', 'right']
+}
+_HAND_INDICES = np.array([MP_HAND_LANDMARK_NAME2INDEX[name] for name in ONESIDE_HAND_ARM_LANDMARK_NAMES[2:]])
+_HAND_WRIST_INDEX = MP_HAND_LANDMARK_NAME2INDEX['wrist']
+
+def _landmark_list_to_array(landmarks, indices=None, with_visibility=False) -> np.ndarray:
+    """Gathers mediapipe landmarks into a (N, 3) float32 array, or (N, 4) with visibility as the last column."""
+    if indices is not None:
+        landmarks = [landmarks[i] for i in indices]
+    if with_visibility:
+        return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float32)
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmarks], dtype=np.float32)
+
+def _assemble_arm_hand_array(pose_results, hand_world_landmarks, hand_normalized_landmarks, pose_indices
+                             ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Assembles the 23 arm and hand keypoints of one side into (23, 3) float32 world and uv arrays.
+
+    Args:
+        pose_results: mediapipe pose results with pose_world_landmarks and pose_landmarks.
+        hand_world_landmarks: mediapipe hand world landmarks of the same side.
+        hand_normalized_landmarks: mediapipe hand normalized landmarks of the same side.
+        pose_indices (np.array): pose indices of ['shoulder', 'elbow', 'wrist'] of the side.
+
+    Returns:
+        np.array: (23, 3) world keypoints, the hand is translated to make its wrist meet the pose wrist.
+        np.array: (23, 3) normalized keypoints.
+        Both are None if shoulder or elbow is not visible.
+    """
+    pose_world = _landmark_list_to_array(pose_results.pose_world_landmarks.landmark, pose_indices, with_visibility=True)
+    pose_uv = _landmark_list_to_array(pose_results.pose_landmarks.landmark, pose_indices, with_visibility=True)
+    if (pose_world[:2, 3] < VISIBLE_THRESHOLD).any() or (pose_uv[:2, 3] < VISIBLE_THRESHOLD).any():
+        return None, None
+
+    hand_world = _landmark_list_to_array(hand_world_landmarks.landmark)
+    hand_uv = _landmark_list_to_array(hand_normalized_landmarks.landmark)
+
+    arm_hand_world_landmarks = np.empty((len(ONESIDE_HAND_ARM_LANDMARK_NAMES), 3), dtype=np.float32)
+    arm_hand_uv_landmarks = np.empty((len(ONESIDE_HAND_ARM_LANDMARK_NAMES), 3), dtype=np.float32)
+    arm_hand_world_landmarks[:2] = pose_world[:2, :3]
+    arm_hand_uv_landmarks[:2] = pose_uv[:2, :3]
+    # connect the hand and body in different coordinated(have same axes with different origin) with assuming that the
+    # wrist is the same position, by one broadcast subtraction of the dxyz of origin of hand and pose cooridate
+    twist_hand2pose_dxyz = hand_world[_HAND_WRIST_INDEX] - pose_world[2, :3]
+    np.subtract(hand_world[_HAND_INDICES], twist_hand2pose_dxyz, out=arm_hand_world_landmarks[2:])
+    arm_hand_uv_landmarks[2:] = hand_uv[_HAND_INDICES]
+    return arm_hand_world_landmarks, arm_hand_uv_landmarks
+
+def _array_to_landmark_list(array: np.ndarray) -> List[Optional[Landmark]]:
+    """Converts a (N, 3) array to a list of Landmark, None for a nan row."""
+    return [None if np.isnan(x) else Landmark(x, y, z) for x, y, z in array.tolist()]
+
+def _array_to_landmark_sets(world_landmarks: Optional[np.ndarray], uv_landmarks: Optional[np.ndarray], type: str
+                            ) -> Tuple[Optional[LandmarkSet], Optional[LandmarkSet]]:
+    """Wraps the "ARRAY" results into LandmarkSet, with a presence column for "BOTH_SIDE"."""
+    if world_landmarks is None:
+        return None, None
+    # the keypoints of an undetected side are not present
+    presence = (~np.isnan(world_landmarks[:, 0])).astype(np.float32) if type == "BOTH_SIDE" else None
+    return LandmarkSet(world_landmarks, presence=presence), LandmarkSet(uv_landmarks, presence=presence)
+
+def _assemble_people(hand_results, people_pose_results, aspect_ratio: float, handedness_penalty: float = 0.5,
+                     max_cost: float = 1.) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Assembles the arm and hand keypoints of each person, the hands matched to the arms by person_association.
+
+    Args:
+        hand_results: results of the hands graph.
+        people_pose_results (List): results of the pose graph of each person.
+        aspect_ratio (float): width over height of the image the graphs ran on.
+        handedness_penalty (float, optional): see hand_to_wrist_cost. Defaults to 0.5.
+        max_cost (float, optional): see greedy_assignment, in forearm lengths. Defaults to 1.
+
+    Returns:
+        List[Tuple[np.array, np.array]]: the (46, 3) world and normalized keypoints of each person with an assigned
+        hand, in the layout of "BOTH_SIDE" with nan rows for an unassigned side.
+    """
+    people_pose_results = [pose_results for pose_results in people_pose_results
+                           if pose_results.pose_world_landmarks is not None]
+    if not people_pose_results or not hand_results.multi_hand_landmarks:
+        return []
+    sides = _TYPE2SIDES["BOTH_SIDE"]
+    # the shoulder, elbow and wrist of every arm, left then right of each person
+    arms = np.stack([_landmark_list_to_array(pose_results.pose_landmarks.landmark, _ARM_POSE_INDICES[side],
+                                             with_visibility=True)
+                     for pose_results in people_pose_results for side in sides])
+    forearm_lengths = np.linalg.norm((arms[:, 2, :2] - arms[:, 1, :2]) * (aspect_ratio, 1.), axis=-1)
+    # an arm without a visible shoulder and elbow is not assembled, it takes no hand
+    forearm_lengths[(arms[:, :2, 3] < VISIBLE_THRESHOLD).any(axis=1)] = np.nan
+    hand_wrist_uv = np.array([_landmark_list_to_array(hand_landmarks.landmark, [_HAND_WRIST_INDEX])[0, :2]
+                              for hand_landmarks in hand_results.multi_hand_landmarks])
+    hand_sides = np.array([0 if handedness.classification[0].label == "Left" else 1
+                           for handedness in hand_results.multi_handedness])
+    arm_sides = np.tile(np.arange(len(sides)), len(people_pose_results))
+    cost = hand_to_wrist_cost(arms[:, 2, :2], forearm_lengths, arm_sides, hand_wrist_uv, hand_sides, aspect_ratio,
+                              handedness_penalty)
+    arm_indices, hand_indices = greedy_assignment(cost, max_cost)
+
+    num_oneside_landmarks = len(ONESIDE_HAND_ARM_LANDMARK_NAMES)
+    people = {}
+    for arm_index, hand_index in zip(arm_indices.tolist(), hand_indices.tolist()):
+        person_index, side_index = divmod(arm_index, len(sides))
+        world_landmarks, uv_landmarks = _assemble_arm_hand_array(
+            people_pose_results[person_index], hand_results.multi_hand_world_landmarks[hand_index],
+            hand_results.multi_hand_landmarks[hand_index], _ARM_POSE_INDICES[sides[side_index]])
+        if person_index not in people:
+            people[person_index] = (np.full((len(sides) * num_oneside_landmarks, 3), np.nan, dtype=np.float32),
+                                    np.full((len(sides) * num_oneside_landmarks, 3), np.nan, dtype=np.float32))
+        rows = slice(side_index * num_oneside_landmarks, (side_index + 1) * num_oneside_landmarks)
+        people[person_index][0][rows] = world_landmarks
+        people[person_index][1][rows] = uv_landmarks
+    return [people[person_index] for person_index in sorted(people)]
+
+def _format_landmark(landmark):
+    return Landmark(landmark.x, landmark.y, landmark.z)
+
+def _assemble_arm_hand_landmarks(pose_results, hand_world_landmarks, hand_normalized_landmarks, pose_indices
+                                 ) -> Tuple[Optional[List[Landmark]], Optional[List[Landmark]]]:
+    """Assembles the 23 arm and hand keypoints of one side into lists of Landmark, see _assemble_arm_hand_array."""
+    # Got a array of landmarks if not visible set None
+    arm_hand_uv_landmarks = []
+    arm_hand_world_landmarks = []
+    
+    # first two are ['shoulder' 'elbow'] from body pose, followed by ['wrist', 'thumb_xxx', ...] from hand pose
+    
+    for pose_index in pose_indices[:2]: 
+        # fill the 'shoulder', 'elbow' keypoint
+        current_world_landmark = pose_results.pose_world_landmarks.landmark[pose_index]
+        if current_world_landmark.visibility < VISIBLE_THRESHOLD:
+            arm_hand_world_landmarks.append(None)
+            return None, None
+        else:
+            arm_hand_world_landmarks.append(_format_landmark(current_world_landmark))
+            
+    for pose_index in pose_indices[:2]: 
+        # fill the 'shoulder', 'elbow' normalized keypoint
+        current_uv_landmark = pose_results.pose_landmarks.landmark[pose_index]
+        if current_uv_landmark.visibility < VISIBLE_THRESHOLD:
+            arm_hand_uv_landmarks.append(None)
+            return None, None
+        else:
+            arm_hand_uv_landmarks.append(_format_landmark(current_uv_landmark))
+    
+    
+    # fill the keypoint and normalized keypoint from hand pose
+    for name in ONESIDE_HAND_ARM_LANDMARK_NAMES[2:]:
+        arm_hand_uv_landmarks.append(_format_landmark(hand_normalized_landmarks.landmark[MP_HAND_LANDMARK_NAME2INDEX[name]]))
+        
+    # fill the keypoint and normalized keypoint from hand pose
+    for name in ONESIDE_HAND_ARM_LANDMARK_NAMES[2:]:
+        # connect the hand and body in different coordinated(have same axes with different origin) with 
+        # assuming that the wrist is the same position and x, y, z 
+        
+        if name == 'wrist':
+            pose_twist_world_landmark = pose_results.pose_world_landmarks.landmark[pose_indices[2]]
+            hand_twist_world_landmark = hand_world_landmarks.landmark[MP_HAND_LANDMARK_NAME2INDEX[name]]
+            # dxyz of origin of hand and pose cooridate
+            twist_hand2pose_dxyz = [
+                                    hand_twist_world_landmark.x - pose_twist_world_landmark.x, 
+                                    hand_twist_world_landmark.y - pose_twist_world_landmark.y,
+                                    hand_twist_world_landmark.z - pose_twist_world_landmark.z
+                                ]
+            
+        formatted_landmark = _format_landmark(hand_world_landmarks.landmark[MP_HAND_LANDMARK_NAME2INDEX[name]])
+        formatted_landmark.x -= twist_hand2pose_dxyz[0]
+        formatted_landmark.y -= twist_hand2pose_dxyz[1]
+        formatted_landmark.z -= twist_hand2pose_dxyz[2]
+        arm_hand_world_landmarks.append(formatted_landmark)
+            
+    return arm_hand_world_landmarks, arm_hand_uv_landmarks
+
 class MPKeyPointSolution:
     """Combine mediepipe human pose and left/right hand together."""
-    def __init__(self, static_image_mode = False):
+    def __init__(self, static_image_mode = False, concurrent_graphs = False, hand_roi_tracking = False, 
+                 hand_roi_scale = 2.0, inference_resolution: Union[None, int, InferenceResolutionPolicy] = None, 
+                 metrics: Optional[ProcessMetrics] = None, smoothing: Optional[LandmarkSmoother] = None,
+                 max_num_hands: int = 2, result_cache: Optional[ResultCache] = None, 
+                 profile: Union[str, ModelProfile] = "balanced", 
+                 profile_controller: Optional[AdaptiveProfileController] = None):
+        """
+        Args:
+            static_image_mode (bool, optional): treat the input images as unrelated images or a video stream. 
+                Defaults to False.
+            concurrent_graphs (bool, optional): run the hands and pose graphs at the same time on each image, the pose 
+                graph in a persistent worker thread. Defaults to False.
+            hand_roi_tracking (bool, optional): run the hands graph on a crop around the hands located by the pose of 
+                the previous frame, and fall back to the full image when no previous pose or no hand in the crop. Only 
+                for video streams. Defaults to False.
+            hand_roi_scale (float, optional): half size of the crop around a hand relative to its pose wrist to 
+                knuckle distance. Defaults to 2.0.
+            inference_resolution (int or InferenceResolutionPolicy, optional): resize the images once before the 
+                graphs, by a fixed maximum side in pixels or a policy adapting to a latency budget. The normalized 
+                landmarks stay relative to the original image. Defaults to None, the graphs run at native resolution.
+            metrics (ProcessMetrics, optional): record the stage timings and the outcome of every process call. 
+                Defaults to None, no instrumentation.
+            smoothing (LandmarkSmoother, optional): filter the keypoints of the video stream over time. Defaults to 
+                None, the raw keypoints of each image.
+            max_num_hands (int, optional): maximum number of hands detected, more than 2 to leave out the hands of 
+                other people with process_associating_hands. Defaults to 2.
+            result_cache (ResultCache, optional): return the results of the images processed before without running 
+                the graphs, only with static_image_mode and without smoothing. Defaults to None.
+            profile (str or ModelProfile, optional): model complexities and confidences of the graphs, "fast", 
+                "balanced" or "accurate", see profiles. Defaults to "balanced".
+            profile_controller (AdaptiveProfileController, optional): switch the profile to keep the graphs latency 
+                within a target fps. Defaults to None, a fixed profile.
+        """
+        if result_cache is not None and not static_image_mode:
+            raise ValueError('The result cache needs static_image_mode, video results depend on the previous frames.')
+        if result_cache is not None and smoothing is not None:
+            raise ValueError('The result cache can not be used with smoothing, smoothed results depend on the previous '
+                             'images.')
         self.static_image_mode = static_image_mode
+        self.concurrent_graphs = concurrent_graphs
+        self.hand_roi_tracking = hand_roi_tracking and not self.static_image_mode
+        self.hand_roi_scale = hand_roi_scale
+        # wrist, pinky and index pose anchors of the previous frame for the hand roi, None when lost
+        self._hand_anchors = None
+        # the pixel box the hands graph run on for the last image, None for the full image
+        self.last_hand_roi = None
+        # the box the roi hands graph tracks the hands in, None after the full image was used
+        self._tracked_hand_roi = None
+        if isinstance(inference_resolution, int):
+            inference_resolution = InferenceResolutionPolicy(max_side=inference_resolution)
+        self.inference_resolution = inference_resolution
+        # the scale the last image was resized by before the graphs
+        self.last_inference_scale = 1.
+        self._resize_buffer = None
+        self.metrics = metrics
+        self.smoothing = smoothing
+        self.max_num_hands = max_num_hands
+        self.result_cache = result_cache
+        self.profile = get_profile(profile)
+        self.profile_controller = profile_controller
+        # (hands, pose, roi_hands) graphs of the inactive profiles, preloaded or kept from a switch
+        self._inactive_graphs = {}
+        # the graphs do not depend on each other, and run without holding the GIL
+        self._pose_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mp_pose') \
+            if self.concurrent_graphs else None
+        # reused across frames by _preprocess, reallocated only when the image shape changes
+        self._input_buffer = None
+        
+        # built by _create_graphs on the first process or warm_up call
+        self._hands = None
+        self._pose = None
+        self._roi_hands = None
+
+    def _build_graphs(self, profile: ModelProfile, hands=None, pose=None, roi_hands=None):
+        """Builds the graphs of a profile that are not given."""
+        if hands is None:
+            hands = mp_hands.Hands(
+                static_image_mode = self.static_image_mode,
+                max_num_hands=self.max_num_hands,
+                **profile.hands_options())
+
+        if pose is None:
+            pose = mp_pose.Pose(
+                    static_image_mode= self.static_image_mode,
+                    **profile.pose_options())
+
+        if roi_hands is None and self.hand_roi_tracking:
+            # the crop box stays in place while it covers the hands, the graph tracks them within it
+            roi_hands = mp_hands.Hands(
+                static_image_mode = self.static_image_mode,
+                max_num_hands=self.max_num_hands,
+                **profile.hands_options())
+        return hands, pose, roi_hands
+
+    def _create_graphs(self):
+        """Builds the graphs not built or set yet."""
+        if self._hands is None or self._pose is None or (self._roi_hands is None and self.hand_roi_tracking):
+            self._hands, self._pose, self._roi_hands = self._build_graphs(
+                self.profile, self._hands, self._pose, self._roi_hands)
+
+    def preload_profiles(self, profiles, warm_up: bool = True, image_size: Tuple[int, int] = (480, 640)):
+        """Builds the graphs of profiles beforehand, so that switching to them does not load their models.
+
+        Args:
+            profiles (List[str or ModelProfile]): the profiles, e.g. the profiles of the profile controller.
+            warm_up (bool, optional): also run the graphs once on a blank image, see warm_up. Defaults to True.
+            image_size (Tuple[int, int], optional): height and width of the blank image. Defaults to (480, 640).
+        """
+        image = np.zeros(tuple(image_size) + (3,), dtype=np.uint8)
+        image.flags.writeable = False
+        for profile in map(get_profile, profiles):
+            if profile == self.profile or profile in self._inactive_graphs:
+                continue
+            graphs = self._build_graphs(profile)
+            if warm_up:
+                for graph in graphs:
+                    if graph is not None:
+                        graph.process(image)
+            self._inactive_graphs[profile] = graphs
+
+    def set_profile(self, profile: Union[str, ModelProfile], keep_graphs: bool = True):
+        """Switches the graphs to another profile, between two process calls.
+
+        Args:
+            profile (str or ModelProfile): the profile.
+            keep_graphs (bool, optional): keep the graphs of the current profile to switch back without loading their
+                models again, otherwise close them. Defaults to True.
+        """
+        profile = get_profile(profile)
+        if profile == self.profile:
+            return
+        graphs = (self._hands, self._pose, self._roi_hands)
+        if keep_graphs:
+            if any(graph is not None for graph in graphs):
+                self._inactive_graphs[self.profile] = graphs
+        else:
+            for graph in graphs:
+                if graph is not None:
+                    graph.close()
+        self._hands, self._pose, self._roi_hands = self._inactive_graphs.pop(profile, (None, None, None))
+        if not self.static_image_mode:
+            # graphs kept from before would track from the last frame they saw
+            for graph in (self._hands, self._pose, self._roi_hands):
+                if graph is not None:
+                    graph.reset()
+        self._tracked_hand_roi = None
+        self.profile = profile
+
+    @property
+    def hands(self):
+        """The hands graph, built on first access."""
+        self._create_graphs()
+        return self._hands
+
+    @hands.setter
+    def hands(self, graph):
+        self._hands = graph
+
+    @property
+    def pose(self):
+        """The pose graph, built on first access."""
+        self._create_graphs()
+        return self._pose
+
+    @pose.setter
+    def pose(self, graph):
+        self._pose = graph
+
+    @property
+    def roi_hands(self):
+        """The hands graph run on the hand roi crops, None without hand roi tracking."""
+        self._create_graphs()
+        return self._roi_hands
+
+    @roi_hands.setter
+    def roi_hands(self, graph):
+        self._roi_hands = graph
+
+    def warm_up(self, image_size: Tuple[int, int] = (480, 640)):
+        """Builds the graphs and runs them once on a blank image, so that the first process call does not pay for
+        loading the models.
+
+        Args:
+            image_size (Tuple[int, int], optional): height and width of the blank image, the size of the coming images.
+                Defaults to (480, 640).
+        """
+        image = np.zeros(tuple(image_size) + (3,), dtype=np.uint8)
+        image.flags.writeable = False
+        self.hands.process(image)
+        self.pose.process(image)
+        if self.roi_hands is not None:
+            self.roi_hands.process(image)
+
+    def close(self):
+        """Closes the graphs and the worker thread."""
+        if self._pose_executor is not None:
+            self._pose_executor.shutdown()
+            self._pose_executor = None
+        for graph in (self._hands, self._pose, self._roi_hands) + sum(self._inactive_graphs.values(), ()):
+            if graph is not None:
+                graph.close()
+        self._inactive_graphs.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def _resize_for_inference(self, image: np.ndarray) -> np.ndarray:
+        """Resizes an image by the scale of the inference resolution policy, into a buffer reused across frames."""
+        self.last_inference_scale = 1.
+        if self.inference_resolution is None:
+            return image
+        h, w = image.shape[:2]
+        scale = self.inference_resolution.scale_for(h, w)
+        if scale >= 1.:
+            return image
+        resized_w, resized_h = max(1, round(w * scale)), max(1, round(h * scale))
+        resized_shape = (resized_h, resized_w) + image.shape[2:]
+        if self._resize_buffer is None or self._resize_buffer.shape != resized_shape:
+            self._resize_buffer = np.empty(resized_shape, dtype=image.dtype)
+        cv2.resize(image, (resized_w, resized_h), dst=self._resize_buffer, interpolation=cv2.INTER_AREA)
+        self.last_inference_scale = scale
+        return self._resize_buffer
+    
+    def _preprocess(self, image: np.ndarray, image_format: str = "BGR", buffer: Optional[np.ndarray] = None
+                    ) -> np.ndarray:
+        """Flips an image horizontally and converts it to RGB, in place in a buffer reused across frames.
+
+        Args:
+            image (np.array): BGR or RGB uint8 image.
+            image_format (str, optional): "BGR" or "RGB". Defaults to "BGR".
+            buffer (np.array, optional): uint8 buffer of the image shape to write into, owned by the caller. Defaults 
+                to an internal buffer of the solution.
+
+        Returns:
+            np.array: the flipped RGB image, i.e. the buffer.
+        """
+        if buffer is None:
+            if self._input_buffer is None or self._input_buffer.shape != image.shape:
+                self._input_buffer = np.empty(image.shape, dtype=np.uint8)
+            buffer = self._input_buffer
+        elif buffer.shape != image.shape or buffer.dtype != np.uint8:
+            raise ValueError(f'Buffer of shape {buffer.shape} and dtype {buffer.dtype} does not fit image of shape '
+                             f'{image.shape}.')
+        buffer.flags.writeable = True
+        if image_format == "BGR":
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=buffer)
+            cv2.flip(buffer, 1, dst=buffer)
+        elif image_format == "RGB":
+            cv2.flip(image, 1, dst=buffer)
+        else:
+            raise ValueError(f'Unknown image format: {image_format}')
+        return buffer
+    
+    def _run_hands(self, image: np.ndarray):
+        """Runs the hands graph on the hand roi of the image if tracked, otherwise on the full image."""
+        self.last_hand_roi = None
+        if self._hand_anchors is not None:
+            h, w, _ = image.shape
+            roi, num_roi_hands = compute_hand_roi(self._hand_anchors, w, h, self.hand_roi_scale)
+            if roi is not None:
+                roi, moved = stabilize_hand_roi(self._tracked_hand_roi, roi, w, h)
+                if moved and self._tracked_hand_roi is not None:
+                    # the hands moved out of the box, the landmarks tracked in the previous crop do not apply
+                    self.roi_hands.reset()
+                self._tracked_hand_roi = roi
+                x0, y0, x1, y1 = roi
+                crop = np.ascontiguousarray(image[y0:y1, x0:x1])
+                crop.flags.writeable = False
+                hand_results = self.roi_hands.process(crop)
+                if hand_results.multi_hand_landmarks and len(hand_results.multi_hand_landmarks) >= num_roi_hands:
+                    remap_hand_landmarks_from_roi(hand_results, roi, w, h)
+                    self.last_hand_roi = roi
+                    return hand_results
+        # roi lost, detect on the full image
+        if self._tracked_hand_roi is not None:
+            self._tracked_hand_roi = None
+            self.roi_hands.reset()
+        return self.hands.process(image)
+    
+    def _update_hand_anchors(self, pose_results, sides):
+        if pose_results.pose_landmarks is None:
+            self._hand_anchors = None
+        else:
+            self._hand_anchors = extract_hand_anchors(pose_results.pose_landmarks, sides)
+    
+    @staticmethod
+    def _timed(run_graph, timings: Optional[dict], stage: str):
+        """Wraps a graph run to record its time into timings, if any."""
+        if timings is None:
+            return run_graph
+        def timed_run_graph(image):
+            start_time = time.perf_counter()
+            results = run_graph(image)
+            timings[stage] = time.perf_counter() - start_time
+            return results
+        return timed_run_graph
+    
+    def _run_graphs(self, image: np.ndarray, sides=("left", "right"), timings: Optional[dict] = None):
+        """Runs the hands and pose graphs on a RGB image.
+
+        Args:
+            image (np.array): the flipped RGB image.
+            sides (List[str], optional): sides of the hands to track with hand roi. Defaults to both.
+            timings (dict, optional): records the time of each graph in it if given. Defaults to None.
+
+        Returns:
+            The results of the hands graph and of the pose graph.
+        """
+        run_hands = self._timed(self._run_hands if self.hand_roi_tracking else self.hands.process, timings, 
+                                'hands_graph')
+        run_pose = self._timed(self.pose.process, timings, 'pose_graph')
+        if self._pose_executor is not None:
+            pose_future = self._pose_executor.submit(run_pose, image)
+            try:
+                hand_results = run_hands(image)
+            finally:
+                pose_results = pose_future.result()
+        else:
+            hand_results, pose_results = run_hands(image), run_pose(image)
+        if self.hand_roi_tracking:
+            self._update_hand_anchors(pose_results, sides)
+        return hand_results, pose_results
+    
+    def _update_latency_policies(self, latency_ms: float):
+        """Feeds the graphs latency of a frame to the inference resolution policy and the profile controller."""
+        if self.inference_resolution is not None:
+            self.inference_resolution.update(latency_ms)
+        if self.profile_controller is not None:
+            self.set_profile(self.profile_controller.update(self.profile, latency_ms))
+    
+    def _assemble(self, hand_results, pose_results, type="BOTH_SIDE", output_format="LANDMARK_LIST", 
+                  outcomes: Optional[List[str]] = None):
+        """Assembles the arm and hand keypoints from the results of the graphs, see process.
+
+        Args:
+            hand_results: results of the hands graph.
+            pose_results: results of the pose graph.
+            type (str, optional): "BOTH_SIDE", "LEFT_SIDE", "RIGHT_SIDE". Defaults to "BOTH_SIDE".
+            output_format (str, optional): "LANDMARK_LIST" or "ARRAY". Defaults to "LANDMARK_LIST".
+            outcomes (List[str], optional): appends the reasons of missing keypoints to it if given, see 
+                instrumentation. Defaults to None.
+        """
+        # hand landmarks of each side, keyed by 'left'/'right'
+        hand_world_landmarks_by_side = {}
+        hand_normalized_landmarks_by_side = {}
+        if hand_results.multi_hand_world_landmarks != None and pose_results.pose_world_landmarks != None:
+            # Note that handedness is determined assuming the input image is mirrored, i.e., taken with a 
+            # front-facing/selfie camera with images flipped horizontally. If it is not the case, please swap the 
+            # handedness output in the application.
+            for handness, hand_world_landmarks, hand_normalized_landmarks in zip(
+                    hand_results.multi_handedness, hand_results.multi_hand_world_landmarks, 
+                    hand_results.multi_hand_landmarks):
+                hand_type = handness.classification[0].label
+                side = "left" if hand_type == "Left" else "right"
+                hand_world_landmarks_by_side[side] = hand_world_landmarks
+                hand_normalized_landmarks_by_side[side] = hand_normalized_landmarks
+        else:
+            if outcomes is not None:
+                if hand_results.multi_hand_world_landmarks is None:
+                    outcomes.append('no_hands')
+                if pose_results.pose_world_landmarks is None:
+                    outcomes.append('no_pose')
+            return None, None
         
-        self.hands = mp_hands.Hands(
-            static_image_mode = self.static_image_mode,
-            max_num_hands=2,
-            model_complexity=1,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5)
-
-        self.pose = mp_pose.Pose(
-                static_image_mode= self.static_image_mode,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5,
-                model_complexity=0)
+        if type not in _TYPE2SIDES:
+            raise NotImplementedError()
+        
+        assemble = _assemble_arm_hand_array if output_format == "ARRAY" else _assemble_arm_hand_landmarks
+        # assemble all the requested sides from the single hands and pose detection pass
+        side_results = []
+        for side in _TYPE2SIDES[type]:
+            if side not in hand_world_landmarks_by_side:
+                side_results.append((None, None))
+                if outcomes is not None:
+                    outcomes.append('no_side_hand')
+                continue
+            side_results.append(assemble(pose_results, hand_world_landmarks_by_side[side], 
+                                         hand_normalized_landmarks_by_side[side], _ARM_POSE_INDICES[side]))
+            if outcomes is not None and side_results[-1][0] is None:
+                outcomes.append('arm_not_visible')
+        
+        if len(side_results) == 1:
+            return side_results[0]
+        
+        # "BOTH_SIDE": left followed by right as in HAND_ARM_LANDMARK_NAME2INDEX, a missing side is filled with None 
+        # landmarks or nan array rows.
+        if all(world_landmarks is None for world_landmarks, _ in side_results):
+            return None, None
+        num_oneside_landmarks = len(ONESIDE_HAND_ARM_LANDMARK_NAMES)
+        if output_format == "ARRAY":
+            missing = np.full((num_oneside_landmarks, 3), np.nan, dtype=np.float32)
+            arm_hand_world_landmarks = np.concatenate(
+                [missing if world_landmarks is None else world_landmarks for world_landmarks, _ in side_results])
+            arm_hand_uv_landmarks = np.concatenate(
+                [missing if uv_landmarks is None else uv_landmarks for _, uv_landmarks in side_results])
+        else:
+            missing = [None] * num_oneside_landmarks
+            arm_hand_world_landmarks = []
+            arm_hand_uv_landmarks = []
+            for world_landmarks, uv_landmarks in side_results:
+                arm_hand_world_landmarks.extend(missing if world_landmarks is None else world_landmarks)
+                arm_hand_uv_landmarks.extend(missing if uv_landmarks is None else uv_landmarks)
+        return arm_hand_world_landmarks, arm_hand_uv_landmarks
     
-    def process(self, image: npt.ArrayLike, type="BOTH_SIDE") -> Optional[Tuple[List[Landmark], List[Landmark]]]:
+    def process(self, image: npt.ArrayLike, type="BOTH_SIDE", output_format="LANDMARK_LIST", image_format="BGR",
+                buffer: Optional[np.ndarray] = None, timestamp: Optional[float] = None
+                ) -> Optional[Tuple[Union[List[Landmark], np.ndarray, LandmarkSet], 
+                                    Union[List[Landmark], np.ndarray, LandmarkSet]]]:
         """ Process a image to find out a single body with at least one hand
 
         Args:
             image (np.array): numpy array image
             type (str, optional): "BOTH_SIDE", "LEFT_SIDE", "RIGHT_SIDE". Defaults to "BOTH_SIDE".
+            output_format (str, optional): "LANDMARK_LIST" returns lists of Landmark, "ARRAY" returns (23, 3) float32
+                arrays gathered without per-point python objects, "LANDMARK_SET" returns the arrays wrapped in 
+                LandmarkSet, with a presence column for "BOTH_SIDE". Defaults to "LANDMARK_LIST".
+            image_format (str, optional): "BGR" or "RGB" channel order of the image. Defaults to "BGR".
+            buffer (np.array, optional): uint8 buffer of the image shape that the flipped RGB image is written into, 
+                to reuse across frames, of the resized shape with inference_resolution. Defaults to a buffer kept by 
+                the solution.
+            timestamp (float, optional): timestamp of the image in seconds for the smoothing. Defaults to the time of 
+                the call.
 
         Returns:
-            List[Landmark]: return a list of 3d keypoints by the type of single body in the image.
             List[Landmark]: return a list of world 3d keypoints by the type of single body in the image.
+            List[Landmark]: return a list of normalized 3d keypoints by the type of single body in the image.
+            For "LEFT_SIDE" and "RIGHT_SIDE" there are 23 keypoints, for "BOTH_SIDE" there are 46 keypoints in the 
+            layout of HAND_ARM_LANDMARK_NAME2INDEX, with the keypoints of an undetected side set None (nan in "ARRAY").
+            Both are None if no side is detected.
         """
-        image = cv2.flip(image, 1)
+        if output_format not in ("LANDMARK_LIST", "ARRAY", "LANDMARK_SET"):
+            raise ValueError(f'Unknown output format: {output_format}')
+        if output_format == "LANDMARK_SET":
+            arm_hand_world_landmarks, arm_hand_uv_landmarks = self.process(
+                image, type, "ARRAY", image_format, buffer, timestamp)
+            return _array_to_landmark_sets(arm_hand_world_landmarks, arm_hand_uv_landmarks, type)
+        if self.result_cache is None:
+            return self._process(image, type, output_format, image_format, buffer, timestamp)
+
+        key = self.result_cache.key(image, self._cache_config(image, type, image_format))
+        result = self.result_cache.get(key)
+        if result is None:
+            result = self._process(image, type, "ARRAY", image_format, buffer, timestamp)
+            self.result_cache.put(key, result)
+        arm_hand_world_landmarks, arm_hand_uv_landmarks = result
+        if arm_hand_world_landmarks is None:
+            return None, None
+        if output_format == "LANDMARK_LIST":
+            return _array_to_landmark_list(arm_hand_world_landmarks), _array_to_landmark_list(arm_hand_uv_landmarks)
+        # the cached arrays stay as they are
+        return arm_hand_world_landmarks.copy(), arm_hand_uv_landmarks.copy()
+
+    def _cache_config(self, image: np.ndarray, type: str, image_format: str) -> tuple:
+        """The configuration the results of process depend on besides the image, for the result cache."""
+        h, w = image.shape[:2]
+        scale = 1. if self.inference_resolution is None else self.inference_resolution.scale_for(h, w)
+        return (type, image_format, scale, self.max_num_hands, self.profile)
+
+    def _process(self, image: npt.ArrayLike, type="BOTH_SIDE", output_format="LANDMARK_LIST", image_format="BGR",
+                 buffer: Optional[np.ndarray] = None, timestamp: Optional[float] = None):
+        """Runs the graphs and assembles the keypoints, see process."""
+        # stage timings and outcomes of the frame, only with metrics
+        timings = None if self.metrics is None else {}
+        process_start_time = start_time = time.perf_counter()
+
+        # resize before the flip and color conversion, to run them on fewer pixels
+        image = self._resize_for_inference(image)
+        if timings is not None:
+            now = time.perf_counter()
+            timings['resize'], start_time = now - start_time, now
+        image = self._preprocess(image, image_format, buffer)
+        if timings is not None:
+            now = time.perf_counter()
+            timings['preprocess'], start_time = now - start_time, now
         # cv2.imshow("image", image)
         # cv2.waitKey(0)
         
         # To improve performance, optionally mark the image as not writeable to
         image.flags.writeable = False
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        hand_results = self.hands.process(image)
-        pose_results = self.pose.process(image)
+        hand_results, pose_results = self._run_graphs(image, _TYPE2SIDES.get(type, ("left", "right")), timings)
+        if self.inference_resolution is not None or self.profile_controller is not None or timings is not None:
+            now = time.perf_counter()
+            self._update_latency_policies((now - start_time) * 1000)
+            if timings is not None:
+                timings['graphs'], start_time = now - start_time, now
         image.flags.writeable = True
         
         vis_landmarks_in_win = False
@@ -100,109 +744,73 @@ class MPKeyPointSolution:
             # cv2.imshow('MediaPipe Pose', cv2.flip(annotate_image, 1))
             # cv2.waitKey(0)
         
-        left_hand_world_landmarks, right_hand_world_landmarks = None, None
-        left_hand_normaized_landmarks, right_hand_normalized_landmarks = None, None
-        if hand_results.multi_hand_world_landmarks != None and pose_results.pose_world_landmarks != None:
-            # Note that handedness is determined assuming the input image is mirrored, i.e., taken with a 
-            # front-facing/selfie camera with images flipped horizontally. If it is not the case, please swap the 
-            # handedness output in the application.
-            # for handness, hand_landmarks in zip(hand_results.multi_handedness, hand_results.multi_hand_world_landmarks):
-            for handness, hand_landmarks in zip(hand_results.multi_handedness, hand_results.multi_hand_world_landmarks):
-                hand_type = handness.classification[0].label
-                if hand_type == "Left":
-                    left_hand_world_landmarks = hand_landmarks
-                else:
-                    right_hand_world_landmarks = hand_landmarks
-                    h, w, c = image.shape
-                    # origin = center(np.array([np.array([item.x, item.y, item.z]) for item in hand_landmarks.landmark]))
-                # print(hand_type)
+        if timings is None and self.smoothing is None:
+            return self._assemble(hand_results, pose_results, type, output_format)
+        
+        outcomes = None if timings is None else []
+        # the smoothing filters the arrays, converted to lists of Landmark afterwards
+        arm_hand_world_landmarks, arm_hand_uv_landmarks = self._assemble(
+            hand_results, pose_results, type, output_format if self.smoothing is None else "ARRAY", outcomes)
+        if timings is not None:
+            now = time.perf_counter()
+            timings['assembly'], start_time = now - start_time, now
+        if self.smoothing is not None:
+            arm_hand_world_landmarks, arm_hand_uv_landmarks = self.smoothing(
+                arm_hand_world_landmarks, arm_hand_uv_landmarks, timestamp)
+            if output_format == "LANDMARK_LIST" and arm_hand_world_landmarks is not None:
+                arm_hand_world_landmarks = _array_to_landmark_list(arm_hand_world_landmarks)
+                arm_hand_uv_landmarks = _array_to_landmark_list(arm_hand_uv_landmarks)
+            if timings is None:
+                return arm_hand_world_landmarks, arm_hand_uv_landmarks
+            now = time.perf_counter()
+            timings['smoothing'] = now - start_time
+        timings['total'] = now - process_start_time
+        if arm_hand_world_landmarks is not None:
+            outcomes.append('detected')
+        self.metrics.record_frame(timings, outcomes)
+        return arm_hand_world_landmarks, arm_hand_uv_landmarks
+    
+    def process_associating_hands(self, image: npt.ArrayLike, output_format="ARRAY", image_format="BGR",
+                                  buffer: Optional[np.ndarray] = None, handedness_penalty: float = 0.5,
+                                  max_cost: float = 1.
+                                  ) -> Optional[Tuple[Union[List[Landmark], np.ndarray, LandmarkSet],
+                                                      Union[List[Landmark], np.ndarray, LandmarkSet]]]:
+        """Process a image matching every detected hand to the nearest arm of the body instead of by handedness only.
 
-            
-            for handness, hand_landmarks in zip(hand_results.multi_handedness, hand_results.multi_hand_landmarks):
-                hand_type = handness.classification[0].label
-                if hand_type == "Left":
-                    left_hand_normaized_landmarks = hand_landmarks
-                else:
-                    right_hand_normalized_landmarks = hand_landmarks
-            #     if hand_type=='Right':
-            #         handColor=(255,0,0) # Blue
-            #     if hand_type=='Left':
-            #         handColor=(0,0,255) # Red
-            #     for ind in [0,5,6,7,8]:
-            #         cv2.circle(image, 
-            #                 (int(hand_landmarks.landmark[ind].x*image.shape[1]), int(hand_landmarks.landmark[ind].y*image.shape[0]))
-            #                 ,15,handColor,5)
-            #         # cv2.circle(image, 
-            #         #         (int(hand_landmarks.landmark[ind].x), int(hand_landmarks.landmark[ind].y))
-            #         #         ,15,handColor,5)
-            # cv2.imshow("image", image)
-            # cv2.waitKey(0)
-        else:
+        The pose graph of mediapipe detects a single body. With other people in the image, their hands are left out 
+        instead of being stitched to its arms, and a hand with a wrong handedness label still goes to its own arm. 
+        Seeing the hands of other people needs max_num_hands above 2. Neither smoothing nor metrics apply.
+
+        Args:
+            image (np.array): numpy array image
+            output_format (str, optional): see process. Defaults to "ARRAY".
+            image_format (str, optional): "BGR" or "RGB" channel order of the image. Defaults to "BGR".
+            buffer (np.array, optional): see process. Defaults to a buffer kept by the solution.
+            handedness_penalty (float, optional): cost of a hand whose handedness label disagrees with the side of the 
+                arm, in forearm lengths. Defaults to 0.5.
+            max_cost (float, optional): highest cost of a hand assigned to an arm, in forearm lengths. Defaults to 1.
+
+        Returns:
+            tuple: the world and normalized keypoints of the body in the layout of "BOTH_SIDE", (None, None) without a 
+            body or without a hand assigned to its arms.
+        """
+        if output_format not in ("LANDMARK_LIST", "ARRAY", "LANDMARK_SET"):
+            raise ValueError(f'Unknown output format: {output_format}')
+        image = self._resize_for_inference(image)
+        image = self._preprocess(image, image_format, buffer)
+        image.flags.writeable = False
+        start_time = time.perf_counter()
+        hand_results, pose_results = self._run_graphs(image)
+        self._update_latency_policies((time.perf_counter() - start_time) * 1000)
+        image.flags.writeable = True
+
+        h, w, _ = image.shape
+        people = _assemble_people(hand_results, [pose_results], w / h, handedness_penalty, max_cost)
+        if not people:
             return None, None
-        
-        def format_landmark(landmark):
-            return Landmark(landmark.x, landmark.y, landmark.z)
-            
-        if type == "RIGHT_SIDE":
-            if right_hand_world_landmarks is None:
-                return None, None
-            # Got a array of landmarks if not visible set None
-            arm_hand_uv_landmarks = []
-            arm_hand_world_landmarks = []
-            
-            # first two are ['shoulder' 'elbow'] from body pose, followed by ['wrist', 'thumb_xxx', ...] from hand pose
-            
-            for name in ONESIDE_HAND_ARM_LANDMARK_NAMES[:2]: 
-                # fill the 'shoulder', 'elbow' keypoint
-                current_world_landmark = pose_results.pose_world_landmarks.landmark[MP_POSE_LANDMARK_NAME2INDEX[f'right_{name}']]
-                if current_world_landmark.visibility < VISIBLE_THRESHOLD:
-                    arm_hand_world_landmarks.append(None)
-                    return None, None
-                else:
-                    arm_hand_world_landmarks.append(format_landmark(current_world_landmark))
-                    
-            for name in ONESIDE_HAND_ARM_LANDMARK_NAMES[:2]: 
-                # fill the 'shoulder', 'elbow' normalized keypoint
-                current_uv_landmark = pose_results.pose_landmarks.landmark[MP_POSE_LANDMARK_NAME2INDEX[f'right_{name}']]
-                if current_uv_landmark.visibility < VISIBLE_THRESHOLD:
-                    arm_hand_uv_landmarks.append(None)
-                    return None, None
-                else:
-                    arm_hand_uv_landmarks.append(format_landmark(current_uv_landmark))
-            
-            
-            # fill the keypoint and normalized keypoint from hand pose
-            for name in ONESIDE_HAND_ARM_LANDMARK_NAMES[2:]:
-                if right_hand_world_landmarks != None:
-                    arm_hand_uv_landmarks.append(format_landmark(right_hand_normalized_landmarks.landmark[MP_HAND_LANDMARK_NAME2INDEX[name]]))
-                else:
-                    arm_hand_uv_landmarks.append(None)
-                
-            # fill the keypoint and normalized keypoint from hand pose
-            for name in ONESIDE_HAND_ARM_LANDMARK_NAMES[2:]:
-                # connect the hand and body in different coordinated(have same axes with different origin) with 
-                # assuming that the wrist is the same position and x, y, z 
-                
-                if name == 'wrist':
-                    pose_twist_world_landmark = pose_results.pose_world_landmarks.landmark[MP_POSE_LANDMARK_NAME2INDEX[f'right_{name}']]
-                    hand_twist_world_landmark = right_hand_world_landmarks.landmark[MP_HAND_LANDMARK_NAME2INDEX[name]]
-                    # dxyz of origin of hand and pose cooridate
-                    twist_hand2pose_dxyz = [
-                                            hand_twist_world_landmark.x - pose_twist_world_landmark.x, 
-                                            hand_twist_world_landmark.y - pose_twist_world_landmark.y,
-                                            hand_twist_world_landmark.z - pose_twist_world_landmark.z
-                                        ]
-                    
-                if right_hand_world_landmarks != None:
-                    formatted_landmark = format_landmark(right_hand_world_landmarks.landmark[MP_HAND_LANDMARK_NAME2INDEX[name]])
-                    formatted_landmark.x -= twist_hand2pose_dxyz[0]
-                    formatted_landmark.y -= twist_hand2pose_dxyz[1]
-                    formatted_landmark.z -= twist_hand2pose_dxyz[2]
-                    arm_hand_world_landmarks.append(formatted_landmark)
-                else:
-                    arm_hand_world_landmarks.append(None)
-                    
-            return arm_hand_world_landmarks, arm_hand_uv_landmarks
-                
-        else:
-            raise NotImplementedError()
\ No newline at end of file
+        world_landmarks, uv_landmarks = people[0]
+        if output_format == "LANDMARK_LIST":
+            return _array_to_landmark_list(world_landmarks), _array_to_landmark_list(uv_landmarks)
+        if output_format == "LANDMARK_SET":
+            return _array_to_landmark_sets(world_landmarks, uv_landmarks, "BOTH_SIDE")
+        return world_landmarks, uv_landmarks
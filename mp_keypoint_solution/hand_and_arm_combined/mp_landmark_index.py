@@ -43,10 +43,10 @@ MP_POSE_LANDMARK_NAME2INDEX = {
     "left_eye": 8,
     "mouth_right": 9, "mouth_left": 10,
     "right_shoulder": 11, "left_shoulder": 12,
-    "right_elbow": 13, "left__elbow": 14,
-    "right_wrist": 15, "left__wrist": 16,
+    "right_elbow": 13, "left_elbow": 14,
+    "right_wrist": 15, "left_wrist": 16,
     "right_pinky": 17, "left_pinky": 18,
-    "right_index": 18, "left_index": 20,
+    "right_index": 19, "left_index": 20,
     "right_thumb": 21, "left_thumb": 22,
     "right_hip": 23, "left_hip": 24,
     "right_knee": 25, "left_knee": 26,
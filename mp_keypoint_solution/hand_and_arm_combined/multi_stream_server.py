@@ -0,0 +1,439 @@
+"""
+Serving many camera streams with a fixed pool of worker processes.
+
+Tracking graphs keep their state inside the mediapipe graph, which can not move between processes. With tracking, the
+default, each stream is pinned to a worker process holding a tracking MPKeyPointSolution for each of its streams, so
+the palms are detected only when a hand is lost rather than on every frame. The streams are assigned to the worker with
+the fewest streams when added, and one stream at a time moves from the busiest to the least busy worker when removing
+a stream unbalanced them, restarting its tracking on the new worker. Each stream costs a set of graphs in memory.
+
+Without tracking, each worker holds one MPKeyPointSolution(static_image_mode=True) and any worker processes a frame of
+any stream, which balances the load frame by frame and costs one set of graphs per worker, but runs the palm detection
+on every frame of every stream: the hands stage costs its detection every frame instead of on the lost hands only.
+
+The state of each stream in the server, its frame queue, sequence numbers and optional temporal smoothing, is applied
+as the results are delivered in order.
+
+- Frames are handed to the workers through reused shared memory slots, not pickled.
+- Each stream has a bounded queue of pending frames, the oldest frame is dropped when a new frame arrives on a full
+  queue, so an overloaded server stays real time and only the slow streams lose frames.
+- The streams with pending frames are served round-robin, a busy stream can not starve the others.
+- The results of a stream are delivered in frame order, through a callback or a queue.
+- A frame that fails, or whose worker is lost and does not answer within task_timeout, is delivered with its error,
+  its slot is freed and the frames after it are delivered.
+
+As the pool uses the "spawn" start method by default, scripts using the server need the `if __name__ == '__main__':`
+guard.
+"""
+import collections
+import dataclasses
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+from .mp_hand_and_arm_keypoint_solution import (MPKeyPointSolution, _array_to_landmark_list,
+                                                _array_to_landmark_sets)
+from .smoothing import LandmarkSmoother
+
+# per worker process states, set by _init_worker
+_worker_solution = None
+_worker_process_kwargs = None
+_worker_tracking = False
+# stream generation to the tracking solution of the stream, with tracking
+_worker_stream_solutions = {}
+# slot index to the attached shared memory of the slot
+_worker_slots = {}
+
+def _init_worker(process_kwargs: dict, tracking: bool = False):
+    global _worker_solution, _worker_process_kwargs, _worker_tracking
+    _worker_process_kwargs = process_kwargs
+    _worker_tracking = tracking
+    if not tracking:
+        _worker_solution = MPKeyPointSolution(static_image_mode=True)
+        # load the models when the pool starts rather than with the first frame
+        _worker_solution.warm_up()
+
+def _stream_solution(stream_key: int) -> MPKeyPointSolution:
+    if not _worker_tracking:
+        return _worker_solution
+    solution = _worker_stream_solutions.get(stream_key)
+    if solution is None:
+        # the stream was opened on this worker, moved to it, or the worker restarted after a crash
+        solution = _worker_stream_solutions[stream_key] = MPKeyPointSolution()
+    return solution
+
+def _open_stream(stream_key: int):
+    # load the models when the stream is added rather than with its first frame
+    _stream_solution(stream_key).warm_up()
+
+def _close_stream(stream_key: int):
+    solution = _worker_stream_solutions.pop(stream_key, None)
+    if solution is not None:
+        solution.close()
+
+def _process_frame(task):
+    slot_index, slot_name, shape, token, stream_key = task
+    slot = _worker_slots.get(slot_index)
+    if slot is None or slot.name != slot_name:
+        # the server reallocated the slot for a larger frame
+        if slot is not None:
+            slot.close()
+        slot = _worker_slots[slot_index] = shared_memory.SharedMemory(name=slot_name)
+    image = np.ndarray(shape, dtype=np.uint8, buffer=slot.buf)
+    world_landmarks, uv_landmarks = _stream_solution(stream_key).process(image, output_format="ARRAY",
+                                                                         **_worker_process_kwargs)
+    return slot_index, token, world_landmarks, uv_landmarks
+
+@dataclasses.dataclass
+class StreamResult:
+    """The keypoints of a frame of a stream."""
+    stream_id: Hashable
+    # index of the frame among the frames submitted to the stream, dropped frames included
+    frame_index: int
+    timestamp: float
+    world_landmarks: Any
+    uv_landmarks: Any
+    # the exception raised processing the frame, None if processed
+    error: Optional[BaseException] = None
+
+class _Stream:
+    def __init__(self, generation: int, smoothing: Optional[LandmarkSmoother]):
+        # tells the frames of this stream from the frames of a removed stream of the same id still in flight
+        self.generation = generation
+        # index of the worker the stream is pinned to, with tracking
+        self.worker = 0
+        self.pending = collections.deque()
+        self.num_submitted = 0
+        self.num_dropped = 0
+        self.num_delivered = 0
+        self.num_in_flight = 0
+        # sequence numbers of the dispatched frames, in submission order, and the results completed out of order
+        self.dispatched = collections.deque()
+        self.completed = {}
+        # results in order waiting for delivery, appended under the server condition
+        self.ready = collections.deque()
+        # held while delivering, the results of a stream are delivered, and smoothed, by one thread at a time
+        self.delivery_lock = threading.Lock()
+        self.smoothing = smoothing
+
+class MultiStreamServer:
+    """Multiplexes camera streams over a fixed pool of MPKeyPointSolution worker processes.
+
+    Args:
+        num_workers (int, optional): number of worker processes. Defaults to the number of cpus.
+        type (str, optional): see MPKeyPointSolution.process. Defaults to "BOTH_SIDE".
+        output_format (str, optional): see MPKeyPointSolution.process. Defaults to "ARRAY".
+        queue_size (int, optional): number of pending frames kept per stream before dropping the oldest. Defaults
+            to 1, always the latest frame.
+        max_in_flight_per_stream (int, optional): number of frames of a stream dispatched at the same time. Defaults
+            to 1, a stream uses one worker at a time and the others serve other streams. With tracking, the frames of
+            a stream queue up in order on its worker.
+        smoothing_factory (Callable[[], LandmarkSmoother], optional): creates the temporal smoothing of each stream.
+            Defaults to None, no smoothing.
+        callback (Callable[[StreamResult], None], optional): called with each result, in order per stream, from a
+            thread of the server. Defaults to None, the results are queued for get_result.
+        start_method (str, optional): multiprocessing start method. Defaults to "spawn".
+        task_timeout (float, optional): seconds after which a frame in flight is delivered with a TimeoutError, e.g.
+            when its worker process died, and its late result ignored. Defaults to None, no timeout.
+        tracking (bool, optional): pin each stream to a worker running tracking graphs for it. Defaults to True,
+            otherwise the workers detect the hands and the body on every frame, see the module docstring.
+    """
+    def __init__(self, num_workers: Optional[int] = None, type="BOTH_SIDE", output_format="ARRAY",
+                 queue_size: int = 1, max_in_flight_per_stream: int = 1,
+                 smoothing_factory: Optional[Callable[[], LandmarkSmoother]] = None,
+                 callback: Optional[Callable[[StreamResult], None]] = None, start_method: str = "spawn",
+                 task_timeout: Optional[float] = None, tracking: bool = True):
+        if output_format not in ("LANDMARK_LIST", "ARRAY", "LANDMARK_SET"):
+            raise ValueError(f'Unknown output format: {output_format}')
+        self.num_workers = num_workers or os.cpu_count()
+        self.type = type
+        self.output_format = output_format
+        self.queue_size = queue_size
+        self.max_in_flight_per_stream = max_in_flight_per_stream
+        self.smoothing_factory = smoothing_factory
+        self.callback = callback
+        self.task_timeout = task_timeout
+        self.tracking = tracking
+        self._results = queue.Queue()
+        self._streams: Dict[Hashable, _Stream] = {}
+        # streams in round-robin order, the next one served is at the front
+        self._round_robin = collections.deque()
+        # a frame in flight per worker and one ready for each, so that a worker never waits on the scheduler
+        self._max_in_flight = 2 * self.num_workers
+        self._num_in_flight = 0
+        self._slots = [None] * self._max_in_flight
+        self._free_slots = list(range(self._max_in_flight))
+        # slot index to the (token, stream id, generation, sequence, deadline) of the frame in flight in the slot
+        self._tasks: Dict[int, tuple] = {}
+        self._num_tokens = 0
+        self._num_generations = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        # the workers share the resource tracker of the server, a tracker of their own would unlink the slots they
+        # attached to when they exit
+        resource_tracker.ensure_running()
+        context = multiprocessing.get_context(start_method)
+        if tracking:
+            # a process per pool, the frames of a stream are processed in order by the worker it is pinned to
+            self._pools = [context.Pool(1, initializer=_init_worker, initargs=(dict(type=type), True))
+                           for _ in range(self.num_workers)]
+        else:
+            self._pools = [context.Pool(self.num_workers, initializer=_init_worker, initargs=(dict(type=type),))]
+        # number of streams pinned to each worker, with tracking
+        self._worker_loads = [0] * self.num_workers
+        self._scheduler = threading.Thread(target=self._schedule, name='stream_scheduler', daemon=True)
+        self._scheduler.start()
+
+    def add_stream(self, stream_id: Hashable):
+        with self._condition:
+            if stream_id in self._streams:
+                raise ValueError(f'Stream {stream_id!r} already exists.')
+            smoothing = self.smoothing_factory() if self.smoothing_factory is not None else None
+            self._num_generations += 1
+            stream = self._streams[stream_id] = _Stream(self._num_generations, smoothing)
+            self._round_robin.append(stream_id)
+            if self.tracking:
+                self._pin(stream, self._worker_loads.index(min(self._worker_loads)))
+
+    def remove_stream(self, stream_id: Hashable):
+        """Removes a stream, its pending frames are dropped and its frames in flight are not delivered."""
+        with self._condition:
+            stream = self._streams.pop(stream_id)
+            self._round_robin.remove(stream_id)
+            if self.tracking:
+                self._unpin(stream)
+                self._rebalance()
+
+    def _pin(self, stream: _Stream, worker: int):
+        stream.worker = worker
+        self._worker_loads[worker] += 1
+        self._pools[worker].apply_async(_open_stream, (stream.generation,))
+
+    def _unpin(self, stream: _Stream):
+        self._worker_loads[stream.worker] -= 1
+        # after the frames of the stream already queued to the worker
+        self._pools[stream.worker].apply_async(_close_stream, (stream.generation,))
+
+    def _rebalance(self):
+        """Moves a stream from the busiest to the least busy worker while they differ by more than one stream."""
+        while max(self._worker_loads) - min(self._worker_loads) > 1:
+            busiest = self._worker_loads.index(max(self._worker_loads))
+            least_busy = self._worker_loads.index(min(self._worker_loads))
+            stream = next(stream for stream in self._streams.values() if stream.worker == busiest)
+            self._unpin(stream)
+            self._pin(stream, least_busy)
+
+    def submit(self, stream_id: Hashable, image: np.ndarray, timestamp: Optional[float] = None) -> bool:
+        """Queues a BGR frame of a stream, dropping the oldest pending frame of the stream if its queue is full.
+
+        The image is copied to shared memory when dispatched, it must not be modified until then, i.e. until the
+        next submit of the stream with the default queue_size of 1.
+
+        Args:
+            stream_id (Hashable): the stream, added with add_stream.
+            image (np.array): the uint8 BGR frame.
+            timestamp (float, optional): timestamp of the frame in seconds. Defaults to the current monotonic time.
+
+        Returns:
+            bool: False if a pending frame was dropped for it.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('The server is closed.')
+            stream = self._streams[stream_id]
+            dropped = len(stream.pending) >= self.queue_size
+            if dropped:
+                stream.pending.popleft()
+                stream.num_dropped += 1
+            stream.pending.append((stream.num_submitted, timestamp, image))
+            stream.num_submitted += 1
+            self._condition.notify_all()
+        return not dropped
+
+    def get_result(self, timeout: Optional[float] = None) -> StreamResult:
+        """Returns the next result when no callback is set, raises queue.Empty after the timeout."""
+        return self._results.get(timeout=timeout)
+
+    def stats(self) -> Dict[Hashable, dict]:
+        """Returns the submitted, dropped, delivered and in flight frame counts of each stream."""
+        with self._condition:
+            return {stream_id: {'submitted': stream.num_submitted, 'dropped': stream.num_dropped,
+                                'delivered': stream.num_delivered, 'pending': len(stream.pending),
+                                'in_flight': stream.num_in_flight, 'worker': stream.worker if self.tracking else None}
+                    for stream_id, stream in self._streams.items()}
+
+    def _next_frame(self):
+        """Pops the frame of the next stream in round-robin order that can be dispatched, None if none."""
+        if self._num_in_flight >= self._max_in_flight:
+            return None
+        for _ in range(len(self._round_robin)):
+            stream_id = self._round_robin[0]
+            self._round_robin.rotate(-1)
+            stream = self._streams[stream_id]
+            if stream.pending and stream.num_in_flight < self.max_in_flight_per_stream:
+                sequence, timestamp, image = stream.pending.popleft()
+                stream.num_in_flight += 1
+                stream.dispatched.append((sequence, timestamp))
+                self._num_in_flight += 1
+                slot_index = self._free_slots.pop()
+                self._num_tokens += 1
+                deadline = time.monotonic() + self.task_timeout if self.task_timeout is not None else None
+                self._tasks[slot_index] = (self._num_tokens, stream_id, stream.generation, sequence, deadline)
+                pool = self._pools[stream.worker] if self.tracking else self._pools[0]
+                return slot_index, self._num_tokens, stream.generation, pool, image
+        return None
+
+    def _expired_tasks(self):
+        """Returns the (slot index, token) of the frames in flight past their deadline, and the time to the next one."""
+        now = time.monotonic()
+        expired, timeout = [], None
+        for slot_index, (token, _, _, _, deadline) in self._tasks.items():
+            if deadline is None:
+                continue
+            if deadline <= now:
+                expired.append((slot_index, token))
+            elif timeout is None or deadline - now < timeout:
+                timeout = deadline - now
+        return expired, timeout
+
+    def _schedule(self):
+        while True:
+            with self._condition:
+                frame = self._next_frame()
+                expired, timeout = self._expired_tasks()
+                while frame is None and not expired and not self._closed:
+                    self._condition.wait(timeout)
+                    frame = self._next_frame()
+                    expired, timeout = self._expired_tasks()
+                if self._closed:
+                    return
+            for slot_index, token in expired:
+                self._complete(slot_index, token, None, None, TimeoutError(
+                    f'No result after {self.task_timeout} seconds, the worker may have died.'), expired=True)
+            if frame is not None:
+                self._dispatch(*frame)
+
+    def _dispatch(self, slot_index: int, token: int, stream_key: int, pool, image: np.ndarray):
+        try:
+            slot = self._slots[slot_index]
+            if slot is None or slot.size < image.nbytes:
+                if slot is not None:
+                    slot.close()
+                    slot.unlink()
+                slot = self._slots[slot_index] = shared_memory.SharedMemory(create=True, size=image.nbytes)
+            np.ndarray(image.shape, dtype=np.uint8, buffer=slot.buf)[:] = image
+            task = (slot_index, slot.name, image.shape, token, stream_key)
+            pool.apply_async(_process_frame, (task,), callback=self._on_result,
+                             error_callback=lambda error, task=task: self._on_error(task, error))
+        except Exception as error:
+            # the frame is delivered with the error rather than leaving its slot and its sequence taken
+            self._complete(slot_index, token, None, None, error)
+
+    def _on_result(self, result):
+        self._complete(*result, None)
+
+    def _on_error(self, task, error: BaseException):
+        slot_index, _, _, token, _ = task
+        self._complete(slot_index, token, None, None, error)
+
+    def _complete(self, slot_index: int, token: int, world_landmarks, uv_landmarks, error, expired: bool = False):
+        """Frees the slot of a processed frame and delivers the results of its stream that are in order.
+
+        Runs in the result thread of the pool, or in the scheduler thread for the frames that could not be dispatched or
+        timed out. The results in order are queued to the stream under the condition and delivered by _deliver.
+        """
+        stream = None
+        with self._condition:
+            task = self._tasks.get(slot_index)
+            if task is None or task[0] != token:
+                # the late result of a frame that timed out, the slot was freed then
+                return
+            try:
+                _, stream_id, generation, sequence, _ = task
+                stream = self._streams.get(stream_id)
+                if stream is not None and stream.generation != generation:
+                    stream = None
+                if stream is not None:
+                    stream.num_in_flight -= 1
+                    stream.completed[sequence] = (world_landmarks, uv_landmarks, error)
+                    while stream.dispatched and stream.dispatched[0][0] in stream.completed:
+                        sequence, timestamp = stream.dispatched.popleft()
+                        stream.ready.append((sequence, timestamp) + stream.completed.pop(sequence))
+                        stream.num_delivered += 1
+            finally:
+                del self._tasks[slot_index]
+                if expired and self._slots[slot_index] is not None:
+                    # the lost worker may still read the slot, the next frame of the slot gets a new shared memory
+                    self._slots[slot_index].close()
+                    self._slots[slot_index].unlink()
+                    self._slots[slot_index] = None
+                self._num_in_flight -= 1
+                self._free_slots.append(slot_index)
+                self._condition.notify_all()
+        if stream is not None:
+            self._deliver(stream_id, stream)
+
+    def _deliver(self, stream_id: Hashable, stream: _Stream):
+        """Delivers the ready results of a stream.
+
+        Another thread may have queued results while this one was delivering, or be delivering results queued before
+        the ones of this thread: under the delivery lock, the thread delivering takes all the ready results in order,
+        the others find none left.
+        """
+        with stream.delivery_lock:
+            while True:
+                with self._condition:
+                    if not stream.ready:
+                        return
+                    sequence, timestamp, world_landmarks, uv_landmarks, error = stream.ready.popleft()
+                self._deliver_result(stream_id, stream, sequence, timestamp, world_landmarks, uv_landmarks, error)
+
+    def _deliver_result(self, stream_id: Hashable, stream: _Stream, sequence: int, timestamp: float,
+                        world_landmarks, uv_landmarks, error):
+        try:
+            if stream.smoothing is not None and error is None:
+                world_landmarks, uv_landmarks = stream.smoothing(world_landmarks, uv_landmarks, timestamp)
+            if world_landmarks is not None and self.output_format == "LANDMARK_LIST":
+                world_landmarks = _array_to_landmark_list(world_landmarks)
+                uv_landmarks = _array_to_landmark_list(uv_landmarks)
+            elif self.output_format == "LANDMARK_SET":
+                world_landmarks, uv_landmarks = _array_to_landmark_sets(world_landmarks, uv_landmarks, self.type)
+        except Exception as delivery_error:
+            world_landmarks, uv_landmarks, error = None, None, delivery_error
+        result = StreamResult(stream_id, sequence, timestamp, world_landmarks, uv_landmarks, error)
+        if self.callback is not None:
+            self.callback(result)
+        else:
+            self._results.put(result)
+
+    def close(self):
+        """Stops the scheduler and the workers, the pending and in flight frames are not delivered."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._scheduler.join()
+        for pool in self._pools:
+            pool.terminate()
+        for pool in self._pools:
+            pool.join()
+        for slot in self._slots:
+            if slot is not None:
+                slot.close()
+                slot.unlink()
+        self._slots = [None] * self._max_in_flight
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,70 @@
+"""
+Association of the detected hands with the arms of the detected bodies.
+
+MPKeyPointSolution.process picks the hand of each side by its handedness label only, so with several people in the
+image a hand of one person can be stitched to the pose wrist of another. Here every hand is matched to the nearest
+pose wrist instead: the cost of a (wrist, hand) pair is the image distance of the hand wrist to the pose wrist in
+forearm lengths of that arm, plus a penalty when the handedness label disagrees with the side of the arm, and the pairs
+are taken greedily from the lowest cost. Hands farther than `max_cost` from every free wrist stay unassigned rather
+than stitched to a wrong arm.
+
+Coordinates are normalized image coordinates of the image the graphs run on, as given by the graphs.
+"""
+from typing import Tuple
+
+import numpy as np
+
+def hand_to_wrist_cost(wrist_uv: np.ndarray, forearm_lengths: np.ndarray, wrist_sides: np.ndarray,
+                       hand_wrist_uv: np.ndarray, hand_sides: np.ndarray, aspect_ratio: float = 1.,
+                       handedness_penalty: float = 0.5) -> np.ndarray:
+    """Computes the cost matrix of assigning each hand to each pose wrist.
+
+    Args:
+        wrist_uv (np.array): (W, 2) normalized x, y of the pose wrists.
+        forearm_lengths (np.array): (W,) normalized elbow to wrist length of each arm, along the image height; nan for
+            an arm that can not take a hand.
+        wrist_sides (np.array): (W,) side of each arm, 0 for left and 1 for right.
+        hand_wrist_uv (np.array): (H, 2) normalized x, y of the hand wrists.
+        hand_sides (np.array): (H,) side of each hand by its handedness label, 0 for left and 1 for right.
+        aspect_ratio (float, optional): width over height of the image, so that distances are isotropic. Defaults to
+            1.
+        handedness_penalty (float, optional): cost added when the side of the hand and of the arm differ, in forearm
+            lengths. Defaults to 0.5.
+
+    Returns:
+        np.array: (W, H) float32 costs, inf for arms that can not take a hand.
+    """
+    delta = wrist_uv[:, None, :2] - hand_wrist_uv[None, :, :2]
+    delta[..., 0] *= aspect_ratio
+    cost = np.linalg.norm(delta, axis=-1) / forearm_lengths[:, None]
+    cost += handedness_penalty * (wrist_sides[:, None] != hand_sides[None, :])
+    cost[~np.isfinite(cost)] = np.inf
+    return cost.astype(np.float32)
+
+def greedy_assignment(cost: np.ndarray, max_cost: float = np.inf) -> Tuple[np.ndarray, np.ndarray]:
+    """Assigns rows to columns one to one by increasing cost, leaving the pairs above max_cost unassigned.
+
+    Greedy rather than optimal: with a few arms and hands, and hands close to their own wrist, both agree.
+
+    Args:
+        cost (np.array): (R, C) cost matrix.
+        max_cost (float, optional): highest cost of an assigned pair. Defaults to inf.
+
+    Returns:
+        np.array: row indices of the assigned pairs.
+        np.array: column indices of the assigned pairs.
+    """
+    order = np.argsort(cost, axis=None, kind='stable')
+    order = order[cost.ravel()[order] <= max_cost]
+    used_rows = np.zeros(cost.shape[0], dtype=bool)
+    used_columns = np.zeros(cost.shape[1], dtype=bool)
+    rows, columns = [], []
+    for row, column in zip(*np.unravel_index(order, cost.shape)):
+        if used_rows[row] or used_columns[column]:
+            continue
+        used_rows[row] = used_columns[column] = True
+        rows.append(row)
+        columns.append(column)
+        if len(rows) == min(cost.shape):
+            break
+    return np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)
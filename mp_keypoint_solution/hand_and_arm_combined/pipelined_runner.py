@@ -0,0 +1,146 @@
+"""
+Pipelined capture / inference / render runner.
+
+The capture and the inference stages run in their own threads and the render stage runs in the calling thread (GUI
+calls like cv2.imshow need to stay in the main thread on some platforms). The stages are connected by bounded queues
+with a drop-oldest policy: when inference falls behind the camera, the stale frames are dropped instead of queued, so the
+latency from capture to render stays bounded by the queue sizes.
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# Marks the end of the stream in the stage queues.
+_END_OF_STREAM = object()
+
+class _Packet:
+    """A captured frame flowing through the stages."""
+    __slots__ = ('index', 'capture_time', 'frame', 'result')
+
+    def __init__(self, index: int, capture_time: float, frame: Any):
+        self.index = index
+        self.capture_time = capture_time
+        self.frame = frame
+        self.result = None
+
+def put_drop_oldest(bounded_queue: queue.Queue, item) -> int:
+    """Puts an item to a bounded queue, dropping the oldest items to make room if full.
+
+    Returns:
+        int: number of dropped items.
+    """
+    num_dropped = 0
+    while True:
+        try:
+            bounded_queue.put_nowait(item)
+            return num_dropped
+        except queue.Full:
+            try:
+                bounded_queue.get_nowait()
+                num_dropped += 1
+            except queue.Empty:
+                pass
+
+class PipelinedRunner:
+    """Runs capture, inference and render as a pipeline.
+
+    Args:
+        capture (Callable[[], Any]): returns the next frame, or None at the end of the stream.
+        infer (Callable[[Any], Any]): returns the inference result of a frame.
+        render (Callable[[Any, Any], bool]): renders a frame with its result, returns False to stop the pipeline.
+        queue_size (int, optional): capacity of the queues between the stages. Defaults to 1, i.e. always work on the
+            latest frame.
+    """
+    def __init__(self, capture: Callable[[], Any], infer: Callable[[Any], Any], render: Callable[[Any, Any], bool],
+                 queue_size: int = 1):
+        self.capture = capture
+        self.infer = infer
+        self.render = render
+        self._captured_queue = queue.Queue(maxsize=queue_size)
+        self._inferred_queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._error: Optional[BaseException] = None
+
+        self.num_captured = 0
+        self.num_rendered = 0
+        self.num_dropped_before_inference = 0
+        self.num_dropped_before_render = 0
+        self._total_latency = 0.
+
+    @property
+    def mean_latency(self) -> float:
+        """Mean time in seconds from capturing a frame to rendering it."""
+        return self._total_latency / self.num_rendered if self.num_rendered else 0.
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        """Whether the pipeline is stopping, a capture retrying a failed read should check it and return None."""
+        return self._stop_event.is_set()
+
+    def _run_stage(self, stage):
+        try:
+            stage()
+        except BaseException as e:
+            self._error = e
+            self._stop_event.set()
+
+    def _capture_loop(self):
+        try:
+            while not self._stop_event.is_set():
+                frame = self.capture()
+                if frame is None:
+                    break
+                packet = _Packet(self.num_captured, time.perf_counter(), frame)
+                self.num_captured += 1
+                self.num_dropped_before_inference += put_drop_oldest(self._captured_queue, packet)
+        finally:
+            put_drop_oldest(self._captured_queue, _END_OF_STREAM)
+
+    def _inference_loop(self):
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    packet = self._captured_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if packet is _END_OF_STREAM:
+                    break
+                packet.result = self.infer(packet.frame)
+                self.num_dropped_before_render += put_drop_oldest(self._inferred_queue, packet)
+        finally:
+            put_drop_oldest(self._inferred_queue, _END_OF_STREAM)
+
+    def run(self):
+        """Runs the pipeline until the end of the stream, stop() is called or render returns False.
+
+        Raises:
+            Exception: the exception raised in the capture or inference stage.
+        """
+        self._stop_event.clear()
+        threads = [threading.Thread(target=self._run_stage, args=(stage,), daemon=True)
+                   for stage in (self._capture_loop, self._inference_loop)]
+        for thread in threads:
+            thread.start()
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    packet = self._inferred_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if packet is _END_OF_STREAM:
+                    break
+                keep_running = self.render(packet.frame, packet.result)
+                self.num_rendered += 1
+                self._total_latency += time.perf_counter() - packet.capture_time
+                if keep_running is False:
+                    break
+        finally:
+            self._stop_event.set()
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,122 @@
+"""
+Model complexity and confidence profiles of the graphs of MPKeyPointSolution.
+
+- fast        lite hands and pose models, for edge devices.
+- balanced    full hands and lite pose models, the options MPKeyPointSolution always used.
+- accurate    full hands and pose models.
+
+MPKeyPointSolution(profile=...) takes a profile name or a ModelProfile, and set_profile switches it between frames. An
+AdaptiveProfileController given as MPKeyPointSolution(profile_controller=...) switches to the next faster profile when
+the smoothed graphs latency exceeds the frame time of the target fps, and back to the slower one when there is enough
+headroom. Building the graphs of a profile loads its models, preload_profiles builds them beforehand so that switching
+does not stall the stream.
+"""
+import dataclasses
+from typing import Dict, Optional, Sequence, Union
+
+@dataclasses.dataclass(frozen=True)
+class ModelProfile:
+    """Options of the hands and pose graphs."""
+    name: str
+    # 0 or 1
+    hands_model_complexity: int = 1
+    # 0, 1 or 2
+    pose_model_complexity: int = 0
+    min_detection_confidence: float = 0.5
+    min_tracking_confidence: float = 0.5
+
+    def hands_options(self) -> dict:
+        """Keyword arguments of mediapipe Hands besides the mode and the number of hands."""
+        return dict(model_complexity=self.hands_model_complexity,
+                    min_detection_confidence=self.min_detection_confidence,
+                    min_tracking_confidence=self.min_tracking_confidence)
+
+    def pose_options(self) -> dict:
+        """Keyword arguments of mediapipe Pose besides the mode."""
+        return dict(model_complexity=self.pose_model_complexity,
+                    min_detection_confidence=self.min_detection_confidence,
+                    min_tracking_confidence=self.min_tracking_confidence)
+
+PROFILES: Dict[str, ModelProfile] = {profile.name: profile for profile in [
+    ModelProfile("fast", hands_model_complexity=0, pose_model_complexity=0),
+    ModelProfile("balanced", hands_model_complexity=1, pose_model_complexity=0),
+    ModelProfile("accurate", hands_model_complexity=1, pose_model_complexity=1),
+]}
+
+def get_profile(profile: Union[str, ModelProfile]) -> ModelProfile:
+    """Returns the profile of a name in PROFILES, or the profile itself."""
+    if isinstance(profile, ModelProfile):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown profile: {profile}, expected one of {list(PROFILES)}')
+    return PROFILES[profile]
+
+class AdaptiveProfileController:
+    """Chooses the profile of the graphs to keep their latency within the frame time of a target fps.
+
+    Args:
+        target_fps (float): frame rate to sustain.
+        profiles (List[str or ModelProfile], optional): the profiles to switch between, from the fastest to the most
+            accurate. Defaults to ("fast", "balanced", "accurate").
+        headroom (float, optional): ratio of the frame time under which a more accurate profile is tried. Defaults to
+            0.6.
+        smoothing (float, optional): weight of the newest latency in its exponential moving average. Defaults to 0.1.
+        cooldown (int, optional): number of frames between two switches, to observe the latency of the new profile.
+            Defaults to 30.
+    """
+    def __init__(self, target_fps: float,
+                 profiles: Sequence[Union[str, ModelProfile]] = ("fast", "balanced", "accurate"),
+                 headroom: float = 0.6, smoothing: float = 0.1, cooldown: int = 30):
+        self.target_fps = target_fps
+        self.profiles = [get_profile(profile) for profile in profiles]
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.smoothed_latency_ms = None
+        # the smoothed latency of each profile when it was left, to not switch back to a profile known to be too slow
+        self.profile_latency_ms: Dict[ModelProfile, float] = {}
+        self._frames_since_switch = 0
+        self._switched = False
+
+    @property
+    def frame_time_ms(self) -> float:
+        return 1000. / self.target_fps
+
+    def update(self, profile: ModelProfile, latency_ms: float) -> ModelProfile:
+        """Feeds the graphs latency of a frame run with a profile, returns the profile to run the next frames with."""
+        if self._switched:
+            # the first frame of the new graphs includes their initialization
+            self._switched = False
+            return profile
+        if self.smoothed_latency_ms is None:
+            self.smoothed_latency_ms = latency_ms
+        else:
+            self.smoothed_latency_ms += self.smoothing * (latency_ms - self.smoothed_latency_ms)
+        self._frames_since_switch += 1
+        if self._frames_since_switch < self.cooldown or profile not in self.profiles:
+            return profile
+        index = self.profiles.index(profile)
+        next_profile = None
+        if self.smoothed_latency_ms > self.frame_time_ms and index > 0:
+            next_profile = self.profiles[index - 1]
+        elif self.smoothed_latency_ms < self.headroom * self.frame_time_ms and index < len(self.profiles) - 1:
+            more_accurate = self.profiles[index + 1]
+            if self.profile_latency_ms.get(more_accurate, 0.) <= self.frame_time_ms:
+                next_profile = more_accurate
+        if next_profile is None:
+            return profile
+        self.profile_latency_ms[profile] = self.smoothed_latency_ms
+        self.smoothed_latency_ms = None
+        self._frames_since_switch = 0
+        self._switched = True
+        return next_profile
+
+    def reset(self, profile: Optional[ModelProfile] = None):
+        """Forgets the latencies, of a profile only if given, e.g. when the load of the machine changed."""
+        if profile is None:
+            self.profile_latency_ms.clear()
+        else:
+            self.profile_latency_ms.pop(profile, None)
+        self.smoothed_latency_ms = None
+        self._frames_since_switch = 0
+        self._switched = False
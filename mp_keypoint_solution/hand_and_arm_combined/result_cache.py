@@ -0,0 +1,191 @@
+"""
+Cache of MPKeyPointSolution.process results for static_image_mode workloads.
+
+Pass a ResultCache to MPKeyPointSolution(static_image_mode=True, result_cache=...) so that an image processed before, by
+a solution of the same configuration, returns its keypoints without running the graphs, e.g. when the experiments over
+a dataset are rerun. Only valid for unrelated images: in video mode the results depend on the previous frames.
+
+The key is a blake2b hash of the image bytes, shape and dtype, and of the configuration of the solution and the call.
+The results are kept as "ARRAY" in an in-memory LRU, and optionally in a directory of .npz files, one per key, that
+persists across runs and evicts its least recently used files beyond a size limit. The sizes and the use order of the
+files are kept in memory, listed once when the cache is created, and a full directory is evicted down to a low-water
+mark so that the next inserts do not evict again. Processes may share the directory: a file deleted by another one is
+a miss, never an error. The mediapipe version is not part of the key, clear the directory after upgrading it.
+"""
+import collections
+import contextlib
+import glob
+import hashlib
+import os
+import threading
+from typing import Hashable, Optional, Tuple
+
+import numpy as np
+
+# a cached result, the "ARRAY" world and normalized keypoints, both None if nothing detected
+CachedResult = Tuple[Optional[np.ndarray], Optional[np.ndarray]]
+
+class ResultCache:
+    """In-memory LRU of process results, optionally backed by a directory.
+
+    Args:
+        max_entries (int, optional): number of results kept in memory. Defaults to 4096.
+        directory (str, optional): directory to persist the results in, created if needed. Defaults to None, memory
+            only.
+        max_disk_bytes (int, optional): size of the directory above which the least recently used files are deleted.
+            Defaults to None, no limit.
+        low_water_ratio (float, optional): the files are deleted until the directory is under this ratio of
+            max_disk_bytes. Defaults to 0.8.
+    """
+    def __init__(self, max_entries: int = 4096, directory: Optional[str] = None, max_disk_bytes: Optional[int] = None,
+                 low_water_ratio: float = 0.8):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.low_water_ratio = low_water_ratio
+        self._entries = collections.OrderedDict()
+        # key to file size of the files in the directory, from the least to the most recently used
+        self._files = collections.OrderedDict()
+        self._disk_bytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_files()
+        self.counters = collections.Counter()
+        # the solution may be shared by threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(image: np.ndarray, config: Hashable) -> str:
+        """Hashes an image and a configuration into a cache key.
+
+        Args:
+            image (np.array): the image as given to process.
+            config (Hashable): everything else the result depends on, with a stable repr.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((image.shape, image.dtype.str, config)).encode())
+        digest.update(memoryview(np.ascontiguousarray(image)).cast('B'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def _scan_files(self):
+        files = []
+        for path in glob.glob(os.path.join(self.directory, '*.npz')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, os.path.basename(path)[:-len('.npz')], stat.st_size))
+        self._files = collections.OrderedDict((key, size) for _, key, size in sorted(files))
+        self._disk_bytes = sum(self._files.values())
+
+    def _track_file(self, key: str, size: int):
+        self._disk_bytes += size - self._files.pop(key, 0)
+        self._files[key] = size
+
+    def _untrack_file(self, key: str):
+        self._disk_bytes -= self._files.pop(key, 0)
+
+    def _remember(self, key: str, result: CachedResult):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters['memory_evictions'] += 1
+
+    def _load(self, key: str) -> Optional[CachedResult]:
+        try:
+            with np.load(self._path(key)) as data:
+                result = (data['world'], data['uv']) if data['detected'] else (None, None)
+        except FileNotFoundError:
+            # never written, or evicted by another process
+            self._untrack_file(key)
+            return None
+        except (OSError, KeyError, ValueError):
+            # partially written by a killed run
+            return None
+        try:
+            # the modification time orders the files for eviction in the next runs
+            os.utime(self._path(key))
+            size = os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            self._untrack_file(key)
+        else:
+            # possibly written by another process since the directory was listed
+            self._track_file(key, size)
+        return result
+
+    def _save(self, key: str, result: CachedResult):
+        world_landmarks, uv_landmarks = result
+        detected = world_landmarks is not None
+        path = self._path(key)
+        temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, detected=detected, world=world_landmarks if detected else np.empty((0, 3), np.float32),
+                     uv=uv_landmarks if detected else np.empty((0, 3), np.float32))
+            size = file.tell()
+        os.replace(temporary_path, path)
+        self._track_file(key, size)
+        if self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes:
+            self._evict_files()
+
+    def _evict_files(self):
+        """Deletes the least recently used files until the directory is under the low-water mark."""
+        low_water_bytes = self.low_water_ratio * self.max_disk_bytes
+        while self._files and self._disk_bytes > low_water_bytes:
+            key, size = self._files.popitem(last=False)
+            self._disk_bytes -= size
+            # another process sharing the directory may have deleted it already
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._path(key))
+            self.counters['disk_evictions'] += 1
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        """Returns the cached result of a key, None on a miss."""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return result
+            if self.directory is not None:
+                result = self._load(key)
+                if result is not None:
+                    self._remember(key, result)
+                    self.counters['disk_hits'] += 1
+                    return result
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key: str, result: CachedResult):
+        """Caches the "ARRAY" result of a key, the arrays must not be modified afterwards."""
+        with self._lock:
+            self._remember(key, result)
+            if self.directory is not None:
+                self._save(key, result)
+
+    @property
+    def hit_rate(self) -> float:
+        num_hits = self.counters['memory_hits'] + self.counters['disk_hits']
+        num_lookups = num_hits + self.counters['misses']
+        return num_hits / num_lookups if num_lookups else 0.
+
+    def stats(self) -> dict:
+        """Returns the hit, miss and eviction counters, the hit rate and the sizes of the cache."""
+        with self._lock:
+            return {'counters': dict(self.counters), 'hit_rate': self.hit_rate, 'memory_entries': len(self._entries),
+                    'disk_bytes': self._disk_bytes}
+
+    def clear(self, disk: bool = False):
+        """Empties the memory cache, and the directory if disk."""
+        with self._lock:
+            self._entries.clear()
+            self.counters.clear()
+            if disk and self.directory is not None:
+                for file in glob.glob(os.path.join(self.directory, '*.npz')):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(file)
+                self._files.clear()
+                self._disk_bytes = 0
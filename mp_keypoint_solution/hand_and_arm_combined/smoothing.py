@@ -0,0 +1,135 @@
+"""
+Temporal smoothing of the keypoints of a stream.
+
+A One-Euro filter (Casiez et al., 2012) is a low pass filter whose cutoff frequency rises with the speed, it removes the
+jitter of a still hand and keeps a moving hand without lag. OneEuroFilter filters whole (N, 3) arrays at once with a
+constant size state per stream, and rejects the keypoints jumping faster than a speed limit, e.g. a hand wrongly
+stitched to the pose wrist for a frame.
+
+A nan keypoint, e.g. of the undetected side of "BOTH_SIDE", stays nan and its filter restarts when it is detected
+again.
+"""
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+def _smoothing_factor(cutoff, dt: float):
+    """Exponential smoothing factor of a low pass filter of the cutoff frequency in Hz, for the time step in seconds."""
+    tau = 1. / (2 * np.pi * cutoff)
+    return 1. / (1. + tau / dt)
+
+class OneEuroFilter:
+    """Streaming One-Euro filter of (N, 3) keypoint arrays.
+
+    Args:
+        min_cutoff (float, optional): cutoff frequency in Hz of a still keypoint, lower for less jitter. Defaults to
+            1.0.
+        beta (float, optional): rise of the cutoff frequency per unit of speed, higher for less lag of a moving
+            keypoint. Defaults to 30.0.
+        d_cutoff (float, optional): cutoff frequency in Hz of the speed estimate. Defaults to 1.0.
+        max_speed (float, optional): speed in units per second above which a keypoint is an outlier, held at its
+            filtered position. Defaults to None, no outlier rejection.
+        max_rejected_frames (int, optional): number of consecutive frames a keypoint can be rejected, after which it
+            is accepted as a real fast move. Defaults to 3.
+        frequency (float, optional): frame rate assumed when no timestamps are given. Defaults to 30.
+    """
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 30.0, d_cutoff: float = 1.0,
+                 max_speed: Optional[float] = None, max_rejected_frames: int = 3, frequency: float = 30.):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.max_speed = max_speed
+        self.max_rejected_frames = max_rejected_frames
+        self.frequency = frequency
+        self.reset()
+
+    def reset(self):
+        """Forgets the stream, the next keypoints are taken as they are."""
+        self._x = None
+        self._dx = None
+        self._num_rejected = None
+        self._timestamp = None
+        self.num_rejected_total = 0
+
+    def __call__(self, x: Optional[np.ndarray], timestamp: Optional[float] = None) -> Optional[np.ndarray]:
+        """Filters the keypoints of a frame.
+
+        Args:
+            x (np.array): (N, 3) keypoints, nan rows for missing keypoints. None for a frame without keypoints, which
+                leaves the state as it is.
+            timestamp (float, optional): timestamp of the frame in seconds. Defaults to None, the frames are
+                1 / frequency apart.
+
+        Returns:
+            np.array: the filtered keypoints, of the dtype of x. None if x is None.
+        """
+        if x is None:
+            return None
+        x = np.asarray(x)
+        dtype = x.dtype
+        x = x.astype(np.float64)
+        valid = ~np.isnan(x).any(axis=-1)
+        if self._x is None or self._x.shape != x.shape:
+            self._x = x
+            self._dx = np.zeros_like(x)
+            self._num_rejected = np.zeros(x.shape[:-1], dtype=np.int32)
+            self._timestamp = timestamp
+            return x.astype(dtype)
+
+        dt = 1. / self.frequency
+        if timestamp is not None and self._timestamp is not None and timestamp > self._timestamp:
+            dt = timestamp - self._timestamp
+        self._timestamp = timestamp
+        # keypoints detected again restart from their value
+        fresh = valid & np.isnan(self._x).any(axis=-1)
+        tracked = valid & ~fresh
+
+        if self.max_speed is not None:
+            speed = np.linalg.norm(x - self._x, axis=-1) / dt
+            with np.errstate(invalid='ignore'):
+                outliers = tracked & (speed > self.max_speed) & (self._num_rejected < self.max_rejected_frames)
+            self._num_rejected = np.where(outliers, self._num_rejected + 1, 0)
+            if outliers.any():
+                self.num_rejected_total += int(outliers.sum())
+                # held at the filtered position, with a zero speed
+                x = np.where(outliers[..., None], self._x, x)
+
+        dx = self._dx + _smoothing_factor(self.d_cutoff, dt) * ((x - self._x) / dt - self._dx)
+        # the cutoff follows the speed of the keypoint, not of each coordinate
+        cutoff = self.min_cutoff + self.beta * np.linalg.norm(dx, axis=-1, keepdims=True)
+        filtered = self._x + _smoothing_factor(cutoff, dt) * (x - self._x)
+
+        untracked = ~tracked
+        filtered[untracked] = x[untracked]
+        dx[untracked] = 0
+        self._x, self._dx = filtered, dx
+        return filtered.astype(dtype)
+
+class LandmarkSmoother:
+    """Smooths the world and the normalized keypoints returned by MPKeyPointSolution.process for a stream.
+
+    Args:
+        world_filter (OneEuroFilter, optional): filter of the world keypoints in meters. Defaults to a OneEuroFilter
+            rejecting keypoints faster than 10 m/s.
+        uv_filter (OneEuroFilter, optional): filter of the normalized keypoints. Defaults to a OneEuroFilter.
+    """
+    def __init__(self, world_filter: Optional[OneEuroFilter] = None, uv_filter: Optional[OneEuroFilter] = None):
+        self.world_filter = OneEuroFilter(max_speed=10.) if world_filter is None else world_filter
+        self.uv_filter = OneEuroFilter() if uv_filter is None else uv_filter
+
+    def reset(self):
+        self.world_filter.reset()
+        self.uv_filter.reset()
+
+    def __call__(self, world_landmarks: Optional[np.ndarray], uv_landmarks: Optional[np.ndarray],
+                 timestamp: Optional[float] = None) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Filters the (N, 3) world and normalized keypoints of a frame, None if not detected.
+
+        Args:
+            timestamp (float, optional): timestamp of the frame in seconds. Defaults to None, the current monotonic
+                time.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        return self.world_filter(world_landmarks, timestamp), self.uv_filter(uv_landmarks, timestamp)
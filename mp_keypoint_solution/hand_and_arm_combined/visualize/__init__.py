@@ -1,5 +1,26 @@
-from .drawing2d_utils import draw2d_landmarks
-from .drawing3d_utils import plot3d_landmarks, plot3d_landmarks_on_figure
-from .drawing_styles import get_default_hand_2d_landmarks_style
-from .drawing_styles import get_default_hand_2d_connections_style
-from .single_hand_arm_connections import SINGLE_ARM_HAND_CONNECTIONS
\ No newline at end of file
+# The drawing utilities import cv2 (and matplotlib for the 3d plots), load them on first use
+from ..lazy_import import lazy_attributes
+
+_ATTRIBUTE_MODULES = {
+    'draw2d_landmarks': '.drawing2d_utils',
+    'draw2d_landmarks_batched': '.drawing2d_utils',
+    'draw2d_landmark_groups': '.drawing2d_utils',
+    'draw2d_landmarks_with_style': '.drawing2d_utils',
+    'group_connections_by_style': '.drawing2d_utils',
+    'group_landmarks_by_style': '.drawing2d_utils',
+    'plot3d_landmarks': '.drawing3d_utils',
+    'plot3d_landmarks_on_figure': '.drawing3d_utils',
+    'Landmark3DRenderer': '.render3d_utils',
+    'project_3d_landmarks': '.render3d_utils',
+    'write3d_landmarks_video': '.render3d_utils',
+    'get_default_hand_2d_landmarks_style': '.drawing_styles',
+    'get_default_hand_2d_connections_style': '.drawing_styles',
+    'CompiledHandStyle': '.drawing_styles',
+    'compile_hand_2d_style': '.drawing_styles',
+    'get_default_hand_2d_style': '.drawing_styles',
+    'get_default_both_side_2d_style': '.drawing_styles',
+    'get_default_2d_style': '.drawing_styles',
+    'SINGLE_ARM_HAND_CONNECTIONS': '.single_hand_arm_connections',
+}
+__all__ = list(_ATTRIBUTE_MODULES)
+__getattr__, __dir__ = lazy_attributes(__name__, _ATTRIBUTE_MODULES)
@@ -6,6 +6,7 @@ from ..data_structures.landmark import Landmark
 import numpy as np
 import cv2
 from .drawing_common import DrawingSpec, RED_COLOR, WHITE_COLOR, _BGR_CHANNELS, _PRESENCE_THRESHOLD, _VISIBILITY_THRESHOLD
+from .drawing_styles import CompiledHandStyle
   
 def _normalized_to_pixel_coordinates(
     normalized_x: float, normalized_y: float, image_width: int,
@@ -42,7 +43,7 @@ def draw2d_landmarks(
   Args:
     image: A three channel BGR image represented as numpy ndarray.
     landmark_list: A normalized landmark list proto message to be annotated on
-      the image.
+      the image, None for a missing landmark.
     connections: A list of landmark index tuples that specifies how landmarks to
       be connected in the drawing.
     landmark_drawing_spec: Either a DrawingSpec object or a mapping from hand
@@ -68,6 +69,9 @@ def draw2d_landmarks(
   image_rows, image_cols, _ = image.shape
   idx_to_coordinates = {}
   for idx, landmark in enumerate(landmark_list):
+    # None for the landmarks of a missing side
+    if landmark is None:
+      continue
     if ((hasattr(landmark, 'visibility') and
          landmark.visibility < _VISIBILITY_THRESHOLD) or
         (hasattr(landmark, 'presence') and
@@ -107,3 +111,234 @@ def draw2d_landmarks(
       cv2.circle(image, landmark_px, drawing_spec.circle_radius,
                  drawing_spec.color, drawing_spec.thickness)
 
+
+def _landmarks_to_pixel_coordinates(
+    landmark_list, image_width: int,
+    image_height: int) -> Tuple[np.ndarray, np.ndarray]:
+  """Converts normalized landmarks to pixel coordinates in one array operation.
+
+  Args:
+    landmark_list: A (N, 2+) array of normalized coordinates, a LandmarkSet or a
+      sequence of landmarks, None for a missing landmark.
+    image_width: Width of the image.
+    image_height: Height of the image.
+
+  Returns:
+    A (N, 2) int32 array of pixel coordinates and a (N,) bool array of the
+    landmarks to draw, i.e. visible, present and inside the image.
+  """
+  if isinstance(landmark_list, np.ndarray):
+    xy = landmark_list[:, :2]
+    drawable = np.ones(len(xy), dtype=bool)
+  elif hasattr(landmark_list, 'xyz'):
+    xy = landmark_list.xyz[:, :2]
+    drawable = np.ones(len(xy), dtype=bool)
+    if landmark_list.visibility is not None:
+      drawable &= landmark_list.visibility >= _VISIBILITY_THRESHOLD
+    if landmark_list.presence is not None:
+      drawable &= landmark_list.presence >= _PRESENCE_THRESHOLD
+  else:
+    values = np.array([
+        (np.nan, np.nan, 0., 0.) if landmark is None else
+        (landmark.x, landmark.y, getattr(landmark, 'visibility', 1.),
+         getattr(landmark, 'presence', 1.)) for landmark in landmark_list
+    ], dtype=np.float64).reshape(-1, 4)
+    xy = values[:, :2]
+    drawable = ((values[:, 2] >= _VISIBILITY_THRESHOLD) &
+                (values[:, 3] >= _PRESENCE_THRESHOLD))
+  # Same bounds as _normalized_to_pixel_coordinates, nan is out of bounds.
+  with np.errstate(invalid='ignore'):
+    drawable &= ((xy >= 0) & (xy <= 1 + 1e-9)).all(axis=1)
+    pixels = np.minimum(np.floor(xy * (image_width, image_height)),
+                        (image_width - 1, image_height - 1))
+  pixels[~drawable] = 0
+  return pixels.astype(np.int32), drawable
+
+def group_connections_by_style(
+    connections: List[Tuple[int, int]],
+    connection_drawing_spec: Union[DrawingSpec, Mapping[Tuple[int, int],
+                                                        DrawingSpec]],
+    num_landmarks: Optional[int] = None
+) -> List[Tuple[Tuple[int, int, int], int, np.ndarray]]:
+  """Groups connections sharing the same color and thickness.
+
+  Args:
+    connections: A list of landmark index tuples.
+    connection_drawing_spec: Either a DrawingSpec object or a mapping from
+      connections to the DrawingSpecs.
+    num_landmarks: If given, checks the landmark indices of the connections.
+
+  Returns:
+    A list of (color, thickness, (M, 2) array of landmark index pairs).
+
+  Raises:
+    ValueError: If any connetions contain invalid landmark index.
+  """
+  groups = {}
+  for connection in connections:
+    start_idx, end_idx = connection
+    if num_landmarks is not None and not (0 <= start_idx < num_landmarks and
+                                          0 <= end_idx < num_landmarks):
+      raise ValueError(f'Landmark index is out of range. Invalid connection '
+                       f'from landmark #{start_idx} to landmark #{end_idx}.')
+    drawing_spec = connection_drawing_spec[connection] if isinstance(
+        connection_drawing_spec, Mapping) else connection_drawing_spec
+    groups.setdefault((tuple(drawing_spec.color), drawing_spec.thickness),
+                      []).append(connection)
+  return [(color, thickness, np.array(group, dtype=np.intp).reshape(-1, 2))
+          for (color, thickness), group in groups.items()]
+
+def group_landmarks_by_style(
+    num_landmarks: int,
+    landmark_drawing_spec: Union[DrawingSpec, Mapping[int, DrawingSpec]]
+) -> List[Tuple[Tuple[int, int, int], int, int, np.ndarray]]:
+  """Groups landmarks sharing the same color, thickness and circle radius.
+
+  Returns:
+    A list of (color, thickness, circle radius, array of landmark indices).
+  """
+  groups = {}
+  for idx in range(num_landmarks):
+    if isinstance(landmark_drawing_spec, Mapping):
+      if idx not in landmark_drawing_spec:
+        continue
+      drawing_spec = landmark_drawing_spec[idx]
+    else:
+      drawing_spec = landmark_drawing_spec
+    groups.setdefault((tuple(drawing_spec.color), drawing_spec.thickness,
+                       drawing_spec.circle_radius), []).append(idx)
+  return [(color, thickness, radius, np.array(group, dtype=np.intp))
+          for (color, thickness, radius), group in groups.items()]
+
+def _draw_circles(image: np.ndarray, segments: np.ndarray, radius: int,
+                  color: Tuple[int, int, int], thickness: int):
+  """Draws circles at the start points of (K, 2, 2) zero length segments."""
+  if not len(segments):
+    return
+  if thickness < 0:
+    # A zero length line of thickness 2 * radius is exactly the filled circle,
+    # so that all the filled circles of a style are drawn in one call.
+    cv2.polylines(image, segments, False, color, 2 * radius)
+  else:
+    for center in segments[:, 0].tolist():
+      cv2.circle(image, center, radius, color, thickness)
+
+def draw2d_landmark_groups(
+    image: np.ndarray,
+    landmark_list,
+    connection_groups: Optional[
+        List[Tuple[Tuple[int, int, int], int, np.ndarray]]] = None,
+    landmark_groups: Optional[
+        List[Tuple[Tuple[int, int, int], int, int, np.ndarray]]] = None):
+  """Draws the landmarks and the connections grouped by style on the image.
+
+  All the landmarks are converted to pixels with one array operation, the
+  connections of a style are drawn with a single cv2.polylines call, as well
+  as the filled landmark circles of a style. The white borders of all the
+  landmarks are drawn before their fills.
+
+  Args:
+    image: A three channel BGR image represented as numpy ndarray.
+    landmark_list: A normalized landmark list, LandmarkSet or (N, 2+) array.
+    connection_groups: Connections grouped by group_connections_by_style, with
+      valid landmark indices. If None, no connections will be drawn.
+    landmark_groups: Landmarks grouped by group_landmarks_by_style. If None,
+      no landmarks will be drawn.
+
+  Raises:
+    ValueError: If the input image is not three channel BGR.
+  """
+  if landmark_list is None or not len(landmark_list):
+    return
+  if image.shape[2] != _BGR_CHANNELS:
+    raise ValueError('Input image must contain three channel bgr data.')
+  image_rows, image_cols, _ = image.shape
+  pixels, drawable = _landmarks_to_pixel_coordinates(landmark_list, image_cols,
+                                                     image_rows)
+  all_drawable = drawable.all()
+  if connection_groups:
+    for color, thickness, pairs in connection_groups:
+      # Draws the connections if the start and end landmarks are both visible.
+      if not all_drawable:
+        pairs = pairs[drawable[pairs].all(axis=1)]
+      if len(pairs):
+        cv2.polylines(image, pixels[pairs], False, color, thickness)
+  if landmark_groups:
+    # Zero length segments at each landmark to draw circles with polylines.
+    segments = np.repeat(pixels[:, None], 2, axis=1)
+    if not all_drawable:
+      landmark_groups = [
+          (color, thickness, radius, indices[drawable[indices]])
+          for color, thickness, radius, indices in landmark_groups]
+    # White circle borders, all the landmarks of the same border in one call
+    borders = {}
+    for _, thickness, radius, indices in landmark_groups:
+      circle_border_radius = max(radius + 1, int(radius * 1.2))
+      borders.setdefault((circle_border_radius, thickness), []).append(indices)
+    for (circle_border_radius, thickness), indices in borders.items():
+      _draw_circles(image, segments[np.concatenate(indices)],
+                    circle_border_radius, WHITE_COLOR, thickness)
+    for color, thickness, radius, indices in landmark_groups:
+      # Fill color into the circle
+      _draw_circles(image, segments[indices], radius, color, thickness)
+
+def draw2d_landmarks_batched(
+    image: np.ndarray,
+    landmark_list,
+    connections: Optional[List[Tuple[int, int]]] = None,
+    landmark_drawing_spec: Optional[
+        Union[DrawingSpec, Mapping[int, DrawingSpec]]
+    ] = DrawingSpec(color=RED_COLOR),
+    connection_drawing_spec: Union[
+        DrawingSpec, Mapping[Tuple[int, int], DrawingSpec]
+    ] = DrawingSpec(),
+    is_drawing_landmarks: bool = True,
+):
+  """Draws the landmarks and the connections on the image, batched by style.
+
+  Same arguments as draw2d_landmarks, drawn by draw2d_landmark_groups. The
+  landmark_list can also be a LandmarkSet or a (N, 2+) array.
+
+  Raises:
+    ValueError: If one of the followings:
+      a) If the input image is not three channel BGR.
+      b) If any connetions contain invalid landmark index.
+  """
+  if landmark_list is None or not len(landmark_list):
+    return
+  num_landmarks = len(landmark_list)
+  connection_groups = group_connections_by_style(
+      connections, connection_drawing_spec, num_landmarks) if (
+          connections and connection_drawing_spec) else None
+  landmark_groups = group_landmarks_by_style(
+      num_landmarks, landmark_drawing_spec) if (
+          is_drawing_landmarks and landmark_drawing_spec) else None
+  draw2d_landmark_groups(image, landmark_list, connection_groups,
+                         landmark_groups)
+
+def draw2d_landmarks_with_style(image: np.ndarray,
+                                landmark_list,
+                                style: CompiledHandStyle,
+                                is_drawing_landmarks: bool = True):
+  """Draws the landmarks and the connections of a compiled style on the image.
+
+  Args:
+    image: A three channel BGR image represented as numpy ndarray.
+    landmark_list: A normalized landmark list, LandmarkSet or (N, 2+) array.
+    style: A CompiledHandStyle from compile_hand_2d_style, compiled once, e.g.
+      get_default_hand_2d_style().
+    is_drawing_landmarks: Whether to draw the landmarks or only the connections.
+
+  Raises:
+    ValueError: If one of the followings:
+      a) If the input image is not three channel BGR.
+      b) If the landmarks do not match the style.
+  """
+  if landmark_list is None or not len(landmark_list):
+    return
+  if len(landmark_list) != len(style.landmark_radius):
+    raise ValueError(f'Expect {len(style.landmark_radius)} landmarks for the '
+                     f'style, got {len(landmark_list)}.')
+  draw2d_landmark_groups(
+      image, landmark_list, style.connection_groups,
+      style.landmark_groups if is_drawing_landmarks else None)
@@ -5,14 +5,13 @@ from typing import Sequence, Optional, Tuple, List
 from ..data_structures import Landmark
 from .drawing_common import DrawingSpec, RED_COLOR, BLACK_COLOR, _VISIBILITY_THRESHOLD, _PRESENCE_THRESHOLD
 
-import matplotlib
-matplotlib.use('tkagg')
-import matplotlib.pyplot as plt
+# matplotlib is imported on first plot and keeps its default backend, headless
+# rendering without matplotlib is in render3d_utils.
 
 def _normalize_color(color):
   return tuple(v / 255. for v in color)
 
-def plot3d_landmarks_on_figure(ax: plt.Axes, landmark_list: Sequence[Landmark],
+def plot3d_landmarks_on_figure(ax: 'matplotlib.axes.Axes', landmark_list: Sequence[Landmark],
                    connections: Optional[List[Tuple[int, int]]] = None,
                    landmark_drawing_spec: DrawingSpec = DrawingSpec(
                        color=RED_COLOR, thickness=5),
@@ -24,7 +23,8 @@ def plot3d_landmarks_on_figure(ax: plt.Axes, landmark_list: Sequence[Landmark],
 
   Args:
     ax: figure axes.
-    landmark_list: A normalized landmark list proto message to be plotted.
+    landmark_list: A normalized landmark list proto message to be plotted, None
+      for a missing landmark.
     connections: A list of landmark index tuples that specifies how landmarks to
       be connected.
     landmark_drawing_spec: A DrawingSpec object that specifies the landmarks'
@@ -37,23 +37,31 @@ def plot3d_landmarks_on_figure(ax: plt.Axes, landmark_list: Sequence[Landmark],
   Raises:
     ValueError: If any connection contains an invalid landmark index.
   """
+  from mpl_toolkits.mplot3d.art3d import Line3DCollection
   ax.view_init(elev=elevation, azim=azimuth)
   plotted_landmarks = {}
   for idx, landmark in enumerate(landmark_list):
+    # None for the landmarks of a missing side
+    if landmark is None:
+      continue
     if ((hasattr(landmark, 'visibility') and
         landmark.visibility < _VISIBILITY_THRESHOLD) or
         (hasattr(landmark, 'presence') and
         landmark.presence < _PRESENCE_THRESHOLD)):
       continue
+    plotted_landmarks[idx] = (-landmark.z, landmark.x, -landmark.y)
+  if plotted_landmarks:
+    # All the landmarks in one scatter
+    xs, ys, zs = zip(*plotted_landmarks.values())
     ax.scatter3D(
-        xs=[-landmark.z],
-        ys=[landmark.x],
-        zs=[-landmark.y],
+        xs=xs,
+        ys=ys,
+        zs=zs,
         color=_normalize_color(landmark_drawing_spec.color[::-1]),
         linewidth=landmark_drawing_spec.thickness)
-    plotted_landmarks[idx] = (-landmark.z, landmark.x, -landmark.y)
   if connections:
     num_landmarks = len(landmark_list)
+    segments = []
     # Draws the connections if the start and end landmarks are both visible.
     for connection in connections:
       start_idx = connection[0]
@@ -62,16 +70,15 @@ def plot3d_landmarks_on_figure(ax: plt.Axes, landmark_list: Sequence[Landmark],
         raise ValueError(f'Landmark index is out of range. Invalid connection '
                         f'from landmark #{start_idx} to landmark #{end_idx}.')
       if start_idx in plotted_landmarks and end_idx in plotted_landmarks:
-        landmark_pair = [
-            plotted_landmarks[start_idx], plotted_landmarks[end_idx]
-        ]
-        ax.plot3D(
-            xs=[landmark_pair[0][0], landmark_pair[1][0]],
-            ys=[landmark_pair[0][1], landmark_pair[1][1]],
-            zs=[landmark_pair[0][2], landmark_pair[1][2]],
-            color=_normalize_color(connection_drawing_spec.color[::-1]),
-            linewidth=connection_drawing_spec.thickness)
-  
+        segments.append(
+            [plotted_landmarks[start_idx], plotted_landmarks[end_idx]])
+    if segments:
+      # All the connections in one line collection
+      ax.add_collection3d(Line3DCollection(
+          segments,
+          colors=[_normalize_color(connection_drawing_spec.color[::-1])],
+          linewidths=connection_drawing_spec.thickness))
+
 def plot3d_landmarks(landmark_list: Sequence[Landmark],
                    connections: Optional[List[Tuple[int, int]]] = None,
                    landmark_drawing_spec: DrawingSpec = DrawingSpec(
@@ -83,7 +90,8 @@ def plot3d_landmarks(landmark_list: Sequence[Landmark],
   """Plot the landmarks and the connections in matplotlib 3d.
 
   Args:
-    landmark_list: A normalized landmark list proto message to be plotted.
+    landmark_list: A normalized landmark list proto message to be plotted, None
+      for a missing landmark.
     connections: A list of landmark index tuples that specifies how landmarks to
       be connected.
     landmark_drawing_spec: A DrawingSpec object that specifies the landmarks'
@@ -98,6 +106,7 @@ def plot3d_landmarks(landmark_list: Sequence[Landmark],
   """
   # if not landmark_list:
   #   return
+  import matplotlib.pyplot as plt
   plt.figure(figsize=(10, 10))
   ax = plt.axes(projection='3d')
   plot3d_landmarks_on_figure(ax, landmark_list, connections, landmark_drawing_spec, connection_drawing_spec, elevation, azimuth)
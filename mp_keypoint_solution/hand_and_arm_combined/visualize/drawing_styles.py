@@ -1,6 +1,11 @@
 # Ref: https://github.com/google-ai-edge/mediapipe/blob/master/mediapipe/python/solutions/drawing_utils.py?ref=assemblyai.com
 
-from typing import Mapping, Tuple
+import dataclasses
+import functools
+from typing import Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
 from .drawing_common import DrawingSpec
 from ..mp_landmark_index import SINGLEHANDARM_LANDMARK
 from . import single_hand_arm_connections
@@ -87,17 +92,29 @@ _HAND_CONNECTION_STYLE = {
         DrawingSpec(color=_BLUE, thickness=_THICKNESS_FINGER)
 }
 
+# Order of the compiled connection arrays, the iteration order of the frozenset
+# that draw2d_landmarks draws in, stable as int tuples hash deterministically.
+SINGLE_ARM_HAND_CONNECTION_ORDER = tuple(
+    single_hand_arm_connections.SINGLE_ARM_HAND_CONNECTIONS)
+
+@functools.lru_cache(maxsize=None)
+def _default_hand_landmark_items() -> Tuple[Tuple[int, DrawingSpec], ...]:
+  return tuple((landmark, v) for k, v in _HAND_LANDMARK_STYLE.items()
+               for landmark in k)
+
+@functools.lru_cache(maxsize=None)
+def _default_hand_connection_items(
+) -> Tuple[Tuple[Tuple[int, int], DrawingSpec], ...]:
+  return tuple((connection, v) for k, v in _HAND_CONNECTION_STYLE.items()
+               for connection in k)
+
 def get_default_hand_2d_landmarks_style() -> Mapping[int, DrawingSpec]:
   """Returns the default hand landmarks drawing style.
 
   Returns:
       A mapping from each hand landmark to its default drawing spec.
   """
-  hand_landmark_style = {}
-  for k, v in _HAND_LANDMARK_STYLE.items():
-    for landmark in k:
-      hand_landmark_style[landmark] = v
-  return hand_landmark_style
+  return dict(_default_hand_landmark_items())
 
 def get_default_hand_2d_connections_style(
 ) -> Mapping[Tuple[int, int], DrawingSpec]:
@@ -106,8 +123,147 @@ def get_default_hand_2d_connections_style(
   Returns:
       A mapping from each hand connection to its default drawing spec.
   """
-  hand_connection_style = {}
-  for k, v in _HAND_CONNECTION_STYLE.items():
-    for connection in k:
-      hand_connection_style[connection] = v
-  return hand_connection_style
\ No newline at end of file
+  return dict(_default_hand_connection_items())
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+  array.flags.writeable = False
+  return array
+
+@dataclasses.dataclass(frozen=True)
+class CompiledHandStyle:
+  """Drawing style compiled into read-only arrays, drawn without any spec
+  lookup.
+
+  draw2d_landmarks_with_style draws the groups, a cv2 call per style.
+  Landmark3DRenderer sorts the connections and the landmarks by depth, so it
+  draws them one at a time from the arrays aligned with the landmark and
+  connection indices.
+
+  The landmark arrays have a row per landmark index, a landmark without style
+  has a 0 radius and is not drawn. The connection arrays have a row per
+  connection of `connections`.
+  """
+  # (C, 2) landmark indices of the connections.
+  connections: np.ndarray
+  # (C, 3) BGR colors and (C,) thicknesses of the connections.
+  connection_colors: np.ndarray
+  connection_thickness: np.ndarray
+  # (N, 3) BGR colors, (N,) thicknesses and circle radii of the landmarks.
+  landmark_colors: np.ndarray
+  landmark_thickness: np.ndarray
+  landmark_radius: np.ndarray
+  # The same styles grouped for the renderer, see draw2d_landmark_groups.
+  connection_groups: Tuple[Tuple[Tuple[int, int, int], int, np.ndarray], ...]
+  landmark_groups: Tuple[Tuple[Tuple[int, int, int], int, int, np.ndarray],
+                         ...]
+
+def compile_hand_2d_style(
+    landmark_drawing_spec: Optional[
+        Union[DrawingSpec, Mapping[int, DrawingSpec]]] = None,
+    connection_drawing_spec: Optional[
+        Union[DrawingSpec, Mapping[Tuple[int, int], DrawingSpec]]] = None,
+    connections: Sequence[Tuple[int, int]] = SINGLE_ARM_HAND_CONNECTION_ORDER,
+    num_landmarks: int = len(SINGLEHANDARM_LANDMARK)) -> CompiledHandStyle:
+  """Compiles drawing specs into a CompiledHandStyle.
+
+  Compile a style once and reuse it for every frame.
+
+  Args:
+    landmark_drawing_spec: Either a DrawingSpec for all the landmarks or a
+      mapping from landmarks to the DrawingSpecs overriding the default style.
+      Defaults to None, the default style.
+    connection_drawing_spec: Either a DrawingSpec for all the connections or a
+      mapping from connections to the DrawingSpecs overriding the default
+      style. Defaults to None, the default style.
+    connections: A list of landmark index tuples to draw.
+    num_landmarks: Number of landmarks of the landmark lists to draw.
+
+  Returns:
+    The compiled style.
+
+  Raises:
+    ValueError: If any connetions contain invalid landmark index.
+  """
+  landmark_specs = get_default_hand_2d_landmarks_style()
+  if isinstance(landmark_drawing_spec, DrawingSpec):
+    landmark_specs = landmark_drawing_spec
+  elif landmark_drawing_spec is not None:
+    landmark_specs.update(landmark_drawing_spec)
+  connection_specs = get_default_hand_2d_connections_style()
+  if isinstance(connection_drawing_spec, DrawingSpec):
+    connection_specs = connection_drawing_spec
+  elif connection_drawing_spec is not None:
+    connection_specs.update(connection_drawing_spec)
+
+  # Not at the module level, drawing2d_utils imports cv2.
+  from .drawing2d_utils import group_connections_by_style, group_landmarks_by_style
+
+  connections = tuple(connections)
+  connection_groups = group_connections_by_style(connections, connection_specs,
+                                                 num_landmarks)
+  landmark_groups = group_landmarks_by_style(num_landmarks, landmark_specs)
+
+  connection_array = np.array(connections, dtype=np.intp).reshape(-1, 2)
+  connection_colors = np.zeros((len(connections), 3), dtype=np.uint8)
+  connection_thickness = np.zeros(len(connections), dtype=np.int32)
+  for i, connection in enumerate(connections):
+    spec = connection_specs if isinstance(
+        connection_specs, DrawingSpec) else connection_specs[connection]
+    connection_colors[i] = spec.color
+    connection_thickness[i] = spec.thickness
+  landmark_colors = np.zeros((num_landmarks, 3), dtype=np.uint8)
+  landmark_thickness = np.zeros(num_landmarks, dtype=np.int32)
+  landmark_radius = np.zeros(num_landmarks, dtype=np.int32)
+  for color, thickness, radius, indices in landmark_groups:
+    landmark_colors[indices] = color
+    landmark_thickness[indices] = thickness
+    landmark_radius[indices] = radius
+  for group in connection_groups + landmark_groups:
+    _read_only(group[-1])
+  return CompiledHandStyle(
+      connections=_read_only(connection_array),
+      connection_colors=_read_only(connection_colors),
+      connection_thickness=_read_only(connection_thickness),
+      landmark_colors=_read_only(landmark_colors),
+      landmark_thickness=_read_only(landmark_thickness),
+      landmark_radius=_read_only(landmark_radius),
+      connection_groups=tuple(connection_groups),
+      landmark_groups=tuple(landmark_groups))
+
+@functools.lru_cache(maxsize=None)
+def get_default_hand_2d_style() -> CompiledHandStyle:
+  """Returns the default hand drawing style, compiled once and shared."""
+  return compile_hand_2d_style()
+
+@functools.lru_cache(maxsize=None)
+def get_default_both_side_2d_style() -> CompiledHandStyle:
+  """Returns the default style of the "BOTH_SIDE" landmarks, two sets of arm
+  and hand landmarks one after the other, compiled once and shared."""
+  num_landmarks = len(SINGLEHANDARM_LANDMARK)
+  offsets = (0, num_landmarks)
+  return compile_hand_2d_style(
+      {landmark + offset: spec
+       for offset in offsets
+       for landmark, spec in _default_hand_landmark_items()},
+      {(start + offset, end + offset): spec
+       for offset in offsets
+       for (start, end), spec in _default_hand_connection_items()},
+      connections=tuple((start + offset, end + offset)
+                        for offset in offsets
+                        for start, end in SINGLE_ARM_HAND_CONNECTION_ORDER),
+      num_landmarks=2 * num_landmarks)
+
+def get_default_2d_style(num_landmarks: int) -> CompiledHandStyle:
+  """Returns the default style of a landmark count, 23 for one side or 46 for
+  "BOTH_SIDE".
+
+  Raises:
+    ValueError: If no default style has this number of landmarks.
+  """
+  if num_landmarks == len(SINGLEHANDARM_LANDMARK):
+    return get_default_hand_2d_style()
+  if num_landmarks == 2 * len(SINGLEHANDARM_LANDMARK):
+    return get_default_both_side_2d_style()
+  raise ValueError(f'No default style for {num_landmarks} landmarks, expect '
+                   f'{len(SINGLEHANDARM_LANDMARK)} or '
+                   f'{2 * len(SINGLEHANDARM_LANDMARK)}.')
@@ -0,0 +1,296 @@
+"""Headless 3D rendering of landmarks with NumPy and OpenCV.
+
+The landmarks are rotated to the view of plot3d_landmarks, the same elevation
+and azimuth in degrees and the same axes, projected orthographically or in
+perspective and drawn into an image buffer, without matplotlib. It is fast
+enough to render long recordings of world landmarks to a video file.
+"""
+
+import copy
+from typing import Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from .drawing_common import WHITE_COLOR, _PRESENCE_THRESHOLD, _VISIBILITY_THRESHOLD
+from .drawing_styles import CompiledHandStyle, get_default_2d_style
+
+_BACKGROUND_COLOR = (32, 32, 32)
+
+def _landmarks_to_xyz(landmark_list) -> Tuple[np.ndarray, np.ndarray]:
+  """Converts landmarks to a (N, 3) float array and a (N,) bool drawable mask.
+
+  Args:
+    landmark_list: A (N, 3) array, a LandmarkSet or a sequence of landmarks,
+      None for a missing landmark.
+  """
+  if isinstance(landmark_list, np.ndarray):
+    xyz = np.array(landmark_list[:, :3], dtype=np.float64)
+    drawable = np.ones(len(xyz), dtype=bool)
+  elif hasattr(landmark_list, 'xyz'):
+    xyz = np.array(landmark_list.xyz, dtype=np.float64)
+    drawable = np.ones(len(xyz), dtype=bool)
+    if landmark_list.visibility is not None:
+      drawable &= landmark_list.visibility >= _VISIBILITY_THRESHOLD
+    if landmark_list.presence is not None:
+      drawable &= landmark_list.presence >= _PRESENCE_THRESHOLD
+  else:
+    values = np.array([
+        (np.nan, np.nan, np.nan, 0., 0.) if landmark is None else
+        (landmark.x, landmark.y, landmark.z,
+         getattr(landmark, 'visibility', 1.), getattr(landmark, 'presence', 1.))
+        for landmark in landmark_list
+    ], dtype=np.float64).reshape(-1, 5)
+    xyz = values[:, :3]
+    drawable = ((values[:, 3] >= _VISIBILITY_THRESHOLD) &
+                (values[:, 4] >= _PRESENCE_THRESHOLD))
+  return xyz, drawable & np.isfinite(xyz).all(axis=1)
+
+def view_rotation(elevation: float, azimuth: float) -> np.ndarray:
+  """Returns the (3, 3) rotation from landmark coordinates to the view.
+
+  The rows give the right, up and towards the viewer axes of the view. The
+  landmark x, y, z are first mapped to the plot axes (-z, x, -y) as in
+  plot3d_landmarks, so that a view looks like the matplotlib one.
+  """
+  elevation, azimuth = np.deg2rad(elevation), np.deg2rad(azimuth)
+  right = (-np.sin(azimuth), np.cos(azimuth), 0.)
+  up = (-np.sin(elevation) * np.cos(azimuth),
+        -np.sin(elevation) * np.sin(azimuth), np.cos(elevation))
+  towards_viewer = (np.cos(elevation) * np.cos(azimuth),
+                    np.cos(elevation) * np.sin(azimuth), np.sin(elevation))
+  plot_axes = np.array([[0., 0., -1.], [1., 0., 0.], [0., -1., 0.]])
+  return np.array([right, up, towards_viewer]) @ plot_axes
+
+def project_3d_landmarks(
+    xyz: np.ndarray,
+    image_size: Tuple[int, int],
+    elevation: float = 10,
+    azimuth: float = 10,
+    center: Optional[np.ndarray] = None,
+    extent: Optional[float] = None,
+    camera_distance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+  """Projects 3D landmarks to pixel coordinates.
+
+  Args:
+    xyz: A (N, 3) array of landmark coordinates.
+    image_size: Height and width of the image.
+    elevation: The elevation from which to view the landmarks.
+    azimuth: The azimuth angle to rotate the landmarks.
+    center: The (3,) point at the image center. Defaults to None, the center of
+      the finite landmarks.
+    extent: The distance from the center shown at the image border. Defaults to
+      None, fit the finite landmarks. Keep it fixed to render a sequence.
+    camera_distance: Distance of the camera to the center, in the landmark
+      units. Defaults to None, an orthographic projection.
+
+  Returns:
+    A (N, 2) float array of pixel coordinates and a (N,) array of the depth
+    towards the viewer, nan for a non finite landmark.
+  """
+  xyz = np.asarray(xyz, dtype=np.float64)
+  finite = np.isfinite(xyz).all(axis=1)
+  if center is None:
+    center = xyz[finite].mean(axis=0) if finite.any() else np.zeros(3)
+  view = (xyz - center) @ view_rotation(elevation, azimuth).T
+  if camera_distance is not None:
+    with np.errstate(divide='ignore', invalid='ignore'):
+      view[:, :2] *= (camera_distance / (camera_distance - view[:, 2]))[:, None]
+  if extent is None:
+    extent = np.abs(view[finite, :2]).max() if finite.any() else 1.
+  image_height, image_width = image_size
+  # Keeps a margin around the landmarks at the extent.
+  scale = 0.45 * min(image_height, image_width) / max(extent, 1e-9)
+  pixels = np.empty((len(xyz), 2))
+  pixels[:, 0] = image_width / 2 + scale * view[:, 0]
+  pixels[:, 1] = image_height / 2 - scale * view[:, 1]
+  return pixels, view[:, 2]
+
+class Landmark3DRenderer:
+  """Renders 3D landmarks into a reused image buffer.
+
+  The connections are drawn from the farthest to the nearest to the viewer,
+  with the colors of a compiled style.
+
+  Args:
+    image_size: Height and width of the rendered images.
+    style: A CompiledHandStyle. Defaults to None, the default style of the
+      number of landmarks rendered, one side or "BOTH_SIDE".
+    elevation: The elevation from which to view the landmarks.
+    azimuth: The azimuth angle to rotate the landmarks.
+    center: See project_3d_landmarks.
+    extent: See project_3d_landmarks.
+    camera_distance: See project_3d_landmarks.
+    background_color: BGR color of the background.
+    line_type: OpenCV line type, cv2.LINE_8 is faster than cv2.LINE_AA.
+  """
+
+  def __init__(self,
+               image_size: Tuple[int, int] = (480, 480),
+               style: Optional[CompiledHandStyle] = None,
+               elevation: float = 10,
+               azimuth: float = 10,
+               center: Optional[Sequence[float]] = None,
+               extent: Optional[float] = None,
+               camera_distance: Optional[float] = None,
+               background_color: Tuple[int, int, int] = _BACKGROUND_COLOR,
+               line_type: int = cv2.LINE_AA):
+    self.image_size = tuple(image_size)
+    self.style = style
+    self.elevation = elevation
+    self.azimuth = azimuth
+    self.center = None if center is None else np.asarray(center, dtype=np.float64)
+    self.extent = extent
+    self.camera_distance = camera_distance
+    self.line_type = line_type
+    self.image = np.empty(self.image_size + (3,), dtype=np.uint8)
+    # Filled once, copying it is much faster than filling with a color.
+    self._background = np.empty_like(self.image)
+    self._background[:] = background_color
+
+  def render(self, landmark_list, image: Optional[np.ndarray] = None) -> np.ndarray:
+    """Renders the landmarks.
+
+    Args:
+      landmark_list: A (N, 3) array, a LandmarkSet or a landmark list.
+      image: A BGR image of image_size to render into. Defaults to None, the
+        buffer of the renderer, overwritten by the next render.
+
+    Returns:
+      The rendered image.
+
+    Raises:
+      ValueError: If the landmarks do not match the style.
+    """
+    if image is None:
+      image = self.image
+    np.copyto(image, self._background)
+    if landmark_list is None or not len(landmark_list):
+      return image
+    xyz, drawable = _landmarks_to_xyz(landmark_list)
+    style = get_default_2d_style(len(xyz)) if self.style is None else self.style
+    if len(xyz) != len(style.landmark_radius):
+      raise ValueError(f'Expect {len(style.landmark_radius)} landmarks for the '
+                       f'style, got {len(xyz)}.')
+    xyz[~drawable] = np.nan
+    pixels, depth = project_3d_landmarks(
+        xyz, self.image_size, self.elevation, self.azimuth, self.center,
+        self.extent, self.camera_distance)
+    pixels = np.round(np.nan_to_num(pixels)).astype(np.int32)
+
+    connections = style.connections
+    visible = drawable[connections].all(axis=1)
+    connection_depth = depth[connections].mean(axis=1)
+    order = np.flatnonzero(visible)
+    order = order[np.argsort(connection_depth[order])]
+    segments = pixels[connections[order]].tolist()
+    colors = style.connection_colors[order].tolist()
+    thicknesses = style.connection_thickness[order].tolist()
+    for (start, end), color, thickness in zip(segments, colors, thicknesses):
+      cv2.line(image, start, end, color, thickness, self.line_type)
+
+    order = np.flatnonzero(drawable & (style.landmark_radius > 0))
+    order = order[np.argsort(depth[order])]
+    for center, color, thickness, radius in zip(
+        pixels[order].tolist(), style.landmark_colors[order].tolist(),
+        style.landmark_thickness[order].tolist(),
+        style.landmark_radius[order].tolist()):
+      # White circle border
+      circle_border_radius = max(radius + 1, int(radius * 1.2))
+      cv2.circle(image, center, circle_border_radius, WHITE_COLOR, thickness,
+                 self.line_type)
+      # Fill color into the circle
+      cv2.circle(image, center, radius, color, thickness, self.line_type)
+    return image
+
+def sequence_view_bounds(
+    landmark_sequence: np.ndarray, elevation: float = 10,
+    azimuth: float = 10, center: Optional[np.ndarray] = None,
+    camera_distance: Optional[float] = None) -> Tuple[np.ndarray, float]:
+  """Returns a center and an extent fitting all the frames of a sequence.
+
+  Args:
+    landmark_sequence: A (T, N, 3) array, nan for missing landmarks.
+    elevation: The elevation from which to view the landmarks.
+    azimuth: The azimuth angle to rotate the landmarks.
+    center: The (3,) point at the image center, the extent is fitted around
+      it. Defaults to None, the center of the bounding box of the sequence.
+    camera_distance: See project_3d_landmarks, the extent is fitted to the
+      perspective projection. Landmarks behind the camera are not fitted.
+  """
+  xyz = np.asarray(landmark_sequence, dtype=np.float64).reshape(-1, 3)
+  xyz = xyz[np.isfinite(xyz).all(axis=1)]
+  if center is None:
+    center = ((xyz.min(axis=0) + xyz.max(axis=0)) / 2 if len(xyz) else
+              np.zeros(3))
+  center = np.asarray(center, dtype=np.float64)
+  view = (xyz - center) @ view_rotation(elevation, azimuth).T
+  if camera_distance is not None:
+    # Same scaling as project_3d_landmarks.
+    view = view[view[:, 2] < camera_distance]
+    view[:, :2] *= (camera_distance / (camera_distance - view[:, 2]))[:, None]
+  if not len(view):
+    return center, 1.
+  return center, float(np.abs(view[:, :2]).max())
+
+def write3d_landmarks_video(
+    path: str,
+    landmark_sequence: Union[np.ndarray, Sequence],
+    fps: float = 30,
+    renderer: Optional[Landmark3DRenderer] = None,
+    fourcc: str = 'mp4v') -> int:
+  """Renders a sequence of landmarks to a video file.
+
+  The view is fitted to the whole sequence unless the renderer has a center
+  and an extent, so the skeleton does not jump between frames: the extent
+  around the center of the renderer if it has one, with its perspective. The
+  renderer is left unchanged, a sequence fitted does not set the view of the
+  next.
+
+  Args:
+    path: Path of the video file.
+    landmark_sequence: A (T, N, 3) array, e.g. LandmarkRecording.world, or a
+      sequence of per frame landmarks, None or nan for an undetected frame.
+    fps: Frame rate of the video.
+    renderer: A Landmark3DRenderer. Defaults to None, a default renderer, with
+      the default style of the number of landmarks.
+    fourcc: FourCC code of the video codec.
+
+  Returns:
+    The number of written frames.
+
+  Raises:
+    IOError: If the video file can not be opened for writing.
+  """
+  if renderer is None:
+    renderer = Landmark3DRenderer()
+  if renderer.center is None or renderer.extent is None:
+    if isinstance(landmark_sequence, np.ndarray):
+      frames = landmark_sequence
+    else:
+      frames = np.concatenate([
+          np.empty((0, 3)) if landmarks is None else
+          _landmarks_to_xyz(landmarks)[0] for landmarks in landmark_sequence
+      ] + [np.empty((0, 3))])
+    center, extent = sequence_view_bounds(
+        frames, renderer.elevation, renderer.azimuth, renderer.center,
+        renderer.camera_distance)
+    # A copy sharing the buffers, the view of the caller's renderer is kept.
+    renderer = copy.copy(renderer)
+    if renderer.center is None:
+      renderer.center = center
+    if renderer.extent is None:
+      renderer.extent = extent
+  image_height, image_width = renderer.image_size
+  writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps,
+                           (image_width, image_height))
+  if not writer.isOpened():
+    raise IOError(f'Can not open the video file {path} for writing.')
+  num_frames = 0
+  try:
+    for landmarks in landmark_sequence:
+      writer.write(renderer.render(landmarks))
+      num_frames += 1
+  finally:
+    writer.release()
+  return num_frames
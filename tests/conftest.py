@@ -0,0 +1,32 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+class _MeanSolution:
+    """Stands for MPKeyPointSolution, the keypoints are filled with the mean of the image, slow enough for the reading
+    of a frame source to run ahead."""
+    def process(self, image, type="BOTH_SIDE", output_format="ARRAY", **kwargs):
+        time.sleep(0.02)
+        world_landmarks = np.full((46, 3), image.mean(), dtype=np.float32)
+        return world_landmarks, world_landmarks.copy()
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def mean_solution():
+    return _MeanSolution()
+
+@pytest.fixture
+def write_ramp_video(tmp_path):
+    """Writes a video of uniform frames, 20 * index in every channel, and returns its path."""
+    def write(num_frames):
+        path = str(tmp_path / 'video.avi')
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30., (64, 48))
+        for index in range(num_frames):
+            writer.write(np.full((48, 64, 3), 20 * index, dtype=np.uint8))
+        writer.release()
+        return path
+    return write
@@ -0,0 +1,23 @@
+import asyncio
+
+from mp_keypoint_solution.hand_and_arm_combined.async_solution import AsyncMPKeyPointSolution
+from mp_keypoint_solution.hand_and_arm_combined.frame_source import Frame, VideoFileSource
+
+NUM_FRAMES = 12
+
+def test_process_stream_of_video_file_source(mean_solution, write_ramp_video):
+    video_file = write_ramp_video(NUM_FRAMES)
+
+    async def run():
+        async with AsyncMPKeyPointSolution(solution=mean_solution) as solution:
+            # fewer ring buffers than frames queued between the stages
+            with VideoFileSource(video_file, prefetch=1) as source:
+                return [item async for item in solution.process_stream(source, queue_size=4)]
+
+    results = asyncio.run(run())
+    assert [frame.index for frame, _, _ in results] == list(range(NUM_FRAMES))
+    for frame, world_landmarks, _ in results:
+        assert isinstance(frame, Frame)
+        # the image processed and the image yielded are the frame of that index
+        assert abs(world_landmarks[0, 0] - 20 * frame.index) < 3
+        assert abs(frame.image.mean() - 20 * frame.index) < 3
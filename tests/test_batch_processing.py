@@ -0,0 +1,25 @@
+import os
+
+import numpy as np
+import pytest
+
+from mp_keypoint_solution.hand_and_arm_combined.batch_processing import video_result_keys
+
+def test_same_named_videos_in_different_directories():
+    keys = video_result_keys([os.path.join('data', 'a', 'clip.mp4'), os.path.join('data', 'b', 'clip.mp4')])
+    assert keys == ['a/clip.mp4', 'b/clip.mp4']
+
+def test_videos_of_one_directory_keep_their_names():
+    assert video_result_keys([os.path.join('data', 'clip.mp4')]) == ['clip.mp4']
+    assert video_result_keys([os.path.join('data', 'a.mp4'), os.path.join('data', 'b.mp4')]) == ['a.mp4', 'b.mp4']
+
+def test_keys_round_trip_through_npz(tmp_path):
+    keys = video_result_keys([os.path.join('x', 'clip.mp4'), os.path.join('y', 'clip.mp4')])
+    np.savez(tmp_path / 'keypoints.npz', **{key: np.full(2, i) for i, key in enumerate(keys)})
+    with np.load(tmp_path / 'keypoints.npz') as data:
+        assert sorted(data.files) == keys
+        assert data['y/clip.mp4'][0] == 1
+
+def test_video_given_twice():
+    with pytest.raises(ValueError):
+        video_result_keys([os.path.join('data', 'clip.mp4'), os.path.join('.', 'data', 'clip.mp4')])
@@ -0,0 +1,18 @@
+from mp_keypoint_solution.hand_and_arm_combined.frame_source import VideoFileSource
+from mp_keypoint_solution.hand_and_arm_combined.keyframe_scheduler import KeyframeScheduler
+
+NUM_FRAMES = 10
+
+def test_process_frames_holds_copies_of_frame_source_images(mean_solution, write_ramp_video):
+    video_file = write_ramp_video(NUM_FRAMES)
+
+    scheduler = KeyframeScheduler(mean_solution, stride=4)
+    # fewer ring buffers than frames held back between keyframes
+    with VideoFileSource(video_file, prefetch=1) as source:
+        results = [(image.mean(), world_landmarks[0, 0])
+                   for image, world_landmarks, _ in scheduler.process_frames(frame.image for frame in source)]
+    assert len(results) == NUM_FRAMES
+    for index, (image_mean, keypoint) in enumerate(results):
+        # the frames are a linear ramp, so are the interpolated keypoints
+        assert abs(image_mean - 20 * index) < 3
+        assert abs(keypoint - 20 * index) < 3
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from mp_keypoint_solution.hand_and_arm_combined.kinematics import (JOINT_ANGLE_NAMES, extract_kinematics,
+                                                                   joint_angles, palm_orientation)
+from mp_keypoint_solution.hand_and_arm_combined.mp_landmark_index import SINGLE_HAND_ARM_LANDMARK_NAME2INDEX
+
+def _left_arm_hand():
+    """A straight left arm raised in front of the camera, x right, y down and z away from the camera.
+
+    The palm faces the camera with the fingers curled toward it, the index finger bent by a right angle at its pip.
+    """
+    keypoints = {
+        'shoulder': (0., 0.55, 0.), 'elbow': (0., 0.3, 0.), 'wrist': (0., 0., 0.),
+        'thumb_cmc': (0.02, -0.02, 0.), 'thumb_mcp': (0.04, -0.04, -0.005), 'thumb_ip': (0.055, -0.06, -0.01),
+        'thumb_tip': (0.065, -0.075, -0.015),
+        'index_finger_mcp': (0.025, -0.09, 0.), 'index_finger_pip': (0.025, -0.13, 0.),
+        'index_finger_dip': (0.025, -0.13, -0.025), 'index_finger_tip': (0.025, -0.13, -0.045),
+    }
+    for finger, x, y in (('middle', 0., -0.095), ('ring', -0.02, -0.09), ('pinky', -0.04, -0.08)):
+        keypoints[f'{finger}_finger_mcp'] = (x, y, 0.)
+        keypoints[f'{finger}_finger_pip'] = (x, y - 0.04, 0.)
+        keypoints[f'{finger}_finger_dip'] = (x, y - 0.07, -0.01)
+        keypoints[f'{finger}_finger_tip'] = (x, y - 0.09, -0.02)
+    array = np.zeros((len(SINGLE_HAND_ARM_LANDMARK_NAME2INDEX), 3), dtype=np.float32)
+    for name, point in keypoints.items():
+        array[SINGLE_HAND_ARM_LANDMARK_NAME2INDEX[name]] = point
+    return array
+
+def _right_arm_hand():
+    # the mirror image of the left arm and hand
+    return _left_arm_hand() * np.array([-1., 1., 1.], dtype=np.float32)
+
+def _angle(angles, name):
+    return angles[..., JOINT_ANGLE_NAMES.index(name)]
+
+@pytest.mark.parametrize('keypoints', [_left_arm_hand(), _right_arm_hand()])
+def test_joint_angles_of_known_geometry(keypoints):
+    angles = joint_angles(keypoints, degrees=True)
+    # a straight arm, 180 degrees between the upper arm and the forearm, has no flexion
+    assert 180. - _angle(angles, 'elbow') == pytest.approx(180., abs=1e-4)
+    assert _angle(angles, 'wrist') == pytest.approx(0., abs=1e-4)
+    assert _angle(angles, 'index_finger_pip') == pytest.approx(90., abs=1e-4)
+    assert _angle(angles, 'index_finger_dip') == pytest.approx(0., abs=1e-4)
+    assert _angle(joint_angles(keypoints), 'index_finger_pip') == pytest.approx(np.pi / 2, abs=1e-6)
+
+@pytest.mark.parametrize('keypoints, type', [(_left_arm_hand(), "LEFT_SIDE"), (_right_arm_hand(), "RIGHT_SIDE")])
+def test_palm_orientation_of_each_side(keypoints, type):
+    rotation = palm_orientation(keypoints, type)
+    np.testing.assert_allclose(rotation.T @ rotation, np.eye(3), atol=1e-6)
+    # a rotation, right handed for both sides
+    assert np.linalg.det(rotation) == pytest.approx(1., abs=1e-6)
+    x_axis, y_axis, z_axis = rotation.T
+    index = SINGLE_HAND_ARM_LANDMARK_NAME2INDEX
+    # z comes out of the palm, toward the camera and the curled fingertips
+    np.testing.assert_allclose(z_axis, (0., 0., -1.), atol=1e-6)
+    for finger in ('middle', 'ring', 'pinky'):
+        assert z_axis @ (keypoints[index[f'{finger}_finger_tip']] - keypoints[index[f'{finger}_finger_pip']]) > 0
+    assert y_axis @ (keypoints[index['middle_finger_mcp']] - keypoints[index['wrist']]) > 0
+    # toward the index knuckle on the left hand, toward the pinky knuckle on the right hand
+    toward_index = x_axis @ (keypoints[index['index_finger_mcp']] - keypoints[index['pinky_finger_mcp']]) > 0
+    assert toward_index == (type == "LEFT_SIDE")
+
+def test_both_side_matches_each_side():
+    both_side = np.stack([_left_arm_hand(), _right_arm_hand()])
+    features = extract_kinematics(both_side, "BOTH_SIDE", degrees=True)
+    np.testing.assert_allclose(features.palm_orientation[0], palm_orientation(_left_arm_hand(), "LEFT_SIDE"))
+    np.testing.assert_allclose(features.palm_orientation[1], palm_orientation(_right_arm_hand(), "RIGHT_SIDE"))
+    np.testing.assert_allclose(features.joint_angles[0], features.joint_angles[1], atol=1e-4)
+    with pytest.raises(ValueError):
+        palm_orientation(both_side.reshape(46, 3), "BOTH_SIDE")
@@ -0,0 +1,165 @@
+import os
+import queue
+import time
+
+import numpy as np
+import pytest
+
+from mp_keypoint_solution.hand_and_arm_combined import multi_stream_server
+from mp_keypoint_solution.hand_and_arm_combined.multi_stream_server import MultiStreamServer
+
+# the first pixel of a test frame tells the fake worker what to do with it
+FAIL, SLOW, DIE, PAUSE = 255, 254, 253, 252
+
+def _init_fake_worker(process_kwargs, tracking=False):
+    pass
+
+def _fake_open_stream(stream_key):
+    pass
+
+def _fake_process_frame(task):
+    # the task and result layout of multi_stream_server._process_frame, without the graphs
+    slot_index, slot_name, shape, token, stream_key = task
+    slot = multi_stream_server._worker_slots.get(slot_index)
+    if slot is None or slot.name != slot_name:
+        slot = multi_stream_server._worker_slots[slot_index] = multi_stream_server.shared_memory.SharedMemory(
+            name=slot_name)
+    value = int(np.ndarray(shape, dtype=np.uint8, buffer=slot.buf)[0, 0, 0])
+    if value == FAIL:
+        raise ValueError('failing frame')
+    if value == SLOW:
+        time.sleep(1.)
+    if value == PAUSE:
+        time.sleep(0.4)
+    if value == DIE:
+        os._exit(1)
+    world_landmarks = np.full((46, 3), value, dtype=np.float32)
+    # tells which worker process the frame ran on
+    uv_landmarks = np.full((46, 3), os.getpid(), dtype=np.float64)
+    return slot_index, token, world_landmarks, uv_landmarks
+
+@pytest.fixture
+def make_server(monkeypatch):
+    monkeypatch.setattr(multi_stream_server, '_init_worker', _init_fake_worker)
+    monkeypatch.setattr(multi_stream_server, '_process_frame', _fake_process_frame)
+    monkeypatch.setattr(multi_stream_server, '_open_stream', _fake_open_stream)
+    monkeypatch.setattr(multi_stream_server, '_close_stream', _fake_open_stream)
+    servers = []
+    def make(**kwargs):
+        server = MultiStreamServer(start_method='fork', **kwargs)
+        servers.append(server)
+        return server
+    yield make
+    for server in servers:
+        server.close()
+
+def _frame(value):
+    return np.full((8, 8, 3), value, dtype=np.uint8)
+
+def _results(server, count, timeout=10.):
+    return [server.get_result(timeout=timeout) for _ in range(count)]
+
+def test_failing_task_is_delivered_and_stream_continues(make_server):
+    server = make_server(num_workers=1, queue_size=8)
+    server.add_stream('a')
+    for value in (1, FAIL, 2, 3):
+        server.submit('a', _frame(value))
+    results = _results(server, 4)
+    assert [result.frame_index for result in results] == [0, 1, 2, 3]
+    assert isinstance(results[1].error, ValueError)
+    assert results[1].world_landmarks is None
+    assert [result.world_landmarks[0, 0] for result in results if result.error is None] == [1, 2, 3]
+    assert server._num_in_flight == 0
+    assert sorted(server._free_slots) == list(range(server._max_in_flight))
+
+def test_lost_task_times_out_and_stream_continues(make_server):
+    server = make_server(num_workers=1, queue_size=8, task_timeout=2.)
+    server.add_stream('a')
+    for value in (1, DIE, 2):
+        server.submit('a', _frame(value))
+    results = _results(server, 3, timeout=20.)
+    assert [result.frame_index for result in results] == [0, 1, 2]
+    assert isinstance(results[1].error, TimeoutError)
+    assert results[2].world_landmarks[0, 0] == 2
+    assert server.stats()['a']['in_flight'] == 0
+
+def test_removed_stream_results_do_not_reach_readded_stream(make_server):
+    server = make_server(num_workers=2)
+    server.add_stream('a')
+    server.submit('a', _frame(SLOW))
+    # wait for the slow frame to be dispatched
+    deadline = time.monotonic() + 10.
+    while server.stats()['a']['in_flight'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    server.remove_stream('a')
+    server.add_stream('a')
+    server.submit('a', _frame(7))
+    result = server.get_result(timeout=10.)
+    assert (result.stream_id, result.frame_index) == ('a', 0)
+    assert result.world_landmarks[0, 0] == 7
+    # the late result of the removed stream is dropped
+    with pytest.raises(queue.Empty):
+        server.get_result(timeout=2.)
+    assert server._num_in_flight == 0
+    assert server.stats()['a']['in_flight'] == 0
+
+def test_timeout_and_completion_deliver_in_order(make_server):
+    results = []
+    def callback(result):
+        if result.frame_index == 0:
+            # the scheduler thread is still delivering the timed out frame when the next result completes
+            time.sleep(0.8)
+        results.append(result)
+
+    server = make_server(num_workers=2, queue_size=8, max_in_flight_per_stream=3, task_timeout=0.6, callback=callback)
+    server.add_stream('a')
+    server.submit('a', _frame(DIE))
+    server.submit('a', _frame(1))
+    # dispatched before the first frame times out, completes on the result thread of the pool while the scheduler
+    # thread delivers the frames before it
+    time.sleep(0.4)
+    server.submit('a', _frame(PAUSE))
+    deadline = time.monotonic() + 20.
+    while len(results) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [result.frame_index for result in results] == [0, 1, 2]
+    assert isinstance(results[0].error, TimeoutError)
+    assert [result.world_landmarks[0, 0] for result in results[1:]] == [1, PAUSE]
+
+@pytest.mark.parametrize('tracking', [True, False])
+def test_streams_are_processed_in_order(make_server, tracking):
+    server = make_server(num_workers=2, queue_size=8, max_in_flight_per_stream=2, tracking=tracking)
+    for stream_id in 'abc':
+        server.add_stream(stream_id)
+    for value in range(4):
+        for stream_id in 'abc':
+            server.submit(stream_id, _frame(value))
+    results = _results(server, 12)
+    for stream_id in 'abc':
+        stream_results = [result for result in results if result.stream_id == stream_id]
+        assert [result.frame_index for result in stream_results] == [0, 1, 2, 3]
+        assert [result.world_landmarks[0, 0] for result in stream_results] == [0, 1, 2, 3]
+
+def test_streams_are_pinned_to_workers_and_rebalanced(make_server):
+    server = make_server(num_workers=2, queue_size=8)
+    for stream_id in 'abcd':
+        server.add_stream(stream_id)
+    assert [server.stats()[stream_id]['worker'] for stream_id in 'abcd'] == [0, 1, 0, 1]
+    for value in range(3):
+        for stream_id in 'abcd':
+            server.submit(stream_id, _frame(value))
+    results = _results(server, 12)
+    workers = {stream_id: {result.uv_landmarks[0, 0] for result in results if result.stream_id == stream_id}
+               for stream_id in 'abcd'}
+    # every frame of a stream ran on the worker process the stream is pinned to
+    assert all(len(pids) == 1 for pids in workers.values())
+    assert workers['a'] == workers['c'] != workers['b'] == workers['d']
+    server.remove_stream('a')
+    server.remove_stream('c')
+    # one of the streams left on the second worker moved to the idle first worker
+    assert sorted(server.stats()[stream_id]['worker'] for stream_id in 'bd') == [0, 1]
+    assert server._worker_loads == [1, 1]
+    for stream_id in 'bd':
+        server.submit(stream_id, _frame(5))
+    results = _results(server, 2)
+    assert len({result.uv_landmarks[0, 0] for result in results}) == 2
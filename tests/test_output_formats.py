@@ -0,0 +1,39 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('mediapipe')
+cv2 = pytest.importorskip('cv2')
+
+from mp_keypoint_solution.hand_and_arm_combined.mp_hand_and_arm_keypoint_solution import MPKeyPointSolution
+
+IMAGE_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'image', 'whole_body')
+
+def _landmark_list_to_array(landmark_list):
+    return np.array([(np.nan, np.nan, np.nan) if landmark is None else (landmark.x, landmark.y, landmark.z)
+                     for landmark in landmark_list], dtype=np.float64)
+
+@pytest.fixture(scope='module')
+def solution():
+    solution = MPKeyPointSolution(static_image_mode=True, profile="accurate")
+    yield solution
+    solution.close()
+
+@pytest.mark.parametrize('type', ["BOTH_SIDE", "LEFT_SIDE", "RIGHT_SIDE"])
+def test_array_matches_landmark_list(solution, type):
+    num_compared = 0
+    for path in sorted(glob.glob(os.path.join(IMAGE_DIR, '*.jpg'))):
+        image = cv2.imread(path)
+        arrays = solution.process(image, type=type, output_format="ARRAY")
+        landmark_lists = solution.process(image, type=type, output_format="LANDMARK_LIST")
+        assert (arrays[0] is None) == (landmark_lists[0] is None)
+        if arrays[0] is None:
+            continue
+        for array, landmark_list in zip(arrays, landmark_lists):
+            assert array.dtype == np.float32
+            assert array.shape == (46 if type == "BOTH_SIDE" else 23, 3)
+            np.testing.assert_allclose(array, _landmark_list_to_array(landmark_list), rtol=0, atol=1e-6)
+        num_compared += 1
+    assert num_compared
@@ -0,0 +1,32 @@
+import threading
+import time
+
+from mp_keypoint_solution.hand_and_arm_combined.pipelined_runner import PipelinedRunner
+
+def test_capture_retrying_failed_reads_stops():
+    # a camera that delivers a few frames and then fails every read
+    frames = iter(range(3))
+    def capture():
+        while not runner.stopped:
+            frame = next(frames, None)
+            if frame is None:
+                time.sleep(0.01)
+                continue
+            return frame
+        return None
+
+    rendered = []
+    def render(frame, result):
+        rendered.append(result)
+        return True
+
+    runner = PipelinedRunner(capture, lambda frame: frame * 2, render, queue_size=3)
+    thread = threading.Thread(target=runner.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5.
+    while len(rendered) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    runner.stop()
+    thread.join(timeout=5.)
+    assert not thread.is_alive()
+    assert rendered == [0, 2, 4]
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+import pytest
+
+from mp_keypoint_solution.hand_and_arm_combined.visualize.render3d_utils import (Landmark3DRenderer,
+                                                                                 project_3d_landmarks,
+                                                                                 sequence_view_bounds,
+                                                                                 write3d_landmarks_video)
+
+def _recording(num_frames, num_landmarks, scale, seed=0):
+    rng = np.random.default_rng(seed)
+    return (scale * rng.uniform(-1, 1, (num_frames, num_landmarks, 3))).astype(np.float32)
+
+def _count_frames(path):
+    cap = cv2.VideoCapture(path)
+    num_frames = 0
+    while cap.read()[0]:
+        num_frames += 1
+    cap.release()
+    return num_frames
+
+def test_write_both_side_recording(tmp_path):
+    recording = _recording(5, 46, 0.5)
+    # a frame without the right side, and a frame not detected
+    recording[1, 23:] = np.nan
+    recording[2] = np.nan
+    path = str(tmp_path / 'both_side.avi')
+    assert write3d_landmarks_video(path, recording, fourcc='MJPG') == 5
+    assert _count_frames(path) == 5
+    path = str(tmp_path / 'both_side_list.avi')
+    frames = [None if np.isnan(frame).all() else frame for frame in recording]
+    assert write3d_landmarks_video(path, frames, fourcc='MJPG') == 5
+
+def test_renderer_view_is_not_changed(tmp_path):
+    renderer = Landmark3DRenderer(image_size=(120, 160))
+    write3d_landmarks_video(str(tmp_path / 'small.avi'), _recording(3, 23, 0.1), renderer=renderer, fourcc='MJPG')
+    assert renderer.center is None and renderer.extent is None
+    # the second recording is fitted to its own bounds, the large skeleton fills the image as the small one did
+    write3d_landmarks_video(str(tmp_path / 'large.avi'), _recording(3, 23, 10.), renderer=renderer, fourcc='MJPG')
+    assert renderer.center is None and renderer.extent is None
+    small, large = (cv2.VideoCapture(str(tmp_path / name)).read()[1] for name in ('small.avi', 'large.avi'))
+    background = np.array([32, 32, 32])
+    drawn_small = (np.abs(small.astype(int) - background) > 16).any(axis=2).mean()
+    drawn_large = (np.abs(large.astype(int) - background) > 16).any(axis=2).mean()
+    assert abs(drawn_small - drawn_large) < 0.5 * drawn_small
+
+@pytest.mark.parametrize('center', [None, (0.8, -0.5, 0.3)])
+@pytest.mark.parametrize('camera_distance', [None, 2.])
+def test_sequence_view_bounds_fit_the_projection(center, camera_distance):
+    recording = _recording(4, 46, 1.)
+    fitted_center, extent = sequence_view_bounds(recording, 20, 30, center, camera_distance)
+    if center is not None:
+        np.testing.assert_array_equal(fitted_center, center)
+    image_size = (120, 160)
+    pixels = np.concatenate([project_3d_landmarks(frame, image_size, 20, 30, fitted_center, extent, camera_distance)[0]
+                             for frame in recording])
+    # the extent is shown at 0.45 of the smallest image side from the image center
+    offsets = np.abs(pixels - (80, 60))
+    assert offsets.max() == pytest.approx(0.45 * 120)
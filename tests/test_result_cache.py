@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+
+from mp_keypoint_solution.hand_and_arm_combined.result_cache import ResultCache
+from mp_keypoint_solution.hand_and_arm_combined.smoothing import LandmarkSmoother
+
+def _key(value):
+    return f'{value:032x}'
+
+def _result(value):
+    world_landmarks = np.full((46, 3), value, dtype=np.float32)
+    return world_landmarks, world_landmarks.copy()
+
+def _file_bytes(directory):
+    cache = ResultCache(directory=str(directory))
+    cache.put(_key(0), _result(0))
+    return os.path.getsize(cache._path(_key(0)))
+
+def test_disk_eviction_to_low_water_mark(tmp_path, monkeypatch):
+    file_bytes = _file_bytes(tmp_path / 'probe')
+    cache = ResultCache(max_entries=1, directory=str(tmp_path / 'cache'), max_disk_bytes=10 * file_bytes,
+                        low_water_ratio=0.5)
+    for value in range(10):
+        cache.put(_key(value), _result(value))
+    assert cache.stats()['counters'].get('disk_evictions', 0) == 0
+    # the directory is not listed again on insert
+    monkeypatch.setattr('glob.glob', None)
+    cache.put(_key(10), _result(10))
+    assert cache.stats()['counters']['disk_evictions'] == 6
+    assert cache.stats()['disk_bytes'] == 5 * file_bytes
+    assert len(os.listdir(tmp_path / 'cache')) == 5
+    # the least recently used files went first
+    assert cache.get(_key(0)) is None
+    assert cache.get(_key(9))[0][0, 0] == 9
+
+def test_files_deleted_by_another_process(tmp_path):
+    file_bytes = _file_bytes(tmp_path / 'probe')
+    directory = str(tmp_path / 'cache')
+    cache = ResultCache(max_entries=1, directory=directory, max_disk_bytes=3 * file_bytes)
+    other = ResultCache(max_entries=1, directory=directory)
+    for value in range(3):
+        cache.put(_key(value), _result(value))
+    other.clear(disk=True)
+    # a miss rather than FileNotFoundError, the last result is still in memory
+    assert cache.get(_key(1)) is None
+    assert cache.stats()['disk_bytes'] == 2 * file_bytes
+    # evicting files already deleted
+    for value in range(3, 8):
+        cache.put(_key(value), _result(value))
+    assert cache.get(_key(6))[0][0, 0] == 6
+
+def test_cache_is_not_used_with_smoothing(tmp_path):
+    pytest.importorskip('mediapipe')
+    from mp_keypoint_solution.hand_and_arm_combined.mp_hand_and_arm_keypoint_solution import MPKeyPointSolution
+    with pytest.raises(ValueError, match='smoothing'):
+        MPKeyPointSolution(static_image_mode=True, smoothing=LandmarkSmoother(),
+                           result_cache=ResultCache(directory=str(tmp_path)))
@@ -0,0 +1,49 @@
+import numpy as np
+
+from mp_keypoint_solution.hand_and_arm_combined.smoothing import LandmarkSmoother, OneEuroFilter
+
+def _keypoints(seed=0, num_keypoints=46):
+    return np.random.default_rng(seed).uniform(-1, 1, (num_keypoints, 3)).astype(np.float32)
+
+def test_constant_signal_passes_unchanged():
+    keypoints = _keypoints()
+    smoother = LandmarkSmoother()
+    for frame_index in range(10):
+        world_landmarks, uv_landmarks = smoother(keypoints, keypoints, timestamp=frame_index / 30)
+        assert world_landmarks.dtype == np.float32
+        np.testing.assert_array_equal(world_landmarks, keypoints)
+        np.testing.assert_array_equal(uv_landmarks, keypoints)
+
+def test_nan_keypoint_restarts_its_filter():
+    keypoints = _keypoints()
+    one_euro_filter = OneEuroFilter()
+    one_euro_filter(keypoints)
+    moved = keypoints + 0.5
+    # filtered keypoints lag behind the move
+    assert not np.isclose(one_euro_filter(moved), moved).any()
+    missing = moved.copy()
+    missing[0] = np.nan
+    filtered = one_euro_filter(missing)
+    assert np.isnan(filtered[0]).all()
+    assert not np.isnan(filtered[1:]).any()
+    # detected again far away, the keypoint restarts from its value while the others keep lagging
+    detected = moved + 0.5
+    filtered = one_euro_filter(detected)
+    np.testing.assert_array_equal(filtered[0], detected[0])
+    assert not np.isclose(filtered[1:], detected[1:]).any()
+
+def test_outlier_jump_is_rejected():
+    keypoints = _keypoints()
+    one_euro_filter = OneEuroFilter(max_speed=1., max_rejected_frames=2)
+    one_euro_filter(keypoints)
+    jumped = keypoints.copy()
+    # 3 units in a frame of 1 / 30 s, far above 1 unit per second
+    jumped[5] += 3.
+    for _ in range(2):
+        filtered = one_euro_filter(jumped)
+        np.testing.assert_array_equal(filtered, keypoints)
+    assert one_euro_filter.num_rejected_total == 2
+    # still there after max_rejected_frames, the jump is a real move
+    filtered = one_euro_filter(jumped)
+    assert np.linalg.norm(filtered[5] - keypoints[5]) > 0.1
+    np.testing.assert_array_equal(np.delete(filtered, 5, axis=0), np.delete(keypoints, 5, axis=0))
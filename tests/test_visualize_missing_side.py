@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from mp_keypoint_solution.hand_and_arm_combined.data_structures.landmark import Landmark
+from mp_keypoint_solution.hand_and_arm_combined.visualize import (Landmark3DRenderer, SINGLE_ARM_HAND_CONNECTIONS,
+                                                                  draw2d_landmarks, draw2d_landmarks_with_style,
+                                                                  get_default_both_side_2d_style,
+                                                                  plot3d_landmarks_on_figure)
+
+NUM_ONESIDE_LANDMARKS = 23
+BOTH_SIDE_CONNECTIONS = [(start + offset, end + offset) for offset in (0, NUM_ONESIDE_LANDMARKS)
+                         for start, end in SINGLE_ARM_HAND_CONNECTIONS]
+
+def _right_side(seed=0):
+    return np.random.default_rng(seed).uniform(0.2, 0.8, (NUM_ONESIDE_LANDMARKS, 3)).astype(np.float32)
+
+def _missing_left_side(output_format):
+    # the padding of MPKeyPointSolution.process for "BOTH_SIDE" without the left side
+    right = _right_side()
+    if output_format == "ARRAY":
+        return np.concatenate([np.full((NUM_ONESIDE_LANDMARKS, 3), np.nan, dtype=np.float32), right])
+    return [None] * NUM_ONESIDE_LANDMARKS + [Landmark(*point) for point in right.tolist()]
+
+@pytest.mark.parametrize('output_format', ["LANDMARK_LIST", "ARRAY"])
+def test_draw2d_missing_side(output_format):
+    landmarks = _missing_left_side(output_format)
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    draw2d_landmarks_with_style(image, landmarks, get_default_both_side_2d_style())
+    drawn = image.any(axis=2)
+    # only the right side is drawn, within its normalized coordinates from 0.2
+    assert drawn.any()
+    assert not drawn[:, :int(0.2 * 160) - 5].any()
+    if output_format == "LANDMARK_LIST":
+        image = np.zeros((120, 160, 3), dtype=np.uint8)
+        draw2d_landmarks(image, landmarks, BOTH_SIDE_CONNECTIONS)
+        assert image.any()
+
+@pytest.mark.parametrize('output_format', ["LANDMARK_LIST", "ARRAY"])
+def test_render3d_missing_side(output_format):
+    image = Landmark3DRenderer(image_size=(120, 160)).render(_missing_left_side(output_format))
+    assert (image != image[0, 0]).any()
+
+def test_plot3d_missing_side():
+    pytest.importorskip('matplotlib')
+    from matplotlib.figure import Figure
+    ax = Figure().add_subplot(projection='3d')
+    plot3d_landmarks_on_figure(ax, _missing_left_side("LANDMARK_LIST"), BOTH_SIDE_CONNECTIONS)
+    # one scatter of the right side landmarks
+    assert len(ax.collections[0].get_offsets()) == NUM_ONESIDE_LANDMARKS